@@ -0,0 +1,121 @@
+"""
+Measures how many prompt tokens Ollama evaluates on consecutive commits.
+
+Run from the repository root:
+
+    python -m benchmarks.prompt_cache                      # against the stub
+    python -m benchmarks.prompt_cache --url http://localhost:11434
+
+Each API mode sends one style prompt with several different diffs, as
+consecutive commits would. The first request evaluates the whole prompt.
+Later ones share its byte-identical system-prompt prefix, so Ollama only
+evaluates what follows. The report compares the two as tokens saved.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.stub_ollama import StubOllama
+
+API_MODES = ("generate", "chat")
+
+
+def make_diffs(count: int) -> list[str]:
+    """Small, distinct diffs standing in for consecutive commits."""
+    return [
+        f"diff --git a/src/module_{n}.py b/src/module_{n}.py\n"
+        f"--- a/src/module_{n}.py\n+++ b/src/module_{n}.py\n"
+        f"@@ -1 +1 @@\n-LIMIT = {n}\n+LIMIT = {n + 1}\n"
+        for n in range(count)
+    ]
+
+
+async def measure(
+    url: str, model: str, api: str, style: str, diffs: list[str]
+) -> dict:
+    """
+    Sends each diff with the same style and records Ollama's prompt metrics.
+
+    Returns:
+        Prompt tokens evaluated by the first request and, on average, by the
+        later ones, the share saved, and the matching evaluation times in ms
+        when Ollama reports them.
+    """
+    from ai_commit import prompt_manager, timings
+    from ai_commit.llm_provider import OllamaProvider
+
+    system_prompt = prompt_manager.load_style(style)
+    counts, durations = [], []
+    async with OllamaProvider(url=url, model=model, api=api) as provider:
+        for diff in diffs:
+            with timings.recording() as recorder:
+                await provider.complete(system_prompt, diff)
+            metrics = recorder.ollama_metrics()
+            counts.append(metrics.get("prompt_eval_count", 0))
+            durations.append(metrics.get("prompt_eval_duration", 0) / 1e6)
+
+    later = sum(counts[1:]) / len(counts[1:])
+    return {
+        "first_tokens": counts[0],
+        "later_tokens": round(later, 1),
+        "saved": round(1 - later / counts[0], 3) if counts[0] else 0.0,
+        "first_ms": round(durations[0], 1),
+        "later_ms": round(sum(durations[1:]) / len(durations[1:]), 1),
+    }
+
+
+def run(
+    url: Optional[str], model: str, style: str, requests: int
+) -> dict[str, dict]:
+    """Measures every API mode, against the stub unless `url` is given."""
+    diffs = make_diffs(requests)
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the circuit breaker away from the user's own.
+        os.environ["AI_COMMIT_CACHE_DIR"] = str(Path(workdir) / "cache")
+        results = {}
+        for api in API_MODES:
+            if url:
+                results[api] = asyncio.run(measure(url, model, api, style, diffs))
+                continue
+            with StubOllama() as stub:
+                results[api] = asyncio.run(
+                    measure(stub.url, model, api, style, diffs)
+                )
+    return results
+
+
+def format_report(results: dict[str, dict]) -> str:
+    rows = [f"{'api':<10}{'first':>10}{'later':>10}{'saved':>8}"
+            f"{'first ms':>10}{'later ms':>10}"]
+    for api, result in results.items():
+        rows.append(
+            f"{api:<10}{result['first_tokens']:>10}{result['later_tokens']:>10}"
+            f"{result['saved']:>8.0%}{result['first_ms']:>10}{result['later_ms']:>10}"
+        )
+    return "\n".join(rows)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url",
+                        help="A real Ollama to measure. Defaults to the stub.")
+    parser.add_argument("--model", default="llama3.2",
+                        help="The model to load on the real Ollama.")
+    parser.add_argument("--style", default="conventional",
+                        help="The prompt style sent as the system prompt.")
+    parser.add_argument("--requests", type=int, default=5,
+                        help="Consecutive requests per API mode (at least 2).")
+    args = parser.parse_args(argv)
+    if args.requests < 2:
+        parser.error("--requests must be at least 2")
+
+    print(format_report(run(args.url, args.model, args.style, args.requests)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+End-to-end latency benchmarks for the commit message pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.run                    # measure and print
+    python -m benchmarks.run --check            # fail on regressions
+    python -m benchmarks.run --update-baseline  # record new baselines
+
+Model calls go to a local stub of Ollama (see `stub_ollama`), so results
+measure this project's overhead, not model speed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from benchmarks.stub_ollama import StubOllama, StubSettings
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+# Synthetic staged changes: (files, lines per file).
+REPO_SIZES = {
+    "small": (5, 20),
+    "medium": (50, 200),
+    "large": (300, 500),
+}
+
+# A regression is a median slower than the baseline by more than this share
+# plus this many milliseconds; the absolute slack keeps sub-millisecond
+# cases from flapping on timer noise.
+DEFAULT_TOLERANCE = 0.25
+SLACK_MS = 2.0
+
+CLI_PROBE = (
+    "import sys\n"
+    "from ai_commit.cli import app\n"
+    "sys.argv = ['ai-commit', '--help']\n"
+    "try:\n"
+    "    app()\n"
+    "except SystemExit:\n"
+    "    pass\n"
+)
+
+# Latency profile of the stub: a warm model answering at a typical pace.
+STUB_SETTINGS = StubSettings(
+    first_token_latency=0.02, tokens_per_second=400, tokens_per_chunk=1
+)
+
+
+def summarize(samples: list[float]) -> dict:
+    """Reduces timings, in seconds, to the figures stored in a baseline."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))]
+    return {
+        "median_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "runs": len(ordered),
+    }
+
+
+async def _time_async(
+    action: Callable[[], Awaitable[object]], repeat: int
+) -> list[float]:
+    await action()  # Warm-up run, not counted.
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await action()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def make_repo(directory: Path, files: int, lines: int) -> Path:
+    """Creates a git repository with `files` new files of `lines` lines staged."""
+    directory.mkdir(parents=True)
+    subprocess.run(["git", "init", "-q"], cwd=directory, check=True)
+    for number in range(files):
+        package = directory / f"pkg{number % 10}"
+        package.mkdir(exist_ok=True)
+        (package / f"module_{number}.py").write_text("".join(
+            f"def function_{number}_{line}(value):\n"
+            f"    return value * {line} + {number}\n"
+            for line in range(lines // 2)
+        ))
+    subprocess.run(["git", "add", "-A"], cwd=directory, check=True)
+    return directory
+
+
+def bench_cli_cold_start(repeat: int) -> dict:
+    """A fresh interpreter importing the CLI and printing `--help`."""
+    command = [sys.executable, "-c", CLI_PROBE]
+    subprocess.run(command, check=True, capture_output=True)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(command, check=True, capture_output=True)
+        samples.append(time.perf_counter() - started)
+    return {"cli_cold_start": summarize(samples)}
+
+
+async def bench_pipeline(
+    repeat: int, workdir: Path, stub_settings: StubSettings = STUB_SETTINGS
+) -> dict:
+    """Staged diff retrieval, prompt assembly and generation latency."""
+    from ai_commit import async_git, service
+    from ai_commit.llm_provider import MockProvider, OllamaProvider
+
+    results = {}
+    diffs = {}
+    for size, (files, lines) in REPO_SIZES.items():
+        repo = make_repo(workdir / size, files, lines)
+        diffs[size] = await async_git.get_staged_diff(cwd=repo)
+        results[f"staged_diff_{size}"] = summarize(await _time_async(
+            lambda repo=repo: async_git.get_staged_diff(cwd=repo), repeat
+        ))
+
+    mock = MockProvider()
+    for size, diff in diffs.items():
+        results[f"prompt_assembly_{size}"] = summarize(await _time_async(
+            lambda diff=diff: service.prepare_prompt(diff, mock), repeat
+        ))
+
+    prompt = (await service.prepare_prompt(diffs["medium"], mock)).user_prompt
+    with StubOllama(stub_settings) as stub:
+        async with OllamaProvider(url=stub.url, model="stub") as provider:
+            results["generate_commit"] = summarize(await _time_async(
+                lambda: service.generate_commit(prompt, "conventional", provider),
+                repeat,
+            ))
+
+            first_token = []
+
+            async def stream() -> None:
+                started = time.perf_counter()
+                first = None
+                async for _ in service.stream_commit(
+                    prompt, "conventional", provider
+                ):
+                    if first is None:
+                        first = time.perf_counter() - started
+                first_token.append(first)
+
+            results["stream_commit_total"] = summarize(
+                await _time_async(stream, repeat)
+            )
+            # Drop the uncounted warm-up run.
+            results["stream_commit_first_token"] = summarize(first_token[1:])
+    return results
+
+
+def run_benchmarks(
+    repeat: int,
+    only: Optional[str] = None,
+    stub_settings: StubSettings = STUB_SETTINGS,
+) -> dict:
+    """Runs every benchmark and returns the report."""
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the circuit breaker and caches away from the user's own.
+        os.environ["AI_COMMIT_CACHE_DIR"] = str(Path(workdir) / "cache")
+        results = bench_cli_cold_start(max(3, repeat // 2))
+        results.update(asyncio.run(
+            bench_pipeline(repeat, Path(workdir), stub_settings)
+        ))
+    if only:
+        results = {name: r for name, r in results.items() if only in name}
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "stub": asdict(stub_settings),
+        },
+        "results": results,
+    }
+
+
+def find_regressions(
+    report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """
+    Compares a report's medians with a baseline.
+
+    Returns:
+        One line per benchmark slower than its baseline allows.
+    """
+    regressions = []
+    for name, expected in baseline.get("results", {}).items():
+        actual = report["results"].get(name)
+        if actual is None:
+            continue
+        limit = expected["median_ms"] * (1 + tolerance) + SLACK_MS
+        if actual["median_ms"] > limit:
+            regressions.append(
+                f"{name}: {actual['median_ms']:.1f}ms, baseline "
+                f"{expected['median_ms']:.1f}ms (limit {limit:.1f}ms)"
+            )
+    return regressions
+
+
+def format_report(report: dict, baseline: Optional[dict]) -> str:
+    rows = [f"{'benchmark':<28}{'median':>10}{'p95':>10}{'baseline':>10}"]
+    for name, result in report["results"].items():
+        expected = (baseline or {}).get("results", {}).get(name)
+        rows.append(
+            f"{name:<28}{result['median_ms']:>9.1f}ms{result['p95_ms']:>8.1f}ms"
+            + (f"{expected['median_ms']:>8.1f}ms" if expected else f"{'-':>10}")
+        )
+    return "\n".join(rows)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="Timed runs per benchmark.")
+    parser.add_argument("--only",
+                        help="Only report benchmarks whose name contains this.")
+    parser.add_argument("--stub-latency", type=float,
+                        default=STUB_SETTINGS.first_token_latency,
+                        help="Seconds the stub Ollama takes to the first token.")
+    parser.add_argument("--stub-tokens-per-second", type=float,
+                        default=STUB_SETTINGS.tokens_per_second,
+                        help="Generation speed of the stub (0 for instant).")
+    parser.add_argument("--stub-tokens-per-chunk", type=int,
+                        default=STUB_SETTINGS.tokens_per_chunk,
+                        help="Tokens per streamed line from the stub.")
+    parser.add_argument("--output", type=Path,
+                        help="Also write the report as JSON to this file.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH,
+                        help="Baseline file to compare with or update.")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if any benchmark regressed.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown as a share of the baseline.")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run as the new baseline.")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+
+    stub_settings = StubSettings(
+        first_token_latency=args.stub_latency,
+        tokens_per_second=args.stub_tokens_per_second,
+        tokens_per_chunk=args.stub_tokens_per_chunk,
+    )
+    report = run_benchmarks(args.repeat, args.only, stub_settings)
+    print(format_report(report, baseline))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if args.check:
+        if baseline is None:
+            print(f"No baseline at {args.baseline}", file=sys.stderr)
+            return 1
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
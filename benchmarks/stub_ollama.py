@@ -0,0 +1,273 @@
+"""
+A local stand-in for Ollama's `/api/generate` and `/api/chat` endpoints.
+
+It also serves the OpenAI-compatible `/v1/chat/completions` API that
+llama.cpp server and vLLM expose, streaming server-sent events, and their
+`/v1/completions` API, which takes a batch of prompts in one request.
+
+The stub answers like Ollama, with no model behind it, so the client side
+of the pipeline can be timed without a GPU. Latency, generation speed and
+streaming cadence are all configurable.
+
+Like Ollama, the stub keeps the previous prompt "evaluated": its
+`prompt_eval_count` only counts the tokens after the prefix shared with the
+previous request, so prompt caching can be measured against it too.
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+@dataclass
+class StubSettings:
+    """
+    How the stub behaves.
+
+    Attributes:
+        response: The completion returned for every prompt.
+        first_token_latency: Seconds before the first token (or, without
+                             streaming, before the answer) is sent.
+        tokens_per_second: Generation speed; 0 sends everything at once.
+        tokens_per_chunk: Tokens per streamed NDJSON line or event.
+        parallel: Requests generated at once, like Ollama's
+                  OLLAMA_NUM_PARALLEL; later ones queue. 0 means no limit,
+                  like a server with continuous batching.
+    """
+    response: str = "feat: add a benchmark suite with a stub Ollama server"
+    first_token_latency: float = 0.0
+    tokens_per_second: float = 0.0
+    tokens_per_chunk: int = 1
+    parallel: int = 0
+
+
+def _tokens(text: str) -> list[str]:
+    """Splits text into word-sized tokens, keeping the whitespace."""
+    tokens, current = [], ""
+    for char in text:
+        current += char
+        if char == " ":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+def _rendered_prompt(request: dict) -> str:
+    """The text a model would evaluate for a request, system prompt first."""
+    if "messages" in request:
+        return "\n".join(m.get("content", "") for m in request["messages"])
+    return f"{request.get('system', '')}\n{request['prompt']}"
+
+
+def _shared_prefix(a: str, b: str) -> int:
+    """The length of the longest common prefix of two strings."""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+OPENAI_PATH = "/v1/chat/completions"
+BATCH_PATH = "/v1/completions"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed
+    # ACKs add ~40ms to every response and swamp what is being measured.
+    disable_nagle_algorithm = True
+    settings: StubSettings
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path != "/v1/models":
+            self.send_error(404)
+            return
+        self._send_json({"object": "list", "data": [{"id": "stub"}]})
+
+    def do_POST(self) -> None:
+        if self.path not in ("/api/generate", "/api/chat", OPENAI_PATH, BATCH_PATH):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests += 1
+
+        if "prompt" not in request and "messages" not in request:
+            # A warm-up request: load the model, generate nothing.
+            self._send_json({"model": request.get("model"), "done": True})
+            return
+
+        slots = self.server.slots
+        if slots is not None:
+            slots.acquire()
+        try:
+            if self.path == BATCH_PATH:
+                self._generate_batch(request)
+            else:
+                self._generate(request)
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def _generate(self, request: dict) -> None:
+        settings = self.settings
+        prompt = _rendered_prompt(request)
+        with self.server.lock:
+            cached = _shared_prefix(prompt, self.server.last_prompt)
+            self.server.last_prompt = prompt
+        metrics = {
+            "prompt_eval_count": len(_tokens(prompt[cached:])),
+            "eval_count": len(_tokens(settings.response)),
+        }
+
+        time.sleep(settings.first_token_latency)
+        tokens = _tokens(settings.response)
+        delay = 1 / settings.tokens_per_second if settings.tokens_per_second else 0
+        openai = self.path == OPENAI_PATH
+
+        if not request.get("stream", not openai):
+            time.sleep(delay * len(tokens))
+            self._send_json(self._final(settings.response, metrics))
+            return
+
+        self.send_response(200)
+        self.send_header(
+            "Content-Type",
+            "text/event-stream" if openai else "application/x-ndjson",
+        )
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = max(1, settings.tokens_per_chunk)
+        for start in range(0, len(tokens), size):
+            if start:
+                time.sleep(delay * size)
+            self._write_chunk(self._delta("".join(tokens[start:start + size])))
+        self._write_chunk(self._final("", metrics, streamed=True))
+        if openai:
+            self._write_line(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _generate_batch(self, request: dict) -> None:
+        """Answers every prompt in the request, generated side by side."""
+        settings = self.settings
+        prompts = request["prompt"]
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        tokens = len(_tokens(settings.response))
+        delay = 1 / settings.tokens_per_second if settings.tokens_per_second else 0
+        time.sleep(settings.first_token_latency + delay * tokens)
+        self._send_json({
+            "choices": [
+                {"index": index, "text": settings.response, "finish_reason": "stop"}
+                for index in range(len(prompts))
+            ],
+            "usage": {
+                "prompt_tokens": sum(len(_tokens(p)) for p in prompts),
+                "completion_tokens": tokens * len(prompts),
+            },
+        })
+
+    def _delta(self, text: str) -> dict:
+        """A streamed fragment, in the shape the requested endpoint uses."""
+        if self.path == OPENAI_PATH:
+            return {"choices": [{"index": 0, "delta": {"content": text},
+                                 "finish_reason": None}]}
+        return {**self._content(text), "done": False}
+
+    def _final(self, text: str, metrics: dict, streamed: bool = False) -> dict:
+        """The answer, or the last streamed chunk, with the token counts."""
+        if self.path == OPENAI_PATH:
+            usage = {
+                "prompt_tokens": metrics["prompt_eval_count"],
+                "completion_tokens": metrics["eval_count"],
+            }
+            if streamed:
+                return {"choices": [], "usage": usage}
+            return {
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": text},
+                }],
+                "usage": usage,
+            }
+        return {**self._content(text), "done": True, **metrics}
+
+    def _content(self, text: str) -> dict:
+        """Generated text, in the field the requested Ollama endpoint uses."""
+        if self.path == "/api/chat":
+            return {"message": {"role": "assistant", "content": text}}
+        return {"response": text}
+
+    def _send_json(self, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        if self.path == OPENAI_PATH:
+            self._write_line(b"data: " + data + b"\n\n")
+        else:
+            self._write_line(data + b"\n")
+
+    def _write_line(self, data: bytes) -> None:
+        """Sends one piece of a chunked response."""
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class StubOllama:
+    """
+    Runs the stub server on a free local port in a background thread.
+
+    Use it as a context manager; `url` is the base URL to give the provider.
+    """
+
+    def __init__(self, settings: Optional[StubSettings] = None):
+        self.settings = settings or StubSettings()
+        handler = type("Handler", (_Handler,), {"settings": self.settings})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._server.requests = 0
+        self._server.lock = threading.Lock()
+        self._server.last_prompt = ""
+        parallel = self.settings.parallel
+        self._server.slots = threading.Semaphore(parallel) if parallel else None
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_url(self) -> str:
+        """The base URL of the OpenAI-compatible API."""
+        return f"{self.url}/v1"
+
+    @property
+    def requests(self) -> int:
+        """How many generate requests the stub has answered."""
+        return self._server.requests
+
+    def __enter__(self) -> "StubOllama":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,147 @@
+"""
+Measures completions per second for each backend as concurrency grows.
+
+Run from the repository root:
+
+    python -m benchmarks.throughput                          # against the stub
+    python -m benchmarks.throughput --stub-parallel 1        # Ollama-like stub
+    python -m benchmarks.throughput --openai-url http://localhost:8080/v1
+
+Each backend gets the same batch of requests through one shared provider,
+with at most `concurrency` in flight, as backfill and batch send them. A
+server that batches concurrent requests keeps answering at the same pace
+as more arrive, so its throughput grows with concurrency.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.stub_ollama import StubOllama, StubSettings
+
+BACKENDS = ("ollama", "openai")
+DEFAULT_CONCURRENCY = (1, 4, 16)
+
+# A warm model answering at a typical pace.
+STUB_SETTINGS = StubSettings(first_token_latency=0.02, tokens_per_second=400)
+
+
+def _provider(backend: str, url: str, model: str):
+    from ai_commit.llm_provider import OllamaProvider, OpenAIProvider
+
+    if backend == "openai":
+        return OpenAIProvider(url=url, model=model, max_connections=64)
+    return OllamaProvider(url=url, model=model, max_connections=64)
+
+
+async def measure(
+    backend: str, url: str, model: str, concurrency: int, requests: int
+) -> dict:
+    """
+    Sends `requests` completions with at most `concurrency` in flight.
+
+    Returns:
+        The completions per second and the mean time from sending one to
+        its answer, queueing included, in ms.
+    """
+    from ai_commit.llm_provider import BoundedProvider
+
+    latencies = []
+    async with _provider(backend, url, model) as provider:
+        bounded = BoundedProvider(provider, concurrency)
+        await provider.warm_up()
+
+        async def one(number: int) -> None:
+            started = time.perf_counter()
+            await bounded.complete("Write a commit message.", f"diff {number}")
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(number) for number in range(requests)))
+        seconds = time.perf_counter() - started
+
+    return {
+        "per_second": round(requests / seconds, 1),
+        "latency_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+    }
+
+
+def run(
+    urls: dict[str, Optional[str]],
+    model: str,
+    concurrency: list[int],
+    requests: int,
+    settings: StubSettings = STUB_SETTINGS,
+) -> dict[str, dict[int, dict]]:
+    """Measures every backend, against the stub unless its URL is given."""
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the circuit breaker away from the user's own.
+        os.environ["AI_COMMIT_CACHE_DIR"] = str(Path(workdir) / "cache")
+        results: dict[str, dict[int, dict]] = {}
+        with StubOllama(settings) as stub:
+            stub_urls = {"ollama": stub.url, "openai": stub.openai_url}
+            for backend in BACKENDS:
+                url = urls.get(backend) or stub_urls[backend]
+                results[backend] = {
+                    level: asyncio.run(
+                        measure(backend, url, model, level, requests)
+                    )
+                    for level in concurrency
+                }
+    return results
+
+
+def format_report(results: dict[str, dict[int, dict]]) -> str:
+    rows = [f"{'backend':<10}{'in flight':>10}{'per second':>12}{'latency ms':>12}"]
+    for backend, levels in results.items():
+        for level, result in levels.items():
+            rows.append(
+                f"{backend:<10}{level:>10}{result['per_second']:>12}"
+                f"{result['latency_ms']:>12}"
+            )
+    return "\n".join(rows)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ollama-url",
+                        help="A real Ollama to measure. Defaults to the stub.")
+    parser.add_argument("--openai-url",
+                        help="A real OpenAI-compatible server, /v1 included. "
+                             "Defaults to the stub.")
+    parser.add_argument("--model", default="llama3.2",
+                        help="The model to use on real servers.")
+    parser.add_argument("--concurrency", default=",".join(
+                            str(level) for level in DEFAULT_CONCURRENCY),
+                        help="Comma-separated requests in flight to try.")
+    parser.add_argument("--requests", type=int, default=32,
+                        help="Completions sent per measurement.")
+    parser.add_argument("--stub-parallel", type=int, default=0,
+                        help="Requests the stub generates at once; 0 for no "
+                             "limit, 1 for a single-slot Ollama.")
+    args = parser.parse_args(argv)
+    try:
+        concurrency = [int(level) for level in args.concurrency.split(",")]
+    except ValueError:
+        parser.error("--concurrency must be comma-separated integers")
+    if args.requests < 1 or min(concurrency) < 1:
+        parser.error("--requests and --concurrency must be positive")
+
+    settings = StubSettings(
+        first_token_latency=STUB_SETTINGS.first_token_latency,
+        tokens_per_second=STUB_SETTINGS.tokens_per_second,
+        parallel=args.stub_parallel,
+    )
+    urls = {"ollama": args.ollama_url, "openai": args.openai_url}
+    print(format_report(
+        run(urls, args.model, concurrency, args.requests, settings)
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+import asyncio
+import math
+import subprocess
+from pathlib import Path
+from typing import AsyncIterator, Optional, Union
+
+from ai_commit import config, diff_selection, timings
+from ai_commit.diff_parser import FileDiff, aiter_file_diffs, iter_file_diffs
+from ai_commit.diff_selection import FileStat
+from ai_commit.git_integration import (
+    NO_STAGED_CHANGES,
+    STAGED_DIFF,
+    NoStagedChanges,
+    NotAGitRepositoryError,
+)
+
+PathLike = Union[str, Path]
+
+
+def _terminate(process: asyncio.subprocess.Process) -> None:
+    """Kills a git process that is no longer wanted."""
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_git(
+    *args: str,
+    cwd: Optional[PathLike] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Runs a git command without blocking the event loop.
+
+    Args:
+        *args: Arguments passed to `git`.
+        cwd: Directory to run git in. Defaults to the current directory.
+        timeout: Seconds to wait before killing git; `math.inf` waits
+                 indefinitely. Defaults to `config.get_git_timeout()`.
+
+    Returns:
+        The command's standard output, decoded as UTF-8.
+
+    Raises:
+        NotAGitRepositoryError: If `cwd` is not inside a git repository.
+        subprocess.CalledProcessError: If git exits with a non-zero status.
+        subprocess.TimeoutExpired: If git does not finish within `timeout`.
+    """
+    command = ["git", *args]
+    timeout = timeout if timeout is not None else config.get_git_timeout()
+    with timings.span(f"git {args[0]}"):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(), None if timeout == math.inf else timeout
+            )
+        except asyncio.TimeoutError:
+            _terminate(process)
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, timeout) from None
+        except asyncio.CancelledError:
+            # Don't leave git running when the caller gives up on it.
+            _terminate(process)
+            raise
+
+    _check_returncode(process, command, stdout, stderr)
+    return stdout.decode("utf-8", errors="replace")
+
+
+def _check_returncode(
+    process: asyncio.subprocess.Process,
+    command: list[str],
+    stdout: bytes,
+    stderr: bytes,
+) -> None:
+    """Raises the appropriate error if git exited with a non-zero status."""
+    if process.returncode == 0:
+        return
+    error = stderr.decode("utf-8", errors="replace")
+    # Outside a repository `git diff` falls back to its --no-index mode
+    # and rejects repository-only options instead of saying why.
+    if "not a git repository" in error or "git diff --no-index" in error:
+        raise NotAGitRepositoryError("Not operating inside a git repository.")
+    raise subprocess.CalledProcessError(
+        process.returncode, command,
+        output=stdout.decode("utf-8", errors="replace"), stderr=error,
+    )
+
+
+async def _read_capped(
+    process: asyncio.subprocess.Process, max_bytes: int
+) -> tuple[bytes, bytes, bool]:
+    """Reads a process's output in chunks, killing it past `max_bytes`."""
+    chunks = []
+    size = 0
+    while size <= max_bytes:
+        chunk = await process.stdout.read(diff_selection.CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    truncated = size > max_bytes
+    if truncated:
+        _terminate(process)
+    stderr = await process.stderr.read()
+    await process.wait()
+    return b"".join(chunks), stderr, truncated
+
+
+async def run_git_capped(
+    *args: str,
+    max_bytes: int,
+    cwd: Optional[PathLike] = None,
+    timeout: Optional[float] = None,
+) -> tuple[bytes, bool]:
+    """
+    Runs a git command, reading at most about `max_bytes` of its output.
+
+    Output is read incrementally, and git is killed as soon as it has
+    written more than `max_bytes`, so huge output is never held in memory.
+
+    Args:
+        *args: Arguments passed to `git`.
+        max_bytes: How much output to read before giving up on the rest.
+        cwd: Directory to run git in. Defaults to the current directory.
+        timeout: Seconds to wait before killing git. Defaults to
+                 `config.get_git_timeout()`.
+
+    Returns:
+        The raw output read, which may run up to one chunk past `max_bytes`,
+        and whether git was stopped because of the cap.
+
+    Raises:
+        NotAGitRepositoryError: If `cwd` is not inside a git repository.
+        subprocess.CalledProcessError: If git fails before reaching the cap.
+        subprocess.TimeoutExpired: If git does not finish within `timeout`.
+    """
+    command = ["git", *args]
+    timeout = timeout if timeout is not None else config.get_git_timeout()
+    with timings.span(f"git {args[0]}"):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr, truncated = await asyncio.wait_for(
+                _read_capped(process, max_bytes), timeout
+            )
+        except asyncio.TimeoutError:
+            _terminate(process)
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, timeout) from None
+        except asyncio.CancelledError:
+            _terminate(process)
+            raise
+
+    if not truncated:
+        _check_returncode(process, command, stdout, stderr)
+    return stdout, truncated
+
+
+async def iter_git_lines(
+    *args: str,
+    cwd: Optional[PathLike] = None,
+    chunk_size: int = 64 * 1024,
+    timeout: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Runs a git command and yields its output line by line as it is produced.
+
+    Takes the same arguments, and raises the same errors, as `iter_git_text`.
+
+    Yields:
+        Each line of output, decoded as UTF-8, including its newline.
+    """
+    texts = iter_git_text(
+        *args, cwd=cwd, chunk_size=chunk_size, timeout=timeout, max_bytes=max_bytes
+    )
+    try:
+        async for text in texts:
+            start = 0
+            while start < len(text):
+                end = text.find("\n", start) + 1 or len(text)
+                yield text[start:end]
+                start = end
+    finally:
+        await texts.aclose()
+
+
+async def iter_git_text(
+    *args: str,
+    cwd: Optional[PathLike] = None,
+    chunk_size: int = 64 * 1024,
+    timeout: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Runs a git command and yields its output, in whole lines, as it arrives.
+
+    Output is read in fixed-size chunks, so memory use is bounded by the
+    chunk size and the longest line rather than by the total output.
+    Handing over many lines at once keeps the per-line cost out of Python
+    for consumers such as `diff_parser.aiter_file_diffs`. Leaving the
+    iteration early kills git.
+
+    Args:
+        *args: Arguments passed to `git`.
+        cwd: Directory to run git in. Defaults to the current directory.
+        chunk_size: Bytes read from git at a time.
+        timeout: Seconds to wait for git's next output before killing it;
+                 `math.inf` waits indefinitely. Time the caller spends
+                 between pieces does not count. Defaults to
+                 `config.get_git_timeout()`.
+        max_bytes: If set, git is killed once it has printed more than
+                   this, and the last line yielded may be cut short there.
+
+    Yields:
+        Each chunk read, decoded as UTF-8, up to its last newline; the rest
+        of the chunk comes with the next one.
+
+    Raises:
+        NotAGitRepositoryError: If `cwd` is not inside a git repository.
+        subprocess.CalledProcessError: If git exits with a non-zero status.
+        subprocess.TimeoutExpired: If git stays silent for `timeout`.
+    """
+    command = ["git", *args]
+    timeout = timeout if timeout is not None else config.get_git_timeout()
+    wait = None if timeout == math.inf else timeout
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        cwd=cwd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    finished = False
+    try:
+        # The start of a line still waiting for its newline.
+        pending: list[bytes] = []
+        size = 0
+        while max_bytes is None or size <= max_bytes:
+            chunk = await asyncio.wait_for(process.stdout.read(chunk_size), wait)
+            if not chunk:
+                break
+            size += len(chunk)
+            end = chunk.rfind(b"\n") + 1
+            if not end:
+                pending.append(chunk)
+                continue
+            pending.append(chunk[:end])
+            yield b"".join(pending).decode("utf-8", errors="replace")
+            pending = [chunk[end:]]
+        if any(pending):
+            yield b"".join(pending).decode("utf-8", errors="replace")
+        if max_bytes is not None and size > max_bytes:
+            return
+
+        stderr = await asyncio.wait_for(process.stderr.read(), wait)
+        await asyncio.wait_for(process.wait(), wait)
+        finished = True
+    except asyncio.TimeoutError:
+        raise subprocess.TimeoutExpired(command, timeout) from None
+    finally:
+        if not finished:
+            _terminate(process)
+            # git may have filled the pipe first; it only closes once drained.
+            while await process.stdout.read(chunk_size):
+                pass
+            await process.wait()
+
+    _check_returncode(process, command, b"", stderr)
+
+
+async def get_staged_diff(
+    cwd: Optional[PathLike] = None,
+    max_bytes: Optional[int] = None,
+    exclude: Optional[list[str]] = None,
+) -> str:
+    """
+    Retrieves the unified diff of the staged changes in the repository.
+
+    The async counterpart of `git_integration.get_staged_diff_capped`, with
+    files chosen as in `iter_staged_files`.
+
+    Raises:
+        NoStagedChanges: If no files are staged.
+        NotAGitRepositoryError: If `cwd` is not inside a git repository.
+    """
+    return "".join([
+        file.text async for file in iter_staged_files(cwd, max_bytes, exclude)
+    ])
+
+
+async def iter_staged_files(
+    cwd: Optional[PathLike] = None,
+    max_bytes: Optional[int] = None,
+    exclude: Optional[list[str]] = None,
+) -> AsyncIterator[FileDiff]:
+    """
+    Yields the staged changes file by file, as git produces them.
+
+    Files are chosen by `diff_selection.StagedDiffReader`: the whole diff
+    is read, and if it runs past `max_bytes`, the files not read yet are
+    fetched as numstat suggests. Each file is parsed and handed over as
+    soon as git has printed it, so consumers that process files one at a
+    time never hold the whole diff. Stand-ins for skipped files come last.
+
+    Raises:
+        NoStagedChanges: If no files are staged.
+        NotAGitRepositoryError: If `cwd` is not inside a git repository.
+    """
+    reader = diff_selection.StagedDiffReader(max_bytes, exclude)
+    texts = _counted(
+        iter_git_text(*STAGED_DIFF, cwd=cwd, max_bytes=reader.max_bytes), reader
+    )
+    async for file in aiter_file_diffs(texts):
+        # Past the cap, the last file is incomplete; it is fetched below.
+        if not reader.overflowed and reader.take(file):
+            yield file
+    if not reader.overflowed:
+        if not reader.size:
+            raise NoStagedChanges(NO_STAGED_CHANGES)
+        for file in iter_file_diffs([reader.stubs()]):
+            yield file
+        return
+
+    selection = reader.select_rest(await get_staged_stats(cwd))
+    async for file in _fetch_files(selection, cwd):
+        yield file
+
+
+async def _fetch_files(
+    selection: diff_selection.DiffSelection, cwd: Optional[PathLike] = None
+) -> AsyncIterator[FileDiff]:
+    """Yields the files a selection fetches, then the stand-ins for the rest."""
+    if not selection.fetch and not selection.skipped and not selection.shown:
+        raise NoStagedChanges(NO_STAGED_CHANGES)
+    if selection.fetch:
+        texts = _capped(
+            iter_git_text(*STAGED_DIFF, "--", *selection.pathspecs(), cwd=cwd),
+            selection.max_bytes,
+        )
+        async for file in aiter_file_diffs(texts):
+            yield file
+    for file in iter_file_diffs([selection.stubs()]):
+        yield file
+
+
+async def _counted(
+    texts: AsyncIterator[str], reader: diff_selection.StagedDiffReader
+) -> AsyncIterator[str]:
+    """Passes git's output through until the reader's cap is passed."""
+    try:
+        async for text in texts:
+            if not reader.count(text):
+                return
+            yield text
+    finally:
+        # Stops git when reading ends early.
+        await texts.aclose()
+
+
+async def _capped(texts: AsyncIterator[str], max_bytes: int) -> AsyncIterator[str]:
+    """Passes git's output through until `max_bytes`, then notes the truncation."""
+    size = 0
+    try:
+        async for text in texts:
+            data = text.encode("utf-8")
+            if size + len(data) > max_bytes:
+                # Keep the whole lines that still fit.
+                data = data[:max_bytes - size]
+                yield data[:data.rfind(b"\n") + 1].decode("utf-8")
+                yield diff_selection.TRUNCATION_NOTE.format(max_bytes=max_bytes)
+                return
+            size += len(data)
+            yield text
+    finally:
+        # Stops git when reading ends early.
+        await texts.aclose()
+
+
+async def get_staged_stats(cwd: Optional[PathLike] = None) -> list[FileStat]:
+    """Returns per-file added/deleted line counts for the staged changes."""
+    output = await run_git("diff", "--staged", "--numstat", "-z", cwd=cwd)
+    return diff_selection.parse_numstat(output)
+
+
+async def get_current_branch(cwd: Optional[PathLike] = None) -> str:
+    """Returns the checked-out branch name, or "HEAD" when detached."""
+    output = await run_git("rev-parse", "--abbrev-ref", "HEAD", cwd=cwd)
+    return output.strip()
+
+
+async def get_recent_subjects(
+    count: int = 10, cwd: Optional[PathLike] = None
+) -> list[str]:
+    """Returns the subject lines of the most recent commits, newest first."""
+    try:
+        output = await run_git("log", f"-{count}", "--format=%s", cwd=cwd)
+    except subprocess.CalledProcessError:
+        # A repository without commits has no log.
+        return []
+    return output.splitlines()
+
+
+async def commit(message: str, cwd: Optional[PathLike] = None) -> None:
+    """
+    Commits staged changes with the provided message using `git commit -m`.
+
+    Commits run hooks, so no timeout is applied.
+
+    Raises:
+        subprocess.CalledProcessError: If the git command fails.
+    """
+    await run_git("commit", "-m", message, cwd=cwd, timeout=math.inf)
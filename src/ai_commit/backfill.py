@@ -0,0 +1,200 @@
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+from ai_commit import async_git, config, service
+from ai_commit.llm_provider import LLMProvider
+from ai_commit.tokens import estimate_tokens
+
+# Separates commits in the `git log` stream. NUL never appears in a diff.
+_COMMIT_MARKER = "\0commit "
+
+
+@dataclass
+class CommitDiff:
+    """One commit from the range being backfilled."""
+    sha: str
+    subject: str
+    diff: str
+
+
+@dataclass
+class BackfillRecord:
+    """The outcome for one commit, written as one JSON line."""
+    sha: str
+    subject: str
+    message: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+@dataclass
+class BackfillStats:
+    """Throughput figures for a backfill run."""
+    commits: int = 0
+    failed: int = 0
+    skipped: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    seconds: float = 0.0
+
+    @property
+    def commits_per_minute(self) -> float:
+        return self.commits * 60 / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Estimated prompt and completion tokens processed per second."""
+        tokens = self.prompt_tokens + self.completion_tokens
+        return tokens / self.seconds if self.seconds else 0.0
+
+
+async def iter_commit_diffs(
+    rev_range: str, cwd: Optional[Path] = None
+) -> AsyncIterator[CommitDiff]:
+    """
+    Streams the non-merge commits in `rev_range` with their diffs, oldest first.
+
+    A single `git log -p` process is read incrementally, so only one
+    commit's diff is held in memory at a time.
+
+    Args:
+        rev_range: Any revision range `git log` accepts, e.g. "main~50..main".
+        cwd: A directory inside the repository.
+    """
+    current: Optional[CommitDiff] = None
+    lines: list[str] = []
+    async for line in async_git.iter_git_lines(
+        "log", "-p", "--reverse", "--no-merges", "--no-color", "--no-ext-diff",
+        "--format=%x00commit %H %s", rev_range, cwd=cwd,
+    ):
+        if line.startswith(_COMMIT_MARKER):
+            if current is not None:
+                current.diff = "".join(lines).strip("\n") + "\n"
+                yield current
+            sha, _, subject = line[len(_COMMIT_MARKER):].rstrip("\n").partition(" ")
+            current, lines = CommitDiff(sha=sha, subject=subject, diff=""), []
+        else:
+            lines.append(line)
+    if current is not None:
+        current.diff = "".join(lines).strip("\n") + "\n"
+        yield current
+
+
+def load_completed(output: Path) -> set[str]:
+    """Returns the commits already recorded successfully in `output`."""
+    completed = set()
+    if not output.exists():
+        return completed
+    with output.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run.
+                continue
+            if record.get("message") and not record.get("error"):
+                completed.add(record["sha"])
+    return completed
+
+
+async def run_backfill(
+    rev_range: str,
+    style: str,
+    provider: LLMProvider,
+    output: Path,
+    concurrency: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    cwd: Optional[Path] = None,
+    on_record: Optional[Callable[[BackfillRecord], None]] = None,
+    candidates: int = 1,
+) -> BackfillStats:
+    """
+    Generates commit messages for every commit in `rev_range`.
+
+    Commits are streamed from git into a bounded queue and consumed by
+    `concurrency` workers sharing one provider. Each result is appended to
+    `output` as a JSON line as soon as it is ready, so an interrupted run
+    can be resumed: commits already recorded without an error are skipped.
+
+    Args:
+        rev_range: The revision range to backfill.
+        style: The prompt style to generate with.
+        provider: The provider shared by all workers.
+        output: The JSONL file to append results to.
+        concurrency: Number of concurrent generations.
+                     Defaults to `config.get_max_concurrency()`.
+        token_budget: Token budget for each commit's diff.
+        cwd: A directory inside the repository.
+        on_record: Called with each record after it is written.
+        candidates: Messages generated per commit, keeping the best
+                    (see `service.generate_best_commit`).
+
+    Returns:
+        Throughput statistics for the commits processed in this run.
+    """
+    concurrency = concurrency or config.get_max_concurrency()
+    completed = load_completed(output)
+    stats = BackfillStats()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    started = time.perf_counter()
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("a", encoding="utf-8") as sink:
+
+        def write(record: BackfillRecord) -> None:
+            sink.write(json.dumps(asdict(record)) + "\n")
+            sink.flush()
+            if on_record is not None:
+                on_record(record)
+
+        async def worker() -> None:
+            while True:
+                commit = await queue.get()
+                if commit is None:
+                    return
+                record = BackfillRecord(sha=commit.sha, subject=commit.subject)
+                commit_started = time.perf_counter()
+                try:
+                    if not commit.diff.strip():
+                        raise ValueError("The commit has no diff.")
+                    prepared = await service.prepare_prompt(
+                        commit.diff, provider, token_budget
+                    )
+                    if candidates > 1:
+                        record.message = await service.generate_best_commit(
+                            prepared.user_prompt, style, provider, candidates
+                        )
+                    else:
+                        record.message = await service.generate_commit(
+                            diff=prepared.user_prompt, style=style,
+                            provider=provider,
+                        )
+                    stats.prompt_tokens += prepared.tokens
+                    stats.completion_tokens += estimate_tokens(record.message)
+                except Exception as e:
+                    record.error = f"{type(e).__name__}: {e}"
+                    stats.failed += 1
+                record.seconds = round(time.perf_counter() - commit_started, 3)
+                stats.commits += 1
+                write(record)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            async for commit in iter_commit_diffs(rev_range, cwd=cwd):
+                if commit.sha in completed:
+                    stats.skipped += 1
+                    continue
+                await queue.put(commit)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            stats.seconds = time.perf_counter() - started
+
+    return stats
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from ai_commit import async_git, config, service
+from ai_commit.cache import CompletionCache
+from ai_commit.llm_provider import BoundedProvider, CoalescingProvider, LLMProvider
+
+
+@dataclass
+class BatchRecord:
+    """The outcome for one repository, written as one JSON line."""
+    repo: str
+    message: Optional[str] = None
+    error: Optional[str] = None
+    # Seconds spent per stage: "prepare" (reading git and building the
+    # prompt) and "generate" (waiting for and running the model).
+    timings: dict[str, float] = field(default_factory=dict)
+    seconds: float = 0.0
+
+
+async def generate_for_repo(
+    repo: Path,
+    style: str,
+    provider: LLMProvider,
+    token_budget: Optional[int] = None,
+    cache: Optional[CompletionCache] = None,
+) -> BatchRecord:
+    """
+    Generates a commit message for the changes staged in one repository.
+
+    Errors are recorded on the returned record instead of being raised.
+    """
+    record = BatchRecord(repo=str(repo))
+    started = time.perf_counter()
+    try:
+        prepared = await service.prepare_prompt(
+            async_git.iter_staged_files(cwd=repo), provider, token_budget
+        )
+        prepared_at = time.perf_counter()
+        record.timings["prepare"] = round(prepared_at - started, 3)
+        record.message = await service.generate_commit(
+            diff=prepared.user_prompt, style=style, provider=provider,
+            cache=cache if prepared.cacheable else None,
+        )
+        record.timings["generate"] = round(time.perf_counter() - prepared_at, 3)
+    except Exception as e:
+        record.error = f"{type(e).__name__}: {e}"
+    record.seconds = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def run_batch(
+    repos: list[Path],
+    style: str,
+    provider: LLMProvider,
+    jobs: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    cache: Optional[CompletionCache] = None,
+    on_record: Optional[Callable[[BatchRecord], None]] = None,
+) -> list[BatchRecord]:
+    """
+    Generates commit messages for the staged changes of many repositories.
+
+    `jobs` workers take repositories from a shared queue, each running its
+    own git processes. All generations go through one provider that lets
+    at most `concurrency` requests reach the model at once, so git work in
+    some repositories overlaps the model working on others. Identical
+    prompts in flight together are generated once. A failure in one
+    repository is recorded and the others carry on.
+
+    Args:
+        repos: The repositories to generate messages for.
+        style: The prompt style to generate with.
+        provider: The provider shared by all workers.
+        jobs: Repositories processed at once. Defaults to twice
+              `concurrency`, so diffs are ready when a model slot frees up.
+        concurrency: Generations in flight at once.
+                     Defaults to `config.get_max_concurrency()`.
+        token_budget: Token budget for each repository's diff.
+        cache: An optional completion cache.
+        on_record: Called with each record as soon as it is ready.
+
+    Returns:
+        One record per repository, in the order given.
+    """
+    concurrency = concurrency or config.get_max_concurrency()
+    jobs = jobs or concurrency * 2
+    # Repositories with the same staged change share one generation, which
+    # then takes only one of the model slots.
+    shared = CoalescingProvider(BoundedProvider(provider, concurrency))
+    records: list[Optional[BatchRecord]] = [None] * len(repos)
+    queue: asyncio.Queue = asyncio.Queue()
+    for position, repo in enumerate(repos):
+        queue.put_nowait((position, repo))
+
+    async def worker() -> None:
+        while not queue.empty():
+            position, repo = queue.get_nowait()
+            record = await generate_for_repo(
+                repo, style, shared, token_budget, cache
+            )
+            records[position] = record
+            if on_record is not None:
+                on_record(record)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(jobs, len(repos)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    return records
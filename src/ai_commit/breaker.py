@@ -0,0 +1,84 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from ai_commit import config
+
+
+class CircuitBreaker:
+    """
+    Fails fast for an endpoint that keeps failing.
+
+    After `threshold` consecutive failures the breaker opens: requests are
+    refused for `cooldown` seconds instead of each waiting out a timeout.
+    Once the cool-down has passed, the next request is let through; if it
+    fails too, the breaker opens again straight away.
+
+    The state lives in a small JSON file under the cache directory, so it
+    carries over between CLI invocations. Errors reading or writing it are
+    ignored: the breaker must never be the reason a request fails.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: Optional[int] = None,
+        cooldown: Optional[float] = None,
+        directory: Optional[Path] = None,
+    ):
+        """
+        Args:
+            name: Identifies the endpoint, e.g. its URL.
+            threshold: Consecutive failures that open the breaker.
+                       Defaults to `config.get_breaker_threshold()`.
+            cooldown: Seconds the breaker stays open.
+                      Defaults to `config.get_breaker_cooldown()`.
+            directory: Where the state is stored.
+                       Defaults to `config.get_cache_dir()`.
+        """
+        digest = hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+        self.path = Path(directory or config.get_cache_dir()) / "breakers" / (
+            f"{digest}.json"
+        )
+        self.threshold = threshold or config.get_breaker_threshold()
+        self.cooldown = cooldown or config.get_breaker_cooldown()
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"failures": 0, "opened_until": 0.0}
+
+    def _save(self, state: dict) -> None:
+        with contextlib.suppress(OSError):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets requests through; 0 when closed."""
+        return max(0.0, self._load().get("opened_until", 0.0) - time.time())
+
+    def record_success(self) -> None:
+        """Closes the breaker and resets the failure count."""
+        if self._load().get("failures"):
+            self._save({"failures": 0, "opened_until": 0.0})
+
+    def record_failure(self) -> None:
+        """Counts a failure, opening the breaker at the threshold."""
+        state = self._load()
+        state["failures"] = state.get("failures", 0) + 1
+        if state["failures"] >= self.threshold:
+            state["opened_until"] = time.time() + self.cooldown
+        self._save(state)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from ai_commit import config
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters for a single CompletionCache instance."""
+    hits: int = 0
+    misses: int = 0
+
+
+def normalize_diff(diff: str) -> str:
+    """
+    Normalizes a diff so that insignificant differences share a cache key.
+
+    Line endings are converted to LF and surrounding whitespace is removed.
+    """
+    return diff.replace("\r\n", "\n").strip()
+
+
+def make_key(diff: str, system_prompt: str, model: str, options: dict) -> str:
+    """
+    Builds a content-addressed cache key for a completion request.
+
+    Args:
+        diff: The git diff sent as the user prompt.
+        system_prompt: The full content of the style prompt.
+        model: The name of the model producing the completion.
+        options: The generation options sent with the request.
+
+    Returns:
+        A hex-encoded SHA-256 digest identifying the request.
+    """
+    material = json.dumps(
+        {
+            "diff": normalize_diff(diff),
+            "system_prompt": system_prompt,
+            "model": model,
+            "options": options,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def make_summary_key(
+    path: str,
+    blob_ids: Optional[tuple[str, str]],
+    file_diff: str,
+    system_prompt: str,
+    model: str,
+) -> str:
+    """
+    Builds the cache key for one file's change summary.
+
+    The key is the file's path and its old and new blob ids, as printed on
+    the `index` line of `git diff`: the same pair always describes the same
+    change, whatever else is staged. Files git printed no ids for are keyed
+    by their diff text instead.
+
+    Args:
+        path: The path of the file after the change.
+        blob_ids: The (old, new) blob ids, or None.
+        file_diff: The file's part of the diff, used only without blob ids.
+        system_prompt: The instructions for summarizing.
+        model: The name of the model producing the summary.
+
+    Returns:
+        A hex-encoded SHA-256 digest identifying the summary.
+    """
+    material = json.dumps(
+        {
+            "path": path,
+            "blobs": list(blob_ids) if blob_ids else normalize_diff(file_diff),
+            "system_prompt": system_prompt,
+            "model": model,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    A persistent, content-addressed cache of generated commit messages.
+
+    Each entry is stored as its own JSON file named after its key. Writes go
+    to a temporary file that is atomically renamed into place, so parallel
+    processes never observe partial entries. Reading an entry refreshes its
+    modification time, which is used for least-recently-used eviction once
+    the cache holds more than `max_entries`. Entries older than `max_age`
+    seconds are treated as misses and removed.
+    """
+
+    # The subdirectory of the cache directory holding the entries.
+    namespace = "completions"
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_entries: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ):
+        """
+        Args:
+            directory: Where entries are stored.
+                       Defaults to `config.get_cache_dir()`.
+            max_entries: Maximum number of entries kept.
+                         Defaults to `config.get_cache_max_entries()`.
+            max_age: Seconds after which an entry expires.
+                     Defaults to `config.get_cache_max_age()`.
+        """
+        self.directory = Path(directory or config.get_cache_dir()) / self.namespace
+        self.max_entries = (
+            max_entries if max_entries is not None
+            else config.get_cache_max_entries()
+        )
+        self.max_age = max_age if max_age is not None else config.get_cache_max_age()
+        self.stats = CacheStats()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns the cached message for `key`, or None on a miss.
+
+        Missing, expired and unreadable entries all count as misses.
+        """
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+            message = entry["message"]
+            expired = time.time() - entry["created"] > self.max_age
+        except (OSError, ValueError, KeyError, TypeError):
+            self.stats.misses += 1
+            return None
+
+        if expired:
+            path.unlink(missing_ok=True)
+            self.stats.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            # Another process evicted the entry after we read it.
+            pass
+        self.stats.hits += 1
+        return message
+
+    def set(self, key: str, message: str) -> None:
+        """Stores `message` under `key` and evicts entries over the limits."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"message": message, "created": time.time()}, f)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes idle entries, then the least recently used over the limit."""
+        entries = []
+        now = time.time()
+        for path in self.directory.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+class SummaryCache(CompletionCache):
+    """
+    A persistent cache of per-file change summaries (see `make_summary_key`).
+
+    Entries live apart from commit messages but follow the same limits.
+    """
+
+    namespace = "summaries"
@@ -1,74 +1,14 @@
-import asyncio
-import os
-import subprocess
-import tempfile
+import contextlib
+from pathlib import Path
+from typing import Annotated, Optional
 
-import rich
 import typer
-from rich.prompt import Prompt
-from typing_extensions import Annotated
 
-from ai_commit import (
-    git_integration,
-    hook_manager,
-    llm_provider,
-    prompt_manager,
-    service,
-)
+# Keep module-level imports to a minimum: the git hook starts this CLI on
+# every commit. Commands import the modules they need when they run, and
+# rich help rendering (which would load rich for `--help`) is disabled.
+app = typer.Typer(rich_markup_mode=None)
 
-app = typer.Typer()
-
-
-def _handle_edit_flow(initial_message: str) -> str:
-    """Handles the logic for editing a message in an external editor."""
-    editor = os.environ.get("EDITOR")
-    if not editor:
-        rich.print("[bold red]Error: EDITOR environment variable not set.[/bold red]")
-        raise typer.Exit(code=1)
-
-    # Use a temporary file for the user to edit
-    with tempfile.NamedTemporaryFile(mode="w+", delete=False, suffix=".txt") as tf:
-        tf.write(initial_message)
-        temp_file_path = tf.name
-
-    try:
-        # Open the file in the user's specified editor
-        subprocess.run([editor, temp_file_path], check=True)
-        # Read the potentially modified content
-        with open(temp_file_path) as tf:
-            edited_message = tf.read().strip()
-    finally:
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
-
-    return edited_message if edited_message else initial_message
-
-
-async def _run_interactive_flow(style: str, provider: llm_provider.LLMProvider):
-    """Contains the core async logic for the interactive session."""
-    diff = git_integration.get_staged_diff()
-    rich.print("Generating commit message...")
-    commit_message = await service.generate_commit(
-        diff=diff, style=style, provider=provider
-    )
-
-    while True:
-        rich.print("\n[bold green]Generated Commit Message:[/bold green]")
-        rich.print(f"[cyan]{commit_message}[/cyan]\n")
-        choice = Prompt.ask(
-            "[bold]Commit with this message? [/bold]",
-            choices=["y", "n", "e"],
-            default="y"
-        ).lower()
-        if choice == 'y':
-            git_integration.commit(commit_message)
-            rich.print("[bold green]✔ Commit successful![/bold green]")
-            break
-        elif choice == 'e':
-            commit_message = _handle_edit_flow(commit_message)
-        else:
-            rich.print("[yellow]Commit aborted.[/yellow]")
-            break
 
 @app.callback(invoke_without_command=True)
 def main(
@@ -97,6 +37,76 @@ def main(
                      help="Use the real Ollama provider "
                           "(requires Ollama to be running)."),
     ] = False,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache",
+                     help="Always ask the model, bypassing cached messages."),
+    ] = False,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option("--token-budget", min=1,
+                     help="Approximate token budget for the diff sent to the "
+                          "model; larger diffs are compacted to fit."),
+    ] = None,
+    map_reduce: Annotated[
+        bool,
+        typer.Option("--map-reduce",
+                     help="Summarize large diffs in parallel parts, then "
+                          "combine the summaries into one message."),
+    ] = False,
+    incremental: Annotated[
+        bool,
+        typer.Option("--incremental",
+                     help="Summarize large diffs file by file, reusing the "
+                          "cached summaries of files that have not changed."),
+    ] = False,
+    no_daemon: Annotated[
+        bool,
+        typer.Option("--no-daemon",
+                     help="Generate in this process even if an ai-commit "
+                          "daemon is running."),
+    ] = False,
+    candidates: Annotated[
+        int,
+        typer.Option("--candidates", min=1,
+                     help="With --print, generate this many messages at "
+                          "once and keep the best one."),
+    ] = 1,
+    candidate_timeout: Annotated[
+        Optional[float],
+        typer.Option("--candidate-timeout", min=0.0,
+                     help="Seconds to wait for candidates before taking the "
+                          "best one finished so far."),
+    ] = None,
+    timeout: Annotated[
+        Optional[float],
+        typer.Option("--timeout", min=0.0,
+                     help="Give up on generating the message after this many "
+                          "seconds, retries included."),
+    ] = None,
+    show_timings: Annotated[
+        bool,
+        typer.Option("--timings",
+                     help="Print how long each stage took. Generates in this "
+                          "process, not in the daemon."),
+    ] = False,
+    trace: Annotated[
+        Optional[Path],
+        typer.Option("--trace", metavar="FILE",
+                     help="Write the stage timings to FILE as a Chrome trace "
+                          "(or plain JSON with --trace-format json)."),
+    ] = None,
+    trace_format: Annotated[
+        str,
+        typer.Option("--trace-format", help="'chrome' or 'json'."),
+    ] = "chrome",
+    message_file: Annotated[
+        Optional[Path],
+        typer.Option("--message-file", metavar="FILE",
+                     help="Hook mode: write the accepted message to FILE (the "
+                          "prepare-commit-msg hook's $1) instead of running "
+                          "git commit."),
+    ] = None,
 ):
     """
     Generates an AI-powered commit message for your staged changes.
@@ -105,49 +115,93 @@ def main(
     if ctx.invoked_subcommand is not None:
         return
 
-    try:
-        provider: llm_provider.OllamaProvider()
-        if dry_run:
-            provider = llm_provider.MockProvider()
-            rich.print(
-                "[bold yellow]Dry run mode: Using Mock LLM Provider.[/bold yellow]")
-        elif live:
-            provider = llm_provider.OllamaProvider()
-            rich.print("[bold blue]Live mode: Using real Ollama provider.[/bold blue]")
-        else:
-            rich.print(
-                "[bold red]Error:[/bold red] "
-                "Please specify either [cyan]--live[/cyan] or [cyan]--dry-run[/cyan].")
-            raise typer.Exit(code=1)
-
-
-        if print_commit:
-            diff = git_integration.get_staged_diff()
-            commit_message = asyncio.run(service.generate_commit(
-                diff=diff, style=style, provider=provider
-            ))
-            rich.print("\n[bold green]Generated Commit Message:[/bold green]")
-            rich.print(f"[cyan]{commit_message}[/cyan]")
-            return
-
-        asyncio.run(_run_interactive_flow(style, provider))
-
-
-    except git_integration.NoStagedChanges as e:
-        rich.print(f"[bold red]Error:[/bold red] {e}")
+    if not (dry_run or live):
+        typer.secho(
+            "Error: Please specify either --live or --dry-run.", fg="red", bold=True
+        )
         raise typer.Exit(code=1)
-    except KeyError as e:
-        rich.print(f"[bold red]Error:[/bold red] {e}")
-        available = prompt_manager.list_styles()
-        rich.print(f"Please choose from available styles: {available}")
+
+    if candidates > 1 and not print_commit:
+        typer.secho("Error: --candidates requires --print.", fg="red", bold=True)
         raise typer.Exit(code=1)
-    except llm_provider.OllamaConnectionError as e:
-        rich.print(f"[bold red]Ollama Error:[/bold red] {e}")
+
+    if message_file is not None and print_commit:
+        typer.secho(
+            "Error: --message-file cannot be used with --print.", fg="red", bold=True
+        )
         raise typer.Exit(code=1)
-    except Exception as e:
-        rich.print(f"[bold red]An unexpected error occurred:[/bold red] {e}")
+
+    if trace_format not in ("chrome", "json"):
+        typer.secho(
+            "Error: --trace-format must be 'chrome' or 'json'.", fg="red", bold=True
+        )
         raise typer.Exit(code=1)
 
+    hook_file = str(message_file) if message_file is not None else None
+    timed = show_timings or trace is not None
+    if live and not no_daemon and not timed:
+        from ai_commit import daemon_client
+
+        try:
+            daemon_client.run_generate(
+                style=style,
+                token_budget=token_budget,
+                map_reduce=map_reduce,
+                incremental=incremental,
+                print_commit=print_commit,
+                use_cache=not no_cache,
+                candidates=candidates,
+                candidate_timeout=candidate_timeout,
+                timeout=timeout,
+                message_file=hook_file,
+            )
+            return
+        except daemon_client.DaemonUnavailable:
+            pass
+
+    with contextlib.ExitStack() as stack:
+        import_span = contextlib.nullcontext()
+        if timed:
+            from ai_commit import timings
+
+            recorder = stack.enter_context(timings.recording())
+            recorder.add_startup_span()
+            stack.callback(
+                _report_timings, recorder, show_timings, trace, trace_format
+            )
+            import_span = timings.span("import")
+
+        # Imported here so that other commands don't pay for its dependencies.
+        with import_span:
+            from ai_commit import flows
+
+        flows.run_generate(
+            flows.GenerationOptions(
+                style=style,
+                token_budget=token_budget,
+                map_reduce=map_reduce,
+                incremental=incremental,
+                candidates=candidates,
+                candidate_timeout=candidate_timeout,
+            ),
+            dry_run=dry_run,
+            print_commit=print_commit,
+            no_cache=no_cache,
+            timeout=timeout,
+            message_file=hook_file,
+        )
+
+
+def _report_timings(
+    recorder, show_timings: bool, trace: Optional[Path], trace_format: str
+) -> None:
+    """Prints the stage summary and writes the trace file, as requested."""
+    if show_timings:
+        typer.echo(recorder.summary(), err=True)
+    if trace is not None:
+        recorder.export(trace, trace_format)
+        typer.echo(f"Trace written to {trace}", err=True)
+
 
 @app.command(name="install-hook")
 def install_hook_command(
@@ -158,10 +212,249 @@ def install_hook_command(
     """
     Installs the prepare-commit-msg git hook.
     """
+    from ai_commit import hook_manager
+
     try:
         hook_path = hook_manager.install_hook(is_global)
-        rich.print(
-            f"[bold green]✔ Hook installed successfully at:[/bold green] {hook_path}")
+        typer.secho(
+            f"✔ Hook installed successfully at: {hook_path}", fg="green", bold=True
+        )
     except Exception as e:
-        rich.print(f"[bold red]An unexpected error occurred:[/bold red] {e}")
+        typer.secho(f"An unexpected error occurred: {e}", fg="red", bold=True)
+        raise typer.Exit(code=1)
+
+
+@app.command(name="daemon")
+def daemon_command():
+    """
+    Runs a resident generation server that the CLI and git hook delegate to.
+
+    The daemon keeps the Ollama connection pool, the prompt styles and the
+    completion cache warm between commits. Stop it with Ctrl+C.
+    """
+    import asyncio
+
+    from ai_commit import config, daemon
+
+    socket_path = config.get_daemon_socket()
+    typer.secho(f"ai-commit daemon listening on {socket_path}", fg="blue")
+    try:
+        asyncio.run(daemon.serve(socket_path))
+    except KeyboardInterrupt:
+        pass
+    except daemon.DaemonAlreadyRunning as e:
+        typer.secho(f"Error: {e}", fg="red", bold=True)
+        raise typer.Exit(code=1)
+
+
+@app.command(name="watch")
+def watch_command(
+    style: Annotated[
+        str,
+        typer.Option(help="The prompt style to pre-generate messages in."),
+    ] = "conventional",
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option("--token-budget", min=1,
+                     help="Must match the budget used when committing."),
+    ] = None,
+    debounce: Annotated[
+        float,
+        typer.Option(min=0.0,
+                     help="Seconds the staged changes must stay unchanged "
+                          "before a message is generated."),
+    ] = 1.5,
+):
+    """
+    Pre-generates commit messages in the background as you stage changes.
+
+    Messages land in the completion cache, so `ai-commit --live` shows them
+    instantly when the staged diff is unchanged. Stop it with Ctrl+C.
+    """
+    import asyncio
+
+    from ai_commit import cache, llm_provider, watcher
+
+    async def report(message: str) -> None:
+        typer.secho(f"Ready: {message.splitlines()[0]}", fg="green")
+
+    async def report_error(error: Exception) -> None:
+        typer.secho(f"Pre-generation failed: {error}", fg="red")
+
+    async def run() -> None:
+        async with llm_provider.create_provider() as provider:
+            await watcher.watch(
+                style, provider, cache.CompletionCache(),
+                token_budget=token_budget, debounce=debounce,
+                on_generated=report, on_error=report_error,
+            )
+
+    typer.secho("Watching the git index for staged changes...", fg="blue")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command(name="backfill")
+def backfill_command(
+    rev_range: Annotated[
+        str,
+        typer.Argument(metavar="RANGE",
+                       help="The commits to generate messages for, "
+                            "e.g. 'main~500..main'."),
+    ],
+    output: Annotated[
+        Path,
+        typer.Option("--output", "-o",
+                     help="JSONL file to append results to. Commits already "
+                          "in it are skipped, so an interrupted run resumes."),
+    ] = Path("ai-commit-backfill.jsonl"),
+    style: Annotated[
+        str,
+        typer.Option(help="The prompt style to generate messages in."),
+    ] = "conventional",
+    concurrency: Annotated[
+        Optional[int],
+        typer.Option("--concurrency", "-j", min=1,
+                     help="Number of commits generated at once."),
+    ] = None,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option("--token-budget", min=1,
+                     help="Approximate token budget for each commit's diff."),
+    ] = None,
+    candidates: Annotated[
+        int,
+        typer.Option("--candidates", min=1,
+                     help="Generate this many messages per commit and keep "
+                          "the best one."),
+    ] = 1,
+    dry_run: Annotated[
+        bool,
+        typer.Option("--dry-run", help="Use a mock LLM provider."),
+    ] = False,
+):
+    """
+    Generates commit messages for a range of existing commits.
+    """
+    import asyncio
+    import subprocess
+
+    from ai_commit import backfill, llm_provider, prompt_manager
+    from ai_commit.git_integration import NotAGitRepositoryError
+
+    try:
+        prompt_manager.load_style(style)
+    except KeyError as e:
+        typer.secho(f"Error: {e}", fg="red", bold=True)
+        raise typer.Exit(code=1)
+
+    def report(record: "backfill.BackfillRecord") -> None:
+        if record.error:
+            typer.secho(f"{record.sha[:10]} failed: {record.error}", fg="red")
+        else:
+            typer.echo(f"{record.sha[:10]} {record.message.splitlines()[0]}")
+
+    async def run() -> "backfill.BackfillStats":
+        provider = (
+            llm_provider.MockProvider() if dry_run else llm_provider.create_provider()
+        )
+        async with provider:
+            return await backfill.run_backfill(
+                rev_range, style, provider, output,
+                concurrency=concurrency, token_budget=token_budget,
+                on_record=report, candidates=candidates,
+            )
+
+    try:
+        stats = asyncio.run(run())
+    except (NotAGitRepositoryError, subprocess.CalledProcessError) as e:
+        typer.secho(
+            f"Error: {(getattr(e, 'stderr', None) or '').strip() or e}",
+            fg="red", bold=True,
+        )
+        raise typer.Exit(code=1)
+
+    typer.secho(
+        f"\n{stats.commits} commits in {stats.seconds:.1f}s "
+        f"({stats.failed} failed, {stats.skipped} already done): "
+        f"{stats.commits_per_minute:.1f} commits/min, "
+        f"~{stats.tokens_per_second:.0f} tokens/s. Results in {output}",
+        fg="blue",
+    )
+
+
+@app.command(name="batch")
+def batch_command(
+    repos: Annotated[
+        list[Path],
+        typer.Argument(metavar="REPO...",
+                       help="Repositories whose staged changes need messages."),
+    ],
+    style: Annotated[
+        str,
+        typer.Option(help="The prompt style to generate messages in."),
+    ] = "conventional",
+    jobs: Annotated[
+        Optional[int],
+        typer.Option("--jobs", "-j", min=1,
+                     help="Repositories processed at once."),
+    ] = None,
+    concurrency: Annotated[
+        Optional[int],
+        typer.Option("--concurrency", min=1,
+                     help="Generations sent to the model at once."),
+    ] = None,
+    token_budget: Annotated[
+        Optional[int],
+        typer.Option("--token-budget", min=1,
+                     help="Approximate token budget for each repository's diff."),
+    ] = None,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache",
+                     help="Always ask the model, bypassing cached messages."),
+    ] = False,
+    dry_run: Annotated[
+        bool,
+        typer.Option("--dry-run", help="Use a mock LLM provider."),
+    ] = False,
+):
+    """
+    Generates commit messages for the staged changes of many repositories.
+
+    Prints one JSON object per repository as soon as it is done, with the
+    message or the error and the time each stage took. Exits with status 1
+    if any repository failed.
+    """
+    import asyncio
+    import json
+    from dataclasses import asdict
+
+    from ai_commit import batch, cache, llm_provider, prompt_manager
+
+    try:
+        prompt_manager.load_style(style)
+    except KeyError as e:
+        typer.secho(f"Error: {e}", fg="red", bold=True, err=True)
+        raise typer.Exit(code=1)
+
+    def report(record: "batch.BatchRecord") -> None:
+        typer.echo(json.dumps(asdict(record)))
+
+    async def run() -> "list[batch.BatchRecord]":
+        provider = (
+            llm_provider.MockProvider() if dry_run else llm_provider.create_provider()
+        )
+        async with provider:
+            return await batch.run_batch(
+                repos, style, provider, jobs=jobs, concurrency=concurrency,
+                token_budget=token_budget,
+                cache=None if no_cache or dry_run else cache.CompletionCache(),
+                on_record=report,
+            )
+
+    records = asyncio.run(run())
+    if any(record.error for record in records):
         raise typer.Exit(code=1)
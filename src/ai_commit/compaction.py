@@ -0,0 +1,286 @@
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Iterable, Optional
+
+from ai_commit import config
+from ai_commit.diff_parser import FileDiff, iter_file_diffs
+from ai_commit.tokens import estimate_tokens
+
+LOCKFILE_PATTERNS = [
+    "*package-lock.json", "*yarn.lock", "*pnpm-lock.yaml", "*poetry.lock",
+    "*Pipfile.lock", "*uv.lock", "*Cargo.lock", "*Gemfile.lock",
+    "*composer.lock", "*go.sum",
+]
+
+GENERATED_PATTERNS = [
+    "*.min.js", "*.min.css", "*.map", "*_pb2.py", "*.pb.go", "*.snap",
+    "vendor/*", "*/vendor/*", "node_modules/*", "*/node_modules/*",
+    "dist/*", "build/*",
+]
+
+LOW_PRIORITY_PATTERNS = ["*.md", "*.rst", "*.txt", "docs/*", "*.json", "*.yaml",
+                         "*.yml", "*.toml", "*.cfg", "*.ini"]
+
+TEST_PATTERNS = ["test_*", "*_test.*", "*/test_*", "tests/*", "*/tests/*",
+                 "*.spec.*", "*.test.*"]
+
+# Hunks larger than this share of the budget are truncated, so one huge hunk
+# cannot crowd out every other change.
+MAX_HUNK_SHARE = 0.25
+HUNK_HEAD_LINES = 20
+
+
+@dataclass
+class CompactionResult:
+    """
+    The outcome of fitting a diff into a token budget.
+
+    Attributes:
+        diff: The compacted diff to send to the model.
+        elided: Human-readable notes describing what was dropped or shortened.
+        original_tokens: The estimated token count before compaction.
+        tokens: The estimated token count after compaction.
+    """
+    diff: str
+    elided: list[str] = field(default_factory=list)
+    original_tokens: int = 0
+    tokens: int = 0
+
+
+def _matches(path: str, patterns: list[str]) -> bool:
+    return any(fnmatch(path, pattern) for pattern in patterns)
+
+
+def _low_value_reason(file: FileDiff) -> Optional[str]:
+    """Returns why a file is not worth showing to the model, if it isn't."""
+    if file.is_binary:
+        return "binary file"
+    if _matches(file.path, LOCKFILE_PATTERNS):
+        return "lockfile"
+    if _matches(file.path, GENERATED_PATTERNS):
+        return "generated or vendored file"
+    if any(len(line) > 500 for line in file.text.splitlines()):
+        return "minified content"
+    return None
+
+
+def _priority(file: FileDiff) -> int:
+    """Ranks a file's importance to the commit message; higher is better."""
+    if _matches(file.path, TEST_PATTERNS):
+        return 1
+    if _matches(file.path, LOW_PRIORITY_PATTERNS):
+        return 0
+    return 2
+
+
+def _changed_lines(text: str) -> int:
+    return sum(
+        1 for line in text.splitlines()
+        if line[:1] in ("+", "-") and not line.startswith(("+++", "---"))
+    )
+
+
+def _summary(file: FileDiff, reason: str, changed: Optional[int] = None) -> str:
+    """A one-line stand-in for a file whose content was elided."""
+    if changed is None:
+        changed = _changed_lines(file.text)
+    return (
+        f"{file.header.splitlines()[0]}\n"
+        f"# {file.path}: {changed} changed lines elided ({reason})\n"
+    )
+
+
+def _truncate_hunk(hunk: str, max_tokens: int) -> str:
+    """Keeps the head of an oversized hunk and notes how much was cut."""
+    lines = hunk.splitlines(keepends=True)
+    head = lines[:HUNK_HEAD_LINES]
+    while len(head) > 1 and estimate_tokens("".join(head)) > max_tokens:
+        head.pop()
+    omitted = len(lines) - len(head)
+    return "".join(head) + f"# ... {omitted} more lines in this hunk elided\n"
+
+
+def _fit_hunks(
+    file: FileDiff, hunks: list[str], budget: int, changed: Optional[int] = None
+) -> str:
+    """
+    Keeps as many of a file's hunks as fit in `budget`, smallest first.
+
+    Falls back to a one-line summary when not even one hunk fits.
+    """
+    available = budget - estimate_tokens(file.header)
+    kept = set()
+    for position in sorted(range(len(hunks)), key=lambda i: len(hunks[i])):
+        cost = estimate_tokens(hunks[position])
+        if cost > available:
+            break
+        kept.add(position)
+        available -= cost
+    if not kept:
+        return _summary(file, "over token budget", changed)
+    omitted = len(hunks) - len(kept)
+    return (
+        file.header
+        + "".join(hunk for i, hunk in enumerate(hunks) if i in kept)
+        + f"# ... {omitted} more hunks in {file.path} elided\n"
+    )
+
+
+class Compactor:
+    """
+    Compacts a diff file by file, as the files arrive.
+
+    Files are kept verbatim while the whole diff fits in the budget. Once it
+    does not, low-value files (lockfiles, generated or vendored code,
+    minified content and binary files) are replaced by a one-line summary
+    and hunks larger than a quarter of the budget are truncated. Whenever
+    the kept files overflow the budget, the least important one (docs and
+    configuration before tests before source, larger before smaller) is cut
+    down to what is left of the budget or summarized.
+
+    Only what may still be sent is held, so memory stays bounded by the
+    budget plus the largest single file, however large the diff.
+    """
+
+    def __init__(self, budget: Optional[int] = None):
+        """
+        Args:
+            budget: The token budget. Defaults to `config.get_token_budget()`.
+        """
+        self.budget = budget if budget is not None else config.get_token_budget()
+        self.max_hunk_tokens = max(1, int(self.budget * MAX_HUNK_SHARE))
+        self.original_tokens = 0
+        self.elided: list[str] = []
+        # Files seen while the diff still fits, or None once it does not.
+        self._verbatim: Optional[list[FileDiff]] = []
+        self._sections: list[str] = []
+        # Files that may still be cut down, by position:
+        # (priority, header-only file, hunks, changed lines, tokens).
+        self._candidates: dict[int, tuple] = {}
+        self._fixed_tokens = 0
+        self._candidate_tokens = 0
+
+    def add(self, file: FileDiff) -> None:
+        """Takes in the next file of the diff."""
+        self.original_tokens += estimate_tokens(file.text)
+        if self._verbatim is None:
+            self._admit(file)
+            return
+        self._verbatim.append(file)
+        if self.original_tokens > self.budget:
+            files, self._verbatim = self._verbatim, None
+            for pending in files:
+                self._admit(pending)
+
+    def _admit(self, file: FileDiff) -> None:
+        position = len(self._sections)
+        if not file.hunks and not file.is_binary:
+            # Nothing to trim: a mode change, an empty file, or a stand-in
+            # for a file whose hunks were never fetched.
+            self._fix(position, file.header)
+            return
+        reason = _low_value_reason(file)
+        if reason:
+            self._fix(position, _summary(file, reason))
+            self.elided.append(f"{file.path} ({reason})")
+            return
+
+        hunks = []
+        for hunk in file.hunks:
+            if estimate_tokens(hunk) > self.max_hunk_tokens:
+                hunk = _truncate_hunk(hunk, self.max_hunk_tokens)
+                self.elided.append(f"{file.path} (large hunk truncated)")
+            hunks.append(hunk)
+        text = file.header + "".join(hunks)
+        tokens = estimate_tokens(text)
+        self._sections.append(text)
+        self._candidates[position] = (
+            _priority(file), FileDiff(file.path, file.header), hunks,
+            _changed_lines(file.text), tokens,
+        )
+        self._candidate_tokens += tokens
+        self._shrink()
+
+    def _fix(self, position: int, section: str) -> None:
+        """Records a section that will not be cut down any further."""
+        if position == len(self._sections):
+            self._sections.append(section)
+        else:
+            self._sections[position] = section
+        self._fixed_tokens += estimate_tokens(section)
+
+    def _shrink(self) -> None:
+        """Cuts down the least important files until the rest fit."""
+        while (self._candidates
+               and self._fixed_tokens + self._candidate_tokens > self.budget):
+            position = max(
+                self._candidates,
+                key=lambda p: (-self._candidates[p][0], self._candidates[p][4], p),
+            )
+            _, file, hunks, changed, tokens = self._candidates.pop(position)
+            self._candidate_tokens -= tokens
+            remaining = self.budget - self._fixed_tokens - self._candidate_tokens
+            self._fix(position, _fit_hunks(file, hunks, remaining, changed))
+            self.elided.append(f"{file.path} (over token budget)")
+
+    def result(self) -> CompactionResult:
+        """The compacted diff of every file added so far."""
+        if self._verbatim is not None:
+            diff = "".join(file.text for file in self._verbatim)
+            return CompactionResult(
+                diff=diff, original_tokens=self.original_tokens,
+                tokens=self.original_tokens,
+            )
+        diff = "".join(self._sections)
+        return CompactionResult(
+            diff=diff,
+            elided=self.elided,
+            original_tokens=self.original_tokens,
+            tokens=estimate_tokens(diff),
+        )
+
+
+def compact_files(
+    files: Iterable[FileDiff], budget: Optional[int] = None
+) -> CompactionResult:
+    """
+    Compacts a diff given file by file, e.g. by `diff_parser.iter_file_diffs`.
+
+    See `Compactor` for how files are chosen and shortened.
+    """
+    compactor = Compactor(budget)
+    for file in files:
+        compactor.add(file)
+    return compactor.result()
+
+
+def compact_diff(diff: str, budget: Optional[int] = None) -> CompactionResult:
+    """
+    Shrinks a diff so its estimated size fits within a token budget.
+
+    A diff that already fits is returned unchanged. Otherwise low-value files
+    are summarized, oversized hunks truncated and the least important files
+    cut down until the rest fit (see `Compactor`). Files keep their original
+    order.
+
+    Args:
+        diff: The unified git diff to compact.
+        budget: The token budget. Defaults to `config.get_token_budget()`.
+
+    Returns:
+        A CompactionResult with the compacted diff and what was elided.
+    """
+    budget = budget if budget is not None else config.get_token_budget()
+    original_tokens = estimate_tokens(diff)
+    if original_tokens <= budget:
+        return CompactionResult(
+            diff=diff, original_tokens=original_tokens, tokens=original_tokens
+        )
+    result = compact_files(iter_file_diffs([diff]), budget)
+    if not result.diff:
+        # Nothing git-shaped to compact.
+        return CompactionResult(
+            diff=diff, original_tokens=original_tokens, tokens=original_tokens
+        )
+    result.original_tokens = original_tokens
+    return result
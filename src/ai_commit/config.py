@@ -1,4 +1,6 @@
 import os
+from pathlib import Path
+from typing import Optional
 
 
 def _get_env_var(name: str, default: str) -> str:
@@ -12,14 +14,60 @@ def _get_env_var(name: str, default: str) -> str:
     return value
 
 
+def _get_float_env_var(name: str, default: float) -> float:
+    """
+    Retrieves a numeric environment variable, returning a default if not set.
+    Raises ValueError if the value is empty, not a number or not positive.
+    """
+    raw = _get_env_var(name, str(default))
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValueError(f"{name} environment variable must be a number.") from None
+    if value <= 0:
+        raise ValueError(f"{name} environment variable must be positive.")
+    return value
+
+
+def _get_int_env_var(name: str, default: int) -> int:
+    """
+    Retrieves an integer environment variable, returning a default if not set.
+    Raises ValueError if the value is empty, not an integer or not positive.
+    """
+    raw = _get_env_var(name, str(default))
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"{name} environment variable must be an integer.") from None
+    if value <= 0:
+        raise ValueError(f"{name} environment variable must be positive.")
+    return value
+
+
+def get_ollama_urls() -> list[str]:
+    """
+    Returns the Ollama API URLs to spread requests across.
+
+    - Defaults to ["http://localhost:11434"].
+    - Can be overridden by the OLLAMA_URL environment variable, which takes
+      one URL or several separated by commas.
+    """
+    raw = _get_env_var("OLLAMA_URL", "http://localhost:11434")
+    urls = [url.strip().rstrip("/") for url in raw.split(",") if url.strip()]
+    if not urls:
+        raise ValueError("OLLAMA_URL environment variable must contain a URL.")
+    return urls
+
+
 def get_ollama_url() -> str:
     """
     Returns the Ollama API URL.
 
     - Defaults to "http://localhost:11434".
-    - Can be overridden by the OLLAMA_URL environment variable.
+    - Can be overridden by the OLLAMA_URL environment variable. When it lists
+      several URLs, the first is returned.
     """
-    return _get_env_var("OLLAMA_URL", "http://localhost:11434")
+    return get_ollama_urls()[0]
 
 
 def get_ollama_model() -> str:
@@ -30,3 +78,348 @@ def get_ollama_model() -> str:
     - Can be overridden by the OLLAMA_MODEL environment variable.
     """
     return _get_env_var("OLLAMA_MODEL", "llama3.2")
+
+
+def get_ollama_keep_alive() -> str:
+    """
+    Returns how long Ollama should keep the model loaded after a request.
+
+    Accepts Ollama's duration format (e.g. "30m", "1h", or "-1" for forever).
+
+    - Defaults to "30m", so the model stays resident between commits.
+    - Can be overridden by the OLLAMA_KEEP_ALIVE environment variable.
+    """
+    return _get_env_var("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def get_ollama_api() -> str:
+    """
+    Returns which Ollama endpoint completions are requested from.
+
+    Either way the style prompt is sent apart from the diff, as the system
+    prompt, so every request starts with the same bytes and Ollama can
+    reuse the evaluated prefix from the previous one.
+
+    - Defaults to "generate" (`/api/generate`).
+    - Can be set to "chat" (`/api/chat`) with the OLLAMA_API environment
+      variable.
+    """
+    value = _get_env_var("OLLAMA_API", "generate")
+    if value not in ("generate", "chat"):
+        raise ValueError(
+            "OLLAMA_API environment variable must be 'generate' or 'chat'."
+        )
+    return value
+
+
+def get_backend() -> str:
+    """
+    Returns which kind of inference server completions are requested from.
+
+    - Defaults to "ollama".
+    - Can be set to "openai" with the AI_COMMIT_BACKEND environment variable,
+      for servers exposing the OpenAI-compatible `/v1/chat/completions` API
+      (llama.cpp server, vLLM and the like).
+    """
+    value = _get_env_var("AI_COMMIT_BACKEND", "ollama")
+    if value not in ("ollama", "openai"):
+        raise ValueError(
+            "AI_COMMIT_BACKEND environment variable must be 'ollama' or 'openai'."
+        )
+    return value
+
+
+def get_openai_url() -> str:
+    """
+    Returns the base URL of the OpenAI-compatible server, `/v1` included.
+
+    - Defaults to "http://localhost:8080/v1", where llama.cpp server listens.
+    - Can be overridden by the OPENAI_BASE_URL environment variable.
+    """
+    return _get_env_var("OPENAI_BASE_URL", "http://localhost:8080/v1").rstrip("/")
+
+
+def get_openai_model() -> str:
+    """
+    Returns the model name sent to the OpenAI-compatible server.
+
+    - Defaults to the Ollama model name (see `get_ollama_model`).
+    - Can be overridden by the OPENAI_MODEL environment variable.
+    """
+    return _get_env_var("OPENAI_MODEL", get_ollama_model())
+
+
+def get_openai_api_key() -> Optional[str]:
+    """
+    Returns the API key for the OpenAI-compatible server, if it needs one.
+
+    - Defaults to None: local servers usually accept any request.
+    - Can be set with the OPENAI_API_KEY environment variable.
+    """
+    return os.environ.get("OPENAI_API_KEY") or None
+
+
+def get_ollama_timeout() -> float:
+    """
+    Returns the timeout, in seconds, for a single Ollama request.
+
+    - Defaults to 30 seconds.
+    - Can be overridden by the OLLAMA_TIMEOUT environment variable.
+    """
+    return _get_float_env_var("OLLAMA_TIMEOUT", 30.0)
+
+
+def get_ollama_num_predict() -> int:
+    """
+    Returns the most tokens generated for a request without a style limit.
+
+    Commit message styles set their own, smaller cap (see
+    `prompt_manager.style_options`); this one bounds the rest, such as the
+    summaries of large diffs.
+
+    - Defaults to 128 tokens.
+    - Can be overridden by the OLLAMA_NUM_PREDICT environment variable.
+    """
+    return _get_int_env_var("OLLAMA_NUM_PREDICT", 128)
+
+
+def get_ollama_max_context() -> int:
+    """
+    Returns the largest context window (`num_ctx`) requested from Ollama.
+
+    - Defaults to 32768 tokens.
+    - Can be overridden by the OLLAMA_MAX_NUM_CTX environment variable.
+    """
+    return _get_int_env_var("OLLAMA_MAX_NUM_CTX", 32768)
+
+
+def get_ollama_hedge_percentile() -> Optional[float]:
+    """
+    Returns the latency percentile after which a request is hedged.
+
+    When an endpoint takes longer than this percentile of recent response
+    times, the same request is also sent to another endpoint.
+
+    - Defaults to None: requests are not hedged.
+    - Can be set with the OLLAMA_HEDGE_PERCENTILE environment variable
+      (e.g. 95), which must be below 100.
+    """
+    if "OLLAMA_HEDGE_PERCENTILE" not in os.environ:
+        return None
+    value = _get_float_env_var("OLLAMA_HEDGE_PERCENTILE", 95.0)
+    if value >= 100:
+        raise ValueError(
+            "OLLAMA_HEDGE_PERCENTILE environment variable must be below 100."
+        )
+    return value
+
+
+def get_ollama_max_retries() -> int:
+    """
+    Returns how many times a failed Ollama request is retried.
+
+    Only connection errors and server errors (including the 503 Ollama
+    returns while a model loads) are retried.
+
+    - Defaults to 2. Set to 0 to disable retries.
+    - Can be overridden by the OLLAMA_MAX_RETRIES environment variable.
+    """
+    raw = _get_env_var("OLLAMA_MAX_RETRIES", "2")
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(
+            "OLLAMA_MAX_RETRIES environment variable must be an integer."
+        ) from None
+    if value < 0:
+        raise ValueError("OLLAMA_MAX_RETRIES environment variable cannot be negative.")
+    return value
+
+
+def get_ollama_retry_backoff() -> float:
+    """
+    Returns the base delay, in seconds, before retrying an Ollama request.
+
+    The delay doubles with each attempt and is randomly jittered.
+
+    - Defaults to 0.5 seconds.
+    - Can be overridden by the OLLAMA_RETRY_BACKOFF environment variable.
+    """
+    return _get_float_env_var("OLLAMA_RETRY_BACKOFF", 0.5)
+
+
+def get_breaker_threshold() -> int:
+    """
+    Returns how many consecutive failures open an endpoint's circuit breaker.
+
+    - Defaults to 3.
+    - Can be overridden by the AI_COMMIT_BREAKER_THRESHOLD environment variable.
+    """
+    return _get_int_env_var("AI_COMMIT_BREAKER_THRESHOLD", 3)
+
+
+def get_breaker_cooldown() -> float:
+    """
+    Returns how long, in seconds, an open circuit breaker fails fast.
+
+    - Defaults to 30 seconds.
+    - Can be overridden by the AI_COMMIT_BREAKER_COOLDOWN environment variable.
+    """
+    return _get_float_env_var("AI_COMMIT_BREAKER_COOLDOWN", 30.0)
+
+
+def get_ollama_max_connections() -> int:
+    """
+    Returns the maximum number of concurrent connections to Ollama.
+
+    - Defaults to 10.
+    - Can be overridden by the OLLAMA_MAX_CONNECTIONS environment variable.
+    """
+    return _get_int_env_var("OLLAMA_MAX_CONNECTIONS", 10)
+
+
+def get_ollama_max_keepalive() -> int:
+    """
+    Returns the maximum number of idle connections kept open to Ollama.
+
+    - Defaults to 5.
+    - Can be overridden by the OLLAMA_MAX_KEEPALIVE environment variable.
+    """
+    return _get_int_env_var("OLLAMA_MAX_KEEPALIVE", 5)
+
+
+def get_cache_dir() -> Path:
+    """
+    Returns the directory used for cached completions.
+
+    - Defaults to "ai-commit" under $XDG_CACHE_HOME (or ~/.cache).
+    - Can be overridden by the AI_COMMIT_CACHE_DIR environment variable.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(_get_env_var("AI_COMMIT_CACHE_DIR", str(Path(base) / "ai-commit")))
+
+
+def get_cache_max_entries() -> int:
+    """
+    Returns the maximum number of cached completions kept on disk.
+
+    - Defaults to 500.
+    - Can be overridden by the AI_COMMIT_CACHE_MAX_ENTRIES environment variable.
+    """
+    return _get_int_env_var("AI_COMMIT_CACHE_MAX_ENTRIES", 500)
+
+
+def get_cache_max_age() -> float:
+    """
+    Returns the age, in seconds, after which a cached completion expires.
+
+    - Defaults to 7 days.
+    - Can be overridden by the AI_COMMIT_CACHE_MAX_AGE environment variable.
+    """
+    return _get_float_env_var("AI_COMMIT_CACHE_MAX_AGE", 7 * 24 * 60 * 60.0)
+
+
+def get_token_budget() -> int:
+    """
+    Returns the estimated token budget for the diff sent to the model.
+
+    - Defaults to 3000 tokens.
+    - Can be overridden by the AI_COMMIT_TOKEN_BUDGET environment variable.
+    """
+    return _get_int_env_var("AI_COMMIT_TOKEN_BUDGET", 3000)
+
+
+def get_max_concurrency() -> int:
+    """
+    Returns how many model requests may run at the same time.
+
+    - Defaults to 4.
+    - Can be overridden by the AI_COMMIT_MAX_CONCURRENCY environment variable.
+    """
+    return _get_int_env_var("AI_COMMIT_MAX_CONCURRENCY", 4)
+
+
+def get_batch_max_size() -> int:
+    """
+    Returns how many completions may be sent together in one batch request.
+
+    Only used with providers that accept batched prompts.
+
+    - Defaults to 8.
+    - Can be overridden by the AI_COMMIT_BATCH_MAX_SIZE environment variable.
+    """
+    return _get_int_env_var("AI_COMMIT_BATCH_MAX_SIZE", 8)
+
+
+def get_batch_max_wait() -> float:
+    """
+    Returns how long, in seconds, a completion waits for others to batch with.
+
+    - Defaults to 0.01 seconds.
+    - Can be overridden by the AI_COMMIT_BATCH_MAX_WAIT environment variable.
+    """
+    return _get_float_env_var("AI_COMMIT_BATCH_MAX_WAIT", 0.01)
+
+
+def get_git_timeout() -> float:
+    """
+    Returns the timeout, in seconds, for a single git command.
+
+    - Defaults to 30 seconds.
+    - Can be overridden by the AI_COMMIT_GIT_TIMEOUT environment variable.
+    """
+    return _get_float_env_var("AI_COMMIT_GIT_TIMEOUT", 30.0)
+
+
+def get_daemon_socket() -> Path:
+    """
+    Returns the Unix socket path the ai-commit daemon listens on.
+
+    - Defaults to "ai-commit.sock" under $XDG_RUNTIME_DIR, or under the
+      cache directory when that is not set.
+    - Can be overridden by the AI_COMMIT_SOCKET environment variable.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    default = Path(runtime_dir) if runtime_dir else get_cache_dir()
+    return Path(_get_env_var("AI_COMMIT_SOCKET", str(default / "ai-commit.sock")))
+
+
+def get_candidate_timeout() -> float:
+    """
+    Returns the wall-clock limit, in seconds, for best-of-N generation.
+
+    When it expires, the best candidate finished so far is used.
+
+    - Defaults to 10 seconds.
+    - Can be overridden by the AI_COMMIT_CANDIDATE_TIMEOUT environment variable.
+    """
+    return _get_float_env_var("AI_COMMIT_CANDIDATE_TIMEOUT", 10.0)
+
+
+def get_diff_max_bytes() -> int:
+    """
+    Returns the most staged diff output, in bytes, read from git.
+
+    Files are fetched smallest first until their estimated size reaches the
+    cap, and git is stopped if its output goes past it.
+
+    - Defaults to 1 MB.
+    - Can be overridden by the AI_COMMIT_DIFF_MAX_BYTES environment variable.
+    """
+    return _get_int_env_var("AI_COMMIT_DIFF_MAX_BYTES", 1_000_000)
+
+
+def get_diff_exclude() -> Optional[list[str]]:
+    """
+    Returns the patterns of staged files whose hunks are never fetched.
+
+    - Defaults to None: lockfiles and generated or vendored files are left
+      out.
+    - Can be overridden by the AI_COMMIT_DIFF_EXCLUDE environment variable,
+      a comma-separated list of fnmatch-style patterns (e.g.
+      "third_party/*,*.lock"). Set it to an empty string to fetch every file.
+    """
+    raw = os.environ.get("AI_COMMIT_DIFF_EXCLUDE")
+    if raw is None:
+        return None
+    return [pattern.strip() for pattern in raw.split(",") if pattern.strip()]
@@ -0,0 +1,177 @@
+import asyncio
+import contextlib
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Optional
+
+from ai_commit import cache, config, deadline, prompt_manager, service
+from ai_commit.llm_provider import (
+    CoalescingProvider,
+    LLMProvider,
+    OllamaConnectionError,
+    create_provider,
+)
+
+
+class DaemonAlreadyRunning(Exception):
+    """Raised when another daemon is already listening on the socket."""
+    pass
+
+
+class CommitDaemon:
+    """
+    A long-running generation server for the ai-commit CLI.
+
+    The daemon keeps one provider (and its pooled connections), the loaded
+    prompt styles and the completion cache alive between commits, and
+    serves generation requests from `daemon_client` over a Unix socket.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        completion_cache: Optional[cache.CompletionCache] = None,
+        summary_cache: Optional[cache.SummaryCache] = None,
+    ):
+        self.provider = provider
+        self.completion_cache = completion_cache
+        self.summary_cache = summary_cache
+        self.requests_served = 0
+
+    async def _send(self, writer: asyncio.StreamWriter, event: dict) -> None:
+        writer.write(json.dumps(event).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    async def _generate(self, request: dict, writer: asyncio.StreamWriter) -> None:
+        """Streams the events for one generation request."""
+        style = request.get("style") or "conventional"
+        prompt_manager.load_style(style)
+        prepared = await service.prepare_prompt(
+            request["diff"],
+            self.provider,
+            token_budget=request.get("token_budget"),
+            map_reduce=bool(request.get("map_reduce")),
+            incremental=bool(request.get("incremental")),
+            summary_cache=(
+                self.summary_cache if request.get("use_cache", True) else None
+            ),
+        )
+        if prepared.elided:
+            await self._send(writer, {
+                "elided": prepared.elided,
+                "original_tokens": prepared.original_tokens,
+                "tokens": prepared.tokens,
+            })
+
+        candidates = int(request.get("candidates") or 1)
+        if candidates > 1:
+            message = await service.generate_best_commit(
+                prepared.user_prompt, style, self.provider,
+                candidates, request.get("candidate_timeout"),
+            )
+            await self._send(writer, {"token": message})
+            await self._send(writer, {"done": True, "cached": False})
+            return
+
+        completion_cache = None
+        if prepared.cacheable and request.get("use_cache", True):
+            completion_cache = self.completion_cache
+        hits = completion_cache.stats.hits if completion_cache else 0
+
+        async for token in service.stream_commit(
+            diff=prepared.user_prompt,
+            style=style,
+            provider=self.provider,
+            cache=completion_cache,
+        ):
+            await self._send(writer, {"token": token})
+
+        cached = completion_cache is not None and completion_cache.stats.hits > hits
+        await self._send(writer, {"done": True, "cached": cached})
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serves a single request from a connected client."""
+        try:
+            request = json.loads(await reader.readline())
+            command = request.get("command")
+            if command == "generate":
+                with deadline.within(request.get("timeout")):
+                    await self._generate(request, writer)
+            elif command == "ping":
+                await self._send(writer, {
+                    "done": True, "pid": os.getpid(),
+                    "requests_served": self.requests_served,
+                })
+            else:
+                raise ValueError(f"Unknown daemon command: {command!r}")
+            self.requests_served += 1
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The client went away; nothing left to tell it.
+            pass
+        except Exception as e:
+            with contextlib.suppress(ConnectionError):
+                await self._send(writer, {"error": str(e), "kind": type(e).__name__})
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def start(self, socket_path: Path) -> asyncio.AbstractServer:
+        """
+        Starts listening on `socket_path`.
+
+        A stale socket left behind by a daemon that died is replaced.
+
+        Raises:
+            DaemonAlreadyRunning: If a live daemon already owns the socket.
+        """
+        if socket_path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(socket_path))
+            except OSError:
+                socket_path.unlink()
+            else:
+                raise DaemonAlreadyRunning(
+                    f"An ai-commit daemon is already listening on {socket_path}."
+                )
+            finally:
+                probe.close()
+
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        server = await asyncio.start_unix_server(
+            self.handle_connection, path=str(socket_path)
+        )
+        # Diffs can contain secrets; only the owner may talk to the daemon.
+        socket_path.chmod(0o600)
+        return server
+
+
+async def serve(socket_path: Optional[Path] = None) -> None:
+    """
+    Runs the daemon with the configured Ollama provider until cancelled.
+
+    Args:
+        socket_path: Where to listen. Defaults to `config.get_daemon_socket()`.
+    """
+    socket_path = socket_path or config.get_daemon_socket()
+    for style in prompt_manager.list_styles():
+        prompt_manager.load_style(style)
+
+    # Clients asking for the same completion at once share one request.
+    async with CoalescingProvider(create_provider()) as provider:
+        daemon = CommitDaemon(
+            provider, cache.CompletionCache(), cache.SummaryCache()
+        )
+        server = await daemon.start(socket_path)
+        try:
+            with contextlib.suppress(OllamaConnectionError):
+                await provider.warm_up()
+            async with server:
+                await server.serve_forever()
+        finally:
+            socket_path.unlink(missing_ok=True)
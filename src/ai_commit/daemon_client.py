@@ -0,0 +1,292 @@
+import itertools
+import json
+import math
+import socket
+import subprocess
+from pathlib import Path
+from typing import Iterator, NoReturn, Optional
+
+import typer
+
+from ai_commit import config, deadline, git_integration, tokens
+
+# How long to wait for the daemon to accept a connection. The socket is
+# local, so anything slower means the daemon is not healthy.
+CONNECT_TIMEOUT = 0.5
+# Failures inside the daemon that come from reaching the model.
+OLLAMA_ERROR_KINDS = {"OllamaConnectionError", "CircuitOpenError", "DeadlineExceeded"}
+
+
+class DaemonUnavailable(Exception):
+    """Raised when no ai-commit daemon is accepting connections or answering."""
+    pass
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon reports that a request failed.
+
+    Attributes:
+        kind: The name of the exception raised inside the daemon,
+              e.g. "KeyError" or "OllamaConnectionError".
+    """
+
+    def __init__(self, message: str, kind: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+def connect(socket_path: Optional[Path] = None) -> socket.socket:
+    """
+    Opens a connection to the daemon.
+
+    Args:
+        socket_path: The daemon's socket. Defaults to `config.get_daemon_socket()`.
+
+    Raises:
+        DaemonUnavailable: If Unix sockets are unsupported or nothing is
+                           listening on the socket.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise DaemonUnavailable("Unix sockets are not supported on this platform.")
+    path = socket_path or config.get_daemon_socket()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+    except OSError as e:
+        sock.close()
+        raise DaemonUnavailable(f"No ai-commit daemon at {path}: {e}") from e
+    return sock
+
+
+def read_timeout(request: dict) -> float:
+    """
+    How long the daemon may stay silent before a request is given up on.
+
+    A request's own timeout, or the deadline the client runs under, bounds
+    it. Otherwise the limit covers the daemon's slowest path: every model
+    call exhausting its retries and backoff, once per round of map-reduce
+    summaries, plus the wait for best-of-N candidates.
+    """
+    if request.get("timeout") is not None:
+        return request["timeout"] + CONNECT_TIMEOUT
+    remaining = deadline.remaining()
+    if remaining is not None:
+        return max(remaining, 0.0) + CONNECT_TIMEOUT
+
+    retries = config.get_ollama_max_retries()
+    call = (
+        config.get_ollama_timeout() * (retries + 1)
+        # Each retry waits up to 1.5 times its exponential backoff.
+        + config.get_ollama_retry_backoff() * 1.5 * (2 ** retries - 1)
+    )
+    rounds = 1
+    if request.get("map_reduce") or request.get("incremental"):
+        diff = request.get("diff", "")
+        summaries = max(
+            diff.count("diff --git "),
+            math.ceil(tokens.estimate_tokens(diff) / config.get_token_budget()),
+        )
+        rounds += math.ceil(summaries / config.get_max_concurrency())
+    limit = call * rounds + CONNECT_TIMEOUT
+    if int(request.get("candidates") or 1) > 1:
+        limit += request.get("candidate_timeout") or config.get_candidate_timeout()
+    return limit
+
+
+def request_events(
+    request: dict,
+    socket_path: Optional[Path] = None,
+    sock: Optional[socket.socket] = None,
+) -> Iterator[dict]:
+    """
+    Sends one request to the daemon and yields the events it answers with.
+
+    The protocol is newline-delimited JSON in both directions: the client
+    sends a single request object, and the daemon replies with a series of
+    event objects, ending with one containing "done" or "error".
+
+    Args:
+        request: The request object.
+        socket_path: The daemon's socket, used when `sock` is not given.
+        sock: An open connection from `connect()`, which is closed once
+              the daemon has answered.
+
+    Raises:
+        DaemonUnavailable: If the daemon cannot be reached, stays silent for
+                           longer than `read_timeout()` allows, or answers
+                           with something that is not an event.
+        DaemonError: If the daemon reports a failure.
+    """
+    sock = sock or connect(socket_path)
+    with sock:
+        sock.settimeout(read_timeout(request))
+        try:
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        except OSError as e:
+            raise DaemonUnavailable(f"The daemon went away: {e}") from e
+        with sock.makefile("rb") as reader:
+            while True:
+                try:
+                    line = reader.readline()
+                    event = json.loads(line) if line else None
+                except OSError as e:
+                    raise DaemonUnavailable(
+                        f"The daemon stopped answering: {e}"
+                    ) from e
+                except ValueError as e:
+                    raise DaemonUnavailable(
+                        f"The daemon sent an invalid reply: {e}"
+                    ) from e
+                if event is None:
+                    break
+                if "error" in event:
+                    raise DaemonError(event["error"], event.get("kind", "Exception"))
+                yield event
+                if event.get("done"):
+                    return
+    raise DaemonError("The daemon closed the connection early.", "ConnectionError")
+
+
+def stream_commit(
+    diff: str,
+    style: str,
+    token_budget: Optional[int] = None,
+    map_reduce: bool = False,
+    use_cache: bool = True,
+    candidates: int = 1,
+    candidate_timeout: Optional[float] = None,
+    timeout: Optional[float] = None,
+    incremental: bool = False,
+    socket_path: Optional[Path] = None,
+    sock: Optional[socket.socket] = None,
+) -> Iterator[dict]:
+    """
+    Asks the daemon to generate a commit message for `diff`.
+
+    Yields the daemon's events: {"elided": [...], ...} when the diff was
+    compacted, {"token": "..."} for each fragment of the message, and a final
+    {"done": true, "cached": bool}.
+    """
+    request = {
+        "command": "generate",
+        "diff": diff,
+        "style": style,
+        "token_budget": token_budget,
+        "map_reduce": map_reduce,
+        "incremental": incremental,
+        "use_cache": use_cache,
+        "candidates": candidates,
+        "candidate_timeout": candidate_timeout,
+        "timeout": timeout,
+    }
+    return request_events(request, socket_path, sock)
+
+
+def _commit_interactively(message: str, message_file: Optional[str] = None) -> None:
+    """The y/n/e confirmation loop, using only what typer already provides."""
+    while True:
+        choice = typer.prompt(
+            "Commit with this message? [y/n/e]", default="y", show_default=False
+        ).strip().lower()
+        if choice == "y":
+            if message_file:
+                git_integration.write_message_file(message_file, message)
+                typer.secho("✔ Message ready for git.", fg="green", bold=True)
+                return
+            git_integration.commit(message)
+            typer.secho("✔ Commit successful!", fg="green", bold=True)
+            return
+        if choice == "e":
+            edited = typer.edit(message, extension=".txt")
+            message = edited.strip() if edited and edited.strip() else message
+            typer.secho("\nGenerated Commit Message:", fg="green", bold=True)
+            typer.secho(f"{message}\n", fg="cyan")
+        elif choice == "n":
+            typer.secho("Commit aborted.", fg="yellow")
+            return
+
+
+def _fail(error: Exception) -> NoReturn:
+    """Reports a request that failed once output had started, and exits."""
+    kind = getattr(error, "kind", None)
+    label = "Ollama Error" if kind in OLLAMA_ERROR_KINDS else "Error"
+    typer.secho(f"\n{label}: {error}", fg="red", bold=True)
+    raise typer.Exit(code=1)
+
+
+def run_generate(
+    style: str,
+    token_budget: Optional[int] = None,
+    map_reduce: bool = False,
+    print_commit: bool = False,
+    use_cache: bool = True,
+    candidates: int = 1,
+    candidate_timeout: Optional[float] = None,
+    timeout: Optional[float] = None,
+    incremental: bool = False,
+    message_file: Optional[str] = None,
+) -> None:
+    """
+    The main command's fast path: generation is delegated to the daemon.
+
+    Only the standard library and typer are needed here, so the hook pays
+    for neither the HTTP client nor rich.
+
+    Raises:
+        DaemonUnavailable: If no daemon is running or it failed to answer
+                           before anything was printed, so the caller can
+                           fall back to in-process generation.
+    """
+    # Connect before touching git: without a daemon the caller reads the
+    # diff itself, and should not have to wait for it being read twice.
+    sock = connect()
+    try:
+        diff = git_integration.get_staged_diff_capped()
+    except git_integration.NoStagedChanges as e:
+        sock.close()
+        typer.secho(f"Error: {e}", fg="red", bold=True)
+        raise typer.Exit(code=1)
+    except subprocess.CalledProcessError as e:
+        sock.close()
+        typer.secho(f"Error: {(e.stderr or '').strip() or e}", fg="red", bold=True)
+        raise typer.Exit(code=1)
+
+    events = stream_commit(
+        diff, style, token_budget=token_budget,
+        map_reduce=map_reduce, use_cache=use_cache,
+        candidates=candidates, candidate_timeout=candidate_timeout,
+        timeout=timeout, incremental=incremental, sock=sock,
+    )
+    fragments = []
+    try:
+        # The request is sent on the first event; DaemonUnavailable escapes
+        # from here, before anything has been printed, if the daemon died.
+        first = next(events)
+    except DaemonError as e:
+        _fail(e)
+    typer.secho("Generating commit message (daemon)...", fg="blue")
+    try:
+        for event in itertools.chain([first], events):
+            if "elided" in event:
+                typer.secho(
+                    f"Diff trimmed from ~{event['original_tokens']} to "
+                    f"~{event['tokens']} tokens. Elided:", fg="yellow"
+                )
+                for note in event["elided"]:
+                    typer.secho(f"  - {note}", fg="yellow")
+            elif "token" in event:
+                if not fragments:
+                    typer.secho("\nGenerated Commit Message:", fg="green", bold=True)
+                fragments.append(event["token"])
+                typer.secho(event["token"], fg="cyan", nl=False)
+            elif event.get("cached"):
+                typer.secho("\n(loaded from cache)", dim=True, nl=False)
+    except (DaemonError, DaemonUnavailable) as e:
+        _fail(e)
+    typer.echo()
+
+    if not print_commit:
+        typer.echo()
+        _commit_interactively("".join(fragments).strip(), message_file)
@@ -0,0 +1,34 @@
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# The monotonic time by which the current operation must finish. Tasks
+# inherit it from the context they are created in.
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def within(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Gives everything run inside the block at most `seconds` to finish.
+
+    An earlier deadline that is already in force is kept. With `seconds`
+    set to None, the block runs under whatever deadline already applies.
+    """
+    if seconds is None:
+        yield
+        return
+    expires = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
@@ -0,0 +1,227 @@
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+
+_QUOTED = r'"(?:[^"\\]|\\.)*"'
+_DIFF_HEADER = re.compile(rf"^diff --git ({_QUOTED}|a/.*) ({_QUOTED}|b/.*)$")
+_RENAME_FROM = re.compile(r"^(?:rename|copy) from (.*)$", re.MULTILINE)
+# The lines that start a file or a hunk.
+_SECTION_START = re.compile(r"^(?:diff --git |@@)", re.MULTILINE)
+_INDEX_LINE = re.compile(r"^index ([0-9a-f]+)\.\.([0-9a-f]+)", re.MULTILINE)
+_ESCAPE = re.compile(rb"\\([0-7]{3}|.)")
+_ESCAPES = {
+    b"a": b"\a", b"b": b"\b", b"t": b"\t", b"n": b"\n",
+    b"v": b"\v", b"f": b"\f", b"r": b"\r",
+}
+
+
+def _unquote_path(path: str) -> str:
+    """
+    Undoes git's C-style quoting of a path, as in `"caf\\303\\251.py"`.
+
+    Git quotes paths with unusual characters unless core.quotePath is off.
+    Unquoted paths are returned as they are; bytes that are not UTF-8 are
+    kept as surrogate escapes, so the path can still be handed back to git.
+    """
+    if not path.startswith('"'):
+        return path
+
+    def unescape(match: re.Match) -> bytes:
+        code = match.group(1)
+        if len(code) == 3:
+            return bytes([int(code, 8) & 0xFF])
+        return _ESCAPES.get(code, code)
+
+    raw = _ESCAPE.sub(unescape, path[1:-1].encode("utf-8", "surrogateescape"))
+    return raw.decode("utf-8", "surrogateescape")
+
+
+def _header_paths(line: str) -> Optional[tuple[str, str]]:
+    """The old and new paths on a `diff --git` line, if it has the usual form."""
+    match = _DIFF_HEADER.match(line.rstrip("\n"))
+    if not match:
+        return None
+    old, new = match.groups()
+    return _unquote_path(old)[2:], _unquote_path(new)[2:]
+
+
+@dataclass
+class FileDiff:
+    """
+    The part of a unified git diff that concerns a single file.
+
+    Attributes:
+        path: The path of the file after the change.
+        header: The lines from `diff --git` up to the first hunk.
+        hunks: Each hunk, starting with its `@@` line, as a single string.
+    """
+    path: str
+    header: str
+    hunks: list[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """The file's diff, exactly as git produced it."""
+        return self.header + "".join(self.hunks)
+
+    @property
+    def is_binary(self) -> bool:
+        """Whether git reported the file as binary instead of showing hunks."""
+        return "\nBinary files " in self.header or "GIT binary patch" in self.header
+
+    @property
+    def blob_ids(self) -> Optional[tuple[str, str]]:
+        """The old and new blob ids from the `index` line, if git printed one."""
+        match = _INDEX_LINE.search(self.header)
+        return (match.group(1), match.group(2)) if match else None
+
+    @property
+    def old_path(self) -> str:
+        """The path of the file before the change; `path` unless it moved."""
+        match = _RENAME_FROM.search(self.header)
+        return _unquote_path(match.group(1)) if match else self.path
+
+    @property
+    def status(self) -> str:
+        """How the file changed: added, deleted, renamed, copied or modified."""
+        for marker, status in (
+            ("\nnew file mode ", "added"),
+            ("\ndeleted file mode ", "deleted"),
+            ("\nrename from ", "renamed"),
+            ("\ncopy from ", "copied"),
+        ):
+            if marker in self.header:
+                return status
+        return "modified"
+
+
+class _FileDiffBuilder:
+    """
+    Collects diff text into FileDiffs, one file at a time.
+
+    Text is gathered in lists and joined once a file is complete, so even
+    a huge hunk is assembled in linear time. Every `diff --git` line starts
+    a file, even one whose paths cannot be parsed, and any text before the
+    first one is kept at the front of that file's header.
+    """
+
+    def __init__(self):
+        self._path: Optional[str] = None
+        self._header: list[str] = []
+        self._hunks: list[list[str]] = []
+
+    def feed(self, text: str) -> list[FileDiff]:
+        """
+        Adds one or more complete lines; returns the files they completed.
+
+        Only the lines that start a file or a hunk are looked at on their
+        own, so feeding large pieces of a diff at once is much faster than
+        feeding it line by line.
+        """
+        finished: list[FileDiff] = []
+        if not text:
+            return finished
+        starts = [match.start() for match in _SECTION_START.finditer(text)]
+        if not starts or starts[0]:
+            self._extend(text[:starts[0] if starts else None])
+        for start, end in zip(starts, starts[1:] + [None]):
+            piece = text[start:end]
+            if piece.startswith("diff --git "):
+                if self._path is not None:
+                    finished.append(self.finish())
+                line = piece[:piece.find("\n") + 1] or piece
+                paths = _header_paths(line)
+                self._path = paths[1] if paths else line[11:].rstrip("\n")
+                self._header.append(piece)
+                self._hunks = []
+            elif self._path is not None:
+                self._hunks.append([piece])
+            else:
+                self._extend(piece)
+        return finished
+
+    def _extend(self, text: str) -> None:
+        """Adds text that continues the current hunk, or else the header."""
+        if self._hunks:
+            self._hunks[-1].append(text)
+        else:
+            self._header.append(text)
+
+    def finish(self) -> Optional[FileDiff]:
+        """
+        Returns the file being built, if any, and starts afresh.
+
+        Text without any `diff --git` line comes back as a file with no path.
+        """
+        if self._path is None and not self._header:
+            return None
+        file = FileDiff(
+            path=self._path or "",
+            header="".join(self._header),
+            hunks=["".join(hunk) for hunk in self._hunks],
+        )
+        self._path, self._header, self._hunks = None, [], []
+        return file
+
+
+def iter_file_diffs(lines: Iterable[str]) -> Iterator[FileDiff]:
+    """
+    Parses a unified git diff lazily, as its text arrives.
+
+    Args:
+        lines: The diff's lines, each with its newline. Several lines may
+               come in one string, as long as none is split between two.
+
+    Yields:
+        Each file's FileDiff as soon as its last line has been read, so only
+        one file is held in memory at a time. Text before the first
+        `diff --git` line, if any, is kept at the front of the first file.
+    """
+    builder = _FileDiffBuilder()
+    for text in lines:
+        yield from builder.feed(text)
+    file = builder.finish()
+    if file is not None:
+        yield file
+
+
+async def aiter_file_diffs(lines: AsyncIterable[str]) -> AsyncIterator[FileDiff]:
+    """The async counterpart of `iter_file_diffs`, e.g. for git's live output."""
+    builder = _FileDiffBuilder()
+    async for text in lines:
+        for file in builder.feed(text):
+            yield file
+    file = builder.finish()
+    if file is not None:
+        yield file
+
+
+def header_paths(diff: str) -> list[str]:
+    """
+    Every path named on a diff's `diff --git` lines, old paths included.
+
+    Much cheaper than parsing the diff, for checking which files it touches.
+    """
+    paths = []
+    text = "\n" + diff
+    start = text.find("\ndiff --git ")
+    while start >= 0:
+        end = text.find("\n", start + 1)
+        line = text[start + 1:end if end >= 0 else None]
+        paths.extend(_header_paths(line) or [line[11:]])
+        start = text.find("\ndiff --git ", start + 1)
+    return paths
+
+
+def parse_diff(diff: str) -> list[FileDiff]:
+    """
+    Splits a unified git diff into per-file sections.
+
+    Args:
+        diff: The output of `git diff`.
+
+    Returns:
+        One FileDiff per file, in the order git listed them. Text before the
+        first `diff --git` line, if any, is kept at the front of the first file.
+    """
+    return list(iter_file_diffs([diff]))
@@ -0,0 +1,344 @@
+import fnmatch
+import functools
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ai_commit import config
+from ai_commit.compaction import GENERATED_PATTERNS, LOCKFILE_PATTERNS
+from ai_commit.diff_parser import FileDiff, header_paths, iter_file_diffs
+
+# Files matching these are never fetched: the model only needs to know they
+# changed, and vendored updates are where staged diffs get enormous.
+DEFAULT_EXCLUDES = LOCKFILE_PATTERNS + GENERATED_PATTERNS
+
+# Rough size of the diff output per changed line, context and hunk headers
+# included. Only used to decide which files fit under the byte cap.
+BYTES_PER_CHANGED_LINE = 100
+
+CHUNK_SIZE = 64 * 1024
+
+TRUNCATION_NOTE = "# ... diff output truncated at {max_bytes} bytes\n"
+
+
+@dataclass
+class FileStat:
+    """Per-file line counts from `git diff --numstat`.
+
+    `added` and `deleted` are None for binary files. `old_path` is set for
+    renames and copies.
+    """
+    path: str
+    added: Optional[int]
+    deleted: Optional[int]
+    old_path: Optional[str] = field(default=None, compare=False)
+
+    @property
+    def is_binary(self) -> bool:
+        return self.added is None or self.deleted is None
+
+    @property
+    def changed(self) -> int:
+        """Added plus deleted lines; 0 for binary files."""
+        return (self.added or 0) + (self.deleted or 0)
+
+    @property
+    def paths(self) -> list[str]:
+        """Every path the change touches, the old one first for renames."""
+        return [self.old_path, self.path] if self.old_path else [self.path]
+
+
+@dataclass
+class DiffSelection:
+    """
+    Which staged files to fetch full hunks for, decided from numstat alone.
+
+    Attributes:
+        fetch: Files whose hunks are worth fetching.
+        skipped: Files left out, each paired with the reason.
+        max_bytes: Hard cap on the diff output read for `fetch`.
+        shown: Paths whose diff was already read in full, so neither
+               fetched again nor given a stand-in.
+    """
+    fetch: list[FileStat] = field(default_factory=list)
+    skipped: list[tuple[FileStat, str]] = field(default_factory=list)
+    max_bytes: int = 0
+    shown: list[str] = field(default_factory=list)
+
+    def pathspecs(self) -> list[str]:
+        """
+        Pathspecs limiting `git diff` to the fetched files.
+
+        Whichever is shorter is used: the fetched paths themselves, or the
+        whole tree minus the other paths. Empty when nothing is left out.
+        """
+        if not self.skipped and not self.shown:
+            return []
+        included = [f":(top,literal){p}" for stat in self.fetch for p in stat.paths]
+        excluded = [":/"] + [
+            f":(top,exclude,literal){p}"
+            for p in self.shown + [p for stat, _ in self.skipped for p in stat.paths]
+        ]
+        return min(included, excluded, key=len)
+
+    def assemble(self, output: bytes, truncated: bool) -> str:
+        """
+        Builds the diff from the fetched output plus a stand-in per skipped file.
+
+        Args:
+            output: What `git diff` printed for the fetched files.
+            truncated: Whether `output` was cut off at `max_bytes`.
+        """
+        if truncated:
+            # Don't leave half a line, or half a UTF-8 character, at the end.
+            output = output[:self.max_bytes]
+            output = output[:output.rfind(b"\n") + 1]
+        diff = output.decode("utf-8", errors="replace")
+        if truncated:
+            diff += TRUNCATION_NOTE.format(max_bytes=self.max_bytes)
+        return diff + self.stubs()
+
+    def stubs(self) -> str:
+        """The stand-ins for the skipped files, as a diff."""
+        return "".join(_stub(stat, reason) for stat, reason in self.skipped)
+
+
+def _stub(stat: FileStat, reason: str) -> str:
+    """A stand-in for a file whose hunks were not fetched."""
+    header = f"diff --git a/{stat.old_path or stat.path} b/{stat.path}\n"
+    if stat.is_binary:
+        return header + f"# {stat.path}: binary file elided\n"
+    return header + f"# {stat.path}: {stat.changed} changed lines elided ({reason})\n"
+
+
+def parse_numstat(output: str) -> list[FileStat]:
+    """Parses the output of `git diff --numstat -z`."""
+    stats = []
+    fields = iter(output.split("\0"))
+    for entry in fields:
+        if not entry:
+            continue
+        added, deleted, path = entry.split("\t", 2)
+        old_path = None
+        if not path:
+            # Renames list the old and new paths as separate fields.
+            old_path = next(fields, None)
+            path = next(fields, "")
+        stats.append(FileStat(
+            path=path,
+            added=None if added == "-" else int(added),
+            deleted=None if deleted == "-" else int(deleted),
+            old_path=old_path,
+        ))
+    return stats
+
+
+def _default_exclude(exclude: Optional[list[str]]) -> list[str]:
+    if exclude is None:
+        exclude = config.get_diff_exclude()
+    return DEFAULT_EXCLUDES if exclude is None else exclude
+
+
+@functools.lru_cache(maxsize=8)
+def _exclude_pattern(exclude: tuple[str, ...]) -> re.Pattern:
+    """All of `exclude` as one regex, matching like `fnmatch.fnmatch`."""
+    if not exclude:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(
+        fnmatch.translate(os.path.normcase(pattern)) for pattern in exclude
+    ))
+
+
+def _is_excluded(path: str, exclude: list[str]) -> bool:
+    return _exclude_pattern(tuple(exclude)).match(os.path.normcase(path)) is not None
+
+
+def _skip_reason(stat: FileStat, exclude: list[str]) -> Optional[str]:
+    """Why a file is never fetched, whatever its size, if it isn't."""
+    if stat.is_binary:
+        return "binary file"
+    if any(_is_excluded(path, exclude) for path in stat.paths):
+        return "excluded"
+    return None
+
+
+def _file_skip_reason(file: FileDiff, exclude: list[str]) -> Optional[str]:
+    """`_skip_reason` for a file read whole, without counting its lines."""
+    if file.is_binary:
+        return "binary file"
+    if _is_excluded(file.path, exclude) or _is_excluded(file.old_path, exclude):
+        return "excluded"
+    return None
+
+
+def file_stat(file: FileDiff) -> FileStat:
+    """The numstat git would report for a file, worked out from its diff."""
+    old_path = file.old_path if file.old_path != file.path else None
+    if file.is_binary:
+        return FileStat(file.path, None, None, old_path)
+    lines = [line for hunk in file.hunks for line in hunk.splitlines()[1:]]
+    return FileStat(
+        file.path,
+        sum(line.startswith("+") for line in lines),
+        sum(line.startswith("-") for line in lines),
+        old_path,
+    )
+
+
+def trim_diff(diff: str, exclude: Optional[list[str]] = None) -> str:
+    """
+    Replaces binary and excluded files in a complete diff with stand-ins.
+
+    For a diff already read whole, under the byte cap, this gives what
+    fetching the files chosen by `select_files` would have, without asking
+    git for numstat first.
+
+    Args:
+        diff: The staged diff.
+        exclude: As for `select_files`.
+    """
+    exclude = _default_exclude(exclude)
+    binary = "\nBinary files " in diff or "GIT binary patch" in diff
+    if not binary and not any(
+        _is_excluded(path, exclude) for path in header_paths(diff)
+    ):
+        return diff
+
+    reader = StagedDiffReader(len(diff), exclude)
+    kept = [
+        file.text for file in iter_file_diffs([diff])
+        if reader.take(file)
+    ]
+    return "".join(kept) + reader.stubs()
+
+
+def select_files(
+    stats: list[FileStat],
+    max_bytes: Optional[int] = None,
+    exclude: Optional[list[str]] = None,
+) -> DiffSelection:
+    """
+    Decides which files to fetch full hunks for.
+
+    Binary files and files matching `exclude` are skipped. The rest are
+    admitted smallest first while their estimated diff size fits in
+    `max_bytes`; larger files are skipped.
+
+    Args:
+        stats: The staged files, as reported by numstat.
+        max_bytes: Cap on the fetched diff. Defaults to
+                   `config.get_diff_max_bytes()`.
+        exclude: fnmatch-style patterns for files never to fetch. Defaults to
+                 `config.get_diff_exclude()`, or DEFAULT_EXCLUDES when that
+                 is not set.
+
+    Returns:
+        A DiffSelection; its lists keep the order of `stats`.
+    """
+    max_bytes = max_bytes if max_bytes is not None else config.get_diff_max_bytes()
+    exclude = _default_exclude(exclude)
+
+    reasons: dict[int, str] = {}
+    candidates = []
+    for index, stat in enumerate(stats):
+        reason = _skip_reason(stat, exclude)
+        if reason is None:
+            candidates.append(index)
+        else:
+            reasons[index] = reason
+
+    remaining = max_bytes
+    for index in sorted(candidates, key=lambda i: stats[i].changed):
+        estimate = stats[index].changed * BYTES_PER_CHANGED_LINE
+        if estimate > remaining:
+            reasons[index] = "over size cap"
+        else:
+            remaining -= estimate
+
+    return DiffSelection(
+        fetch=[stat for i, stat in enumerate(stats) if i not in reasons],
+        skipped=[(stat, reasons[i]) for i, stat in enumerate(stats) if i in reasons],
+        max_bytes=max_bytes,
+    )
+
+
+class StagedDiffReader:
+    """
+    Picks the files of the staged diff to show, while git prints it.
+
+    The whole diff is read first, because most staged changes fit under the
+    byte cap and then numstat would only cost a second git process. Files
+    are handed over as soon as they are complete, except binary and
+    excluded ones, which get stand-ins at the end. Should the diff run past
+    the cap, reading stops and `select_rest` picks, from numstat, which of
+    the files not read yet to fetch with the bytes left.
+
+    The sync and async git layers share this; only how they run git differs.
+
+    Attributes:
+        max_bytes: Cap on the diff output read.
+        size: Bytes of diff read so far.
+        overflowed: Whether the diff ran past `max_bytes`.
+    """
+
+    def __init__(
+        self, max_bytes: Optional[int] = None, exclude: Optional[list[str]] = None
+    ):
+        """
+        Args:
+            max_bytes: As for `select_files`.
+            exclude: As for `select_files`.
+        """
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else config.get_diff_max_bytes()
+        )
+        self.exclude = _default_exclude(exclude)
+        self.size = 0
+        self.overflowed = False
+        self._shown: list[str] = []
+        self._shown_bytes = 0
+        self._skipped: list[tuple[FileStat, str]] = []
+
+    def count(self, text: str) -> bool:
+        """Counts output git printed; False once the diff is past the cap."""
+        self.size += len(text.encode("utf-8"))
+        self.overflowed = self.size > self.max_bytes
+        return not self.overflowed
+
+    def take(self, file: FileDiff) -> bool:
+        """Whether to show a complete file; the others get stand-ins."""
+        reason = _file_skip_reason(file, self.exclude)
+        if reason is not None:
+            self._skipped.append((file_stat(file), reason))
+            return False
+        self._shown.extend(dict.fromkeys((file.old_path, file.path)))
+        self._shown_bytes += len(file.header) + sum(map(len, file.hunks))
+        return True
+
+    def stubs(self) -> str:
+        """The stand-ins for the files not shown, as a diff."""
+        return DiffSelection(skipped=self._skipped).stubs()
+
+    def select_rest(self, stats: list[FileStat]) -> DiffSelection:
+        """
+        Chooses what to fetch once the whole diff turned out too big.
+
+        Args:
+            stats: The numstat of every staged file.
+
+        Returns:
+            A DiffSelection of the files not read yet, within the bytes the
+            files already shown left over. Its stand-ins cover every file
+            not shown.
+        """
+        read = set(self._shown) | {
+            path for stat, _ in self._skipped for path in stat.paths
+        }
+        selection = select_files(
+            [stat for stat in stats if stat.path not in read],
+            max(self.max_bytes - self._shown_bytes, 0), self.exclude,
+        )
+        selection.skipped = self._skipped + selection.skipped
+        selection.shown = self._shown
+        return selection
@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+import rich
+import typer
+from rich.prompt import Prompt
+
+from ai_commit import (
+    async_git,
+    cache,
+    config,
+    deadline,
+    git_integration,
+    llm_provider,
+    prompt_manager,
+    service,
+)
+
+BACKEND_NAMES = {"ollama": "Ollama", "openai": "OpenAI-compatible"}
+
+
+def handle_edit_flow(initial_message: str) -> str:
+    """Handles the logic for editing a message in an external editor."""
+    editor = os.environ.get("EDITOR")
+    if not editor:
+        rich.print("[bold red]Error: EDITOR environment variable not set.[/bold red]")
+        raise typer.Exit(code=1)
+
+    # Use a temporary file for the user to edit
+    with tempfile.NamedTemporaryFile(mode="w+", delete=False, suffix=".txt") as tf:
+        tf.write(initial_message)
+        temp_file_path = tf.name
+
+    try:
+        # Open the file in the user's specified editor
+        subprocess.run([editor, temp_file_path], check=True)
+        # Read the potentially modified content
+        with open(temp_file_path) as tf:
+            edited_message = tf.read().strip()
+    finally:
+        # Clean up the temporary file
+        os.unlink(temp_file_path)
+
+    return edited_message if edited_message else initial_message
+
+
+@dataclass
+class GenerationOptions:
+    """Settings shared by every command that generates a commit message."""
+    style: str = "conventional"
+    completion_cache: Optional[cache.CompletionCache] = None
+    token_budget: Optional[int] = None
+    map_reduce: bool = False
+    incremental: bool = False
+    candidates: int = 1
+    candidate_timeout: Optional[float] = None
+
+
+def report_elisions(result: service.PreparedPrompt) -> None:
+    """Tells the user what was left out of the prompt, if anything."""
+    if result.elided:
+        rich.print(
+            f"[yellow]Diff trimmed from ~{result.original_tokens} to "
+            f"~{result.tokens} tokens. Elided:[/yellow]"
+        )
+        for note in result.elided:
+            rich.print(f"[yellow]  - {note}[/yellow]")
+
+
+async def stream_commit_message(
+    diff: str,
+    style: str,
+    provider: llm_provider.LLMProvider,
+    completion_cache: Optional[cache.CompletionCache],
+) -> str:
+    """Renders the commit message as it is generated and returns it in full."""
+    console = rich.get_console()
+    rich.print("\n[bold green]Generated Commit Message:[/bold green]")
+    fragments = []
+    async for token in service.stream_commit(
+        diff=diff, style=style, provider=provider, cache=completion_cache
+    ):
+        fragments.append(token)
+        console.print(
+            token, style="cyan", end="", markup=False, highlight=False
+        )
+    console.print()
+    if completion_cache is not None and completion_cache.stats.hits:
+        rich.print("[dim](loaded from cache)[/dim]")
+    return "".join(fragments).strip()
+
+
+async def _warm_up(provider: llm_provider.LLMProvider) -> None:
+    """Preloads the model; failures are left for the real request to report."""
+    warm_up = getattr(provider, "warm_up", None)
+    if warm_up is None:
+        return
+    try:
+        await warm_up()
+    except llm_provider.OllamaConnectionError:
+        pass
+
+
+async def generate_message(
+    provider: llm_provider.LLMProvider, options: GenerationOptions
+) -> str:
+    """Collects the staged diff and renders a commit message for it."""
+    async with provider:
+        # Load the model while git and the prompt files are being read.
+        warm_up = asyncio.ensure_future(_warm_up(provider))
+        try:
+            return await _generate_with_provider(provider, options)
+        finally:
+            warm_up.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await warm_up
+
+
+async def _generate_with_provider(
+    provider: llm_provider.LLMProvider, options: GenerationOptions
+) -> str:
+    """Prepares the prompt from the staged diff and streams the completion."""
+    prompt_manager.load_style(options.style)
+
+    if options.map_reduce:
+        rich.print("Preparing the prompt (large diffs are summarized in parts)...")
+    prepared = await service.prepare_prompt(
+        async_git.iter_staged_files(), provider,
+        options.token_budget, options.map_reduce,
+        incremental=options.incremental,
+        summary_cache=(
+            cache.SummaryCache() if options.completion_cache is not None else None
+        ),
+    )
+    report_elisions(prepared)
+    if options.candidates > 1:
+        rich.print(f"Picking the best of {options.candidates} candidates...")
+        message = await service.generate_best_commit(
+            prepared.user_prompt,
+            options.style,
+            provider,
+            options.candidates,
+            options.candidate_timeout,
+        )
+        rich.print("\n[bold green]Generated Commit Message:[/bold green]")
+        rich.get_console().print(f"[cyan]{message}[/cyan]", highlight=False)
+        return message
+    return await stream_commit_message(
+        prepared.user_prompt,
+        options.style,
+        provider,
+        options.completion_cache if prepared.cacheable else None,
+    )
+
+
+async def run_print_flow(
+    provider: llm_provider.LLMProvider, options: GenerationOptions
+):
+    """Generates and prints a commit message without committing."""
+    await generate_message(provider, options)
+
+
+async def run_interactive_flow(
+    provider: llm_provider.LLMProvider,
+    options: GenerationOptions,
+    message_file: Optional[str] = None,
+):
+    """
+    Contains the core async logic for the interactive session.
+
+    With `message_file` (hook mode), an accepted message is written to that
+    file for the running `git commit` to use instead of committing again.
+    """
+    rich.print("Generating commit message...")
+    commit_message = await generate_message(provider, options)
+    rich.print()
+
+    while True:
+        choice = Prompt.ask(
+            "[bold]Commit with this message? [/bold]",
+            choices=["y", "n", "e"],
+            default="y"
+        ).lower()
+        if choice == 'y':
+            if message_file:
+                git_integration.write_message_file(message_file, commit_message)
+                rich.print("[bold green]✔ Message ready for git.[/bold green]")
+                break
+            await async_git.commit(commit_message)
+            rich.print("[bold green]✔ Commit successful![/bold green]")
+            break
+        elif choice == 'e':
+            commit_message = handle_edit_flow(commit_message)
+            rich.print("\n[bold green]Generated Commit Message:[/bold green]")
+            rich.print(f"[cyan]{commit_message}[/cyan]\n")
+        else:
+            rich.print("[yellow]Commit aborted.[/yellow]")
+            break
+
+
+def run_generate(
+    options: GenerationOptions,
+    dry_run: bool = False,
+    print_commit: bool = False,
+    no_cache: bool = False,
+    timeout: Optional[float] = None,
+    message_file: Optional[str] = None,
+) -> None:
+    """
+    Runs the main command: generates a message and prints or commits it.
+
+    Args:
+        options: The generation settings chosen on the command line.
+        dry_run: Use the mock provider instead of the configured backend.
+        print_commit: Only print the message instead of committing.
+        no_cache: Bypass the completion cache.
+        timeout: Seconds the whole generation may take, retries included.
+        message_file: Write the accepted message to this file instead of
+                      committing, as the prepare-commit-msg hook needs.
+    """
+    try:
+        if dry_run:
+            provider = llm_provider.MockProvider()
+            rich.print(
+                "[bold yellow]Dry run mode: Using Mock LLM Provider.[/bold yellow]")
+        else:
+            provider = llm_provider.create_provider()
+            backend = BACKEND_NAMES[config.get_backend()]
+            rich.print(
+                f"[bold blue]Live mode: Using real {backend} provider.[/bold blue]"
+            )
+            if not no_cache:
+                options.completion_cache = cache.CompletionCache()
+
+        with deadline.within(timeout):
+            if print_commit:
+                asyncio.run(run_print_flow(provider, options))
+                return
+
+            asyncio.run(run_interactive_flow(provider, options, message_file))
+
+    except (
+        git_integration.NoStagedChanges,
+        git_integration.NotAGitRepositoryError,
+    ) as e:
+        rich.print(f"[bold red]Error:[/bold red] {e}")
+        raise typer.Exit(code=1)
+    except KeyError as e:
+        rich.print(f"[bold red]Error:[/bold red] {e}")
+        available = prompt_manager.list_styles()
+        rich.print(f"Please choose from available styles: {available}")
+        raise typer.Exit(code=1)
+    except llm_provider.OllamaConnectionError as e:
+        rich.print(f"[bold red]Ollama Error:[/bold red] {e}")
+        raise typer.Exit(code=1)
+    except Exception as e:
+        rich.print(f"[bold red]An unexpected error occurred:[/bold red] {e}")
+        raise typer.Exit(code=1)
@@ -1,4 +1,15 @@
+import contextlib
 import subprocess
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from ai_commit import diff_selection, timings
+from ai_commit.diff_parser import iter_file_diffs
+
+# `git diff` arguments for the staged changes, as the model should see them.
+STAGED_DIFF = ("diff", "--staged", "--no-color", "--no-ext-diff")
+
+NO_STAGED_CHANGES = "No staged changes found. Use 'git add' to stage your changes."
 
 
 class NoStagedChanges(Exception):
@@ -6,6 +17,11 @@ class NoStagedChanges(Exception):
     pass
 
 
+class NotAGitRepositoryError(Exception):
+    """Raised when a git-specific operation is attempted outside a git repo."""
+    pass
+
+
 def get_staged_diff() -> str:
     """
     Retrieves the unified diff of all staged changes in the repository.
@@ -25,22 +41,182 @@ def get_staged_diff() -> str:
     # `check=True` will raise CalledProcessError on non-zero exit codes.
     # `text=True` decodes stdout/stderr as text.
     # `capture_output=True` captures stdout/stderr.
-    result = subprocess.run(
-        command,
-        capture_output=True,
-        text=True,
-        check=True,
-        encoding="utf-8"
-    )
+    with timings.span("git diff"):
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            check=True,
+            encoding="utf-8"
+        )
 
     if not result.stdout:
-        raise NoStagedChanges(
-            "No staged changes found. Use 'git add' to stage your changes."
-        )
+        raise NoStagedChanges(NO_STAGED_CHANGES)
 
     return result.stdout
 
 
+def _read_capped(command: list[str], max_bytes: int) -> tuple[bytes, bool]:
+    """
+    Runs a command, reading its output incrementally up to `max_bytes`.
+
+    Returns:
+        The output read and whether it went past `max_bytes`, in which case
+        the command was killed.
+
+    Raises:
+        subprocess.CalledProcessError: If the command fails before the cap.
+    """
+    chunks = []
+    size = 0
+    with subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        while size <= max_bytes:
+            chunk = process.stdout.read(diff_selection.CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        truncated = size > max_bytes
+        if truncated:
+            process.kill()
+        error = process.stderr.read().decode("utf-8", errors="replace")
+
+    if process.returncode != 0 and not truncated:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr=error
+        )
+    return b"".join(chunks), truncated
+
+
+def _iter_text(command: list[str], max_bytes: int) -> Iterator[str]:
+    """
+    Runs a command and yields its output in whole lines, up to `max_bytes`.
+
+    Output is read in `diff_selection.CHUNK_SIZE` pieces, each handed over
+    up to its last newline. The command is killed once it has printed more
+    than `max_bytes`, or when the caller stops early; the last line yielded
+    may be cut short.
+
+    Raises:
+        subprocess.CalledProcessError: If the command fails before the cap.
+    """
+    with subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        finished = False
+        try:
+            # The start of a line still waiting for its newline.
+            pending: list[bytes] = []
+            size = 0
+            while size <= max_bytes:
+                chunk = process.stdout.read(diff_selection.CHUNK_SIZE)
+                if not chunk:
+                    finished = True
+                    break
+                size += len(chunk)
+                end = chunk.rfind(b"\n") + 1
+                if not end:
+                    pending.append(chunk)
+                    continue
+                pending.append(chunk[:end])
+                yield b"".join(pending).decode("utf-8", errors="replace")
+                pending = [chunk[end:]]
+            if any(pending):
+                yield b"".join(pending).decode("utf-8", errors="replace")
+        finally:
+            if not finished:
+                process.kill()
+        error = process.stderr.read().decode("utf-8", errors="replace")
+        process.wait()
+
+    if finished and process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr=error
+        )
+
+
+def _counted(
+    texts: Iterator[str], reader: diff_selection.StagedDiffReader
+) -> Iterator[str]:
+    """Passes output through until the reader's cap is passed."""
+    with contextlib.closing(texts):
+        for text in texts:
+            if not reader.count(text):
+                return
+            yield text
+
+
+def get_staged_diff_capped(
+    max_bytes: Optional[int] = None, exclude: Optional[list[str]] = None
+) -> str:
+    """
+    Retrieves the staged diff without pulling huge changes through Python.
+
+    Files are chosen by `diff_selection.StagedDiffReader`, as for
+    `async_git.iter_staged_files`. The whole diff is read first, and taken
+    if it fits in `max_bytes`. Otherwise `git diff --staged --numstat`
+    gives cheap sizes for the files not read yet, full hunks are fetched
+    only for the ones `diff_selection.select_files` picks, and reading
+    stops at `max_bytes`. Binary, excluded and skipped files appear as a
+    one-line stand-in giving their size and why they were left out.
+
+    Args:
+        max_bytes: Cap on the diff output read. Defaults to
+                   `config.get_diff_max_bytes()`.
+        exclude: Patterns of files never to fetch. Defaults to
+                 `config.get_diff_exclude()`.
+
+    Returns:
+        The git diff as a string.
+
+    Raises:
+        NoStagedChanges: If no files are staged.
+        subprocess.CalledProcessError: If the underlying git command fails
+                                     (e.g., not in a git repository).
+    """
+    reader = diff_selection.StagedDiffReader(max_bytes, exclude)
+    command = ["git", *STAGED_DIFF]
+    with timings.span("git diff"):
+        texts = _counted(_iter_text(command, reader.max_bytes), reader)
+        shown = [
+            file.text for file in iter_file_diffs(texts)
+            # Past the cap, the last file is incomplete; it is fetched below.
+            if not reader.overflowed and reader.take(file)
+        ]
+        if not reader.overflowed:
+            if not reader.size:
+                raise NoStagedChanges(NO_STAGED_CHANGES)
+            return "".join(shown) + reader.stubs()
+
+        numstat = subprocess.run(
+            ["git", "diff", "--staged", "--numstat", "-z"],
+            capture_output=True,
+            text=True,
+            check=True,
+            encoding="utf-8"
+        )
+        selection = reader.select_rest(
+            diff_selection.parse_numstat(numstat.stdout)
+        )
+        if not selection.fetch and not selection.skipped and not shown:
+            raise NoStagedChanges(NO_STAGED_CHANGES)
+
+        output, truncated = b"", False
+        if selection.fetch:
+            output, truncated = _read_capped(
+                [*command, "--", *selection.pathspecs()], selection.max_bytes
+            )
+    return "".join(shown) + selection.assemble(output, truncated)
+
+
 def commit(message: str) -> None:
     """
     Commits staged changes with the provided message using `git commit -m`.
@@ -52,10 +228,27 @@ def commit(message: str) -> None:
         subprocess.CalledProcessError: If the git command fails.
     """
     command = ["git", "commit", "-m", message]
-    subprocess.run(
-        command,
-        check=True,
-        capture_output=True,
-        text=True,
-        encoding="utf-8"
-    )
+    with timings.span("git commit"):
+        subprocess.run(
+            command,
+            check=True,
+            capture_output=True,
+            text=True,
+            encoding="utf-8"
+        )
+
+
+def write_message_file(path: Union[str, Path], message: str) -> None:
+    """
+    Puts a commit message into the file git passes to prepare-commit-msg.
+
+    The message goes above whatever git already wrote there, such as its
+    commented-out instructions, so the editor git opens next shows both.
+
+    Args:
+        path: The message file, the hook's first argument.
+        message: The commit message to use.
+    """
+    path = Path(path)
+    existing = path.read_text(encoding="utf-8") if path.exists() else ""
+    path.write_text(message.rstrip("\n") + "\n" + existing, encoding="utf-8")
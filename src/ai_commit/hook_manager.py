@@ -2,11 +2,7 @@ import stat
 import subprocess
 from pathlib import Path
 
-
-class NotAGitRepositoryError(Exception):
-    """Raised when a git-specific operation is attempted outside a git repo."""
-    pass
-
+from ai_commit.git_integration import NotAGitRepositoryError
 
 HOOK_SCRIPT_CONTENT = """#!/bin/sh
 # Hook created by ai-commit.
@@ -27,8 +23,10 @@ fi
 # --- Execute ai-commit interactively
 # Re-connect stdin to the terminal for interactive prompts
 exec < /dev/tty
-# The `ai-commit` command must be in the user's PATH
-ai-commit --live
+# The `ai-commit` command must be in the user's PATH. It hands generation to
+# a running `ai-commit daemon` when there is one, and works alone otherwise.
+# The message is written to $1 and this `git commit` goes on to use it.
+ai-commit --live --message-file "$1"
 """
 
 
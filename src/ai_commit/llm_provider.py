@@ -1,14 +1,36 @@
-from typing import Protocol, runtime_checkable
+import asyncio
+import contextlib
+import itertools
+import json
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Protocol, runtime_checkable
 
 import httpx
 
-from ai_commit import config
+from ai_commit import config, deadline, timings
+from ai_commit.breaker import CircuitBreaker
+from ai_commit.tokens import context_size, estimate_tokens
 
 
 class OllamaConnectionError(Exception):
     """Custom exception for errors when connecting to the Ollama API."""
     pass
 
+
+class CircuitOpenError(OllamaConnectionError):
+    """Raised without contacting Ollama while its circuit breaker is open."""
+    pass
+
+
+class DeadlineExceeded(OllamaConnectionError):
+    """Raised when the caller's deadline passes before Ollama answers."""
+    pass
+
+
 @runtime_checkable
 class LLMProvider(Protocol):
     """
@@ -17,19 +39,46 @@ class LLMProvider(Protocol):
     This abstraction allows the core service to remain decoupled from the
     specific implementation of an LLM client (e.g., Ollama, OpenAI).
     """
-    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> str:
         """
         Generates a completion based on system and user prompts.
 
         Args:
             system_prompt: The instruction or context for the model.
             user_prompt: The specific input to be processed (e.g., a git diff).
+            options: Sampling options overriding the provider's defaults for
+                     this request only (e.g., {"temperature": 0.8}).
 
         Returns:
             The text generated by the language model.
         """
         ...
 
+    def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Generates a completion incrementally, yielding tokens as they arrive.
+
+        Args:
+            system_prompt: The instruction or context for the model.
+            user_prompt: The specific input to be processed (e.g., a git diff).
+            options: Sampling options overriding the provider's defaults for
+                     this request only, as for `complete`.
+
+        Returns:
+            An async iterator over the text fragments produced by the model.
+        """
+        ...
+
 
 class MockProvider:
     """
@@ -39,9 +88,19 @@ class MockProvider:
     predictable, templated string that includes the prompts it received.
     This is useful for unit testing components that rely on an LLMProvider.
     """
-    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+    model = "mock"
+    options: dict = {}
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> str:
         """
         Returns a hardcoded, formatted string for test verification.
+
+        Sampling options are accepted and ignored.
         """
         return (
             "Mock Response:\n"
@@ -49,36 +108,1316 @@ class MockProvider:
             f"User Prompt: {user_prompt}"
         )
 
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields the same templated string as `complete`, one word at a time.
+        """
+        response = await self.complete(system_prompt, user_prompt)
+        for token in re.findall(r"\S+\s*", response):
+            yield token
+
+    async def warm_up(self) -> None:
+        """No-op; there is no model to load."""
+
+    async def aclose(self) -> None:
+        """No-op; present so callers can manage any provider the same way."""
+
+    async def __aenter__(self) -> "MockProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+def _connection_error(error: httpx.HTTPError) -> OllamaConnectionError:
+    """Describes a failed request to Ollama."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return OllamaConnectionError(
+            f"Ollama API returned an error: {error.response.status_code} "
+            f"- {error.response.text}"
+        )
+    return OllamaConnectionError(f"Connection to Ollama failed: {error}")
+
+
+def _is_transient(error: httpx.HTTPError) -> bool:
+    """Whether trying the same request again might succeed."""
+    if isinstance(error, httpx.HTTPStatusError):
+        # Includes the 503 Ollama answers with while a model is loading.
+        return error.response.status_code >= 500
+    return isinstance(
+        error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+    )
+
+
+def _is_outage(error: httpx.HTTPError) -> bool:
+    """Whether the failure says the server is down rather than the request bad."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.RequestError)
+
+
+def _metrics(body: dict) -> dict:
+    """Ollama's timing and token counts from a response, when present."""
+    return {key: body[key] for key in timings.OLLAMA_METRICS if key in body}
+
+
+def _content(body: dict) -> str:
+    """The generated text in a `/api/generate` or `/api/chat` response."""
+    if "message" in body:
+        return body["message"].get("content", "")
+    return body.get("response", "")
+
+
+def _retry_after(error: httpx.HTTPError) -> float:
+    """The server's requested delay before a retry, in seconds, if any."""
+    if isinstance(error, httpx.HTTPStatusError):
+        with contextlib.suppress(ValueError):
+            return float(error.response.headers.get("Retry-After", 0))
+    return 0.0
+
 
 class OllamaProvider:
-    """A real LLMProvider that connects to an Ollama instance."""
+    """
+    A real LLMProvider that connects to an Ollama instance.
+
+    The provider owns a single `httpx.AsyncClient`, created on first use, so
+    consecutive completions share one keep-alive connection pool instead of
+    paying for a new connection each time. Close it with `aclose()` or use
+    the provider as an async context manager.
+
+    Connection errors and server errors are retried with jittered
+    exponential backoff. No attempt outlives the deadline set with
+    `deadline.within`, and a circuit breaker makes requests to an Ollama
+    that keeps failing fail fast (see `breaker.CircuitBreaker`).
+
+    The style prompt always travels as the system prompt, separate from the
+    diff, through `/api/generate` or `/api/chat`. Requests in the same style
+    then share a byte-identical prefix, which Ollama evaluates once and
+    reuses for as long as the model stays loaded (`keep_alive`).
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keep_alive: Optional[str] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        api: Optional[str] = None,
+    ):
+        """
+        Args:
+            url: The Ollama base URL. Defaults to `config.get_ollama_url()`.
+            model: The model name. Defaults to `config.get_ollama_model()`.
+            timeout: Per-request timeout in seconds.
+                     Defaults to `config.get_ollama_timeout()`.
+            max_connections: Upper bound on concurrent connections.
+                             Defaults to `config.get_ollama_max_connections()`.
+            max_keepalive_connections: Idle connections kept for reuse.
+                                       Defaults to
+                                       `config.get_ollama_max_keepalive()`.
+            keep_alive: How long Ollama keeps the model loaded after each
+                        request. Defaults to `config.get_ollama_keep_alive()`.
+            max_retries: Retries after a transient failure.
+                         Defaults to `config.get_ollama_max_retries()`.
+            retry_backoff: Base delay before the first retry, in seconds.
+                           Defaults to `config.get_ollama_retry_backoff()`.
+            circuit_breaker: The breaker guarding this endpoint. Defaults to
+                             one keyed by the URL.
+            api: "generate" or "chat". Defaults to `config.get_ollama_api()`.
+        """
+        self._url = url
+        self._api = api
+        self._model = model
+        self._keep_alive = keep_alive
+        self._timeout_seconds = (
+            timeout if timeout is not None else config.get_ollama_timeout()
+        )
+        self._timeout = httpx.Timeout(self._timeout_seconds)
+        self._limits = httpx.Limits(
+            max_connections=(
+                max_connections
+                if max_connections is not None
+                else config.get_ollama_max_connections()
+            ),
+            max_keepalive_connections=(
+                max_keepalive_connections
+                if max_keepalive_connections is not None
+                else config.get_ollama_max_keepalive()
+            ),
+        )
+        self._max_retries = (
+            max_retries if max_retries is not None
+            else config.get_ollama_max_retries()
+        )
+        self._retry_backoff = (
+            retry_backoff if retry_backoff is not None
+            else config.get_ollama_retry_backoff()
+        )
+        self._circuit_breaker = circuit_breaker
+        self._client: Optional[httpx.AsyncClient] = None
+        self._opening: Optional[asyncio.Future] = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the Ollama instance."""
+        return self._url or config.get_ollama_url()
+
+    @property
+    def model(self) -> str:
+        """The name of the model used for completions."""
+        return self._model or config.get_ollama_model()
+
+    @property
+    def keep_alive(self) -> str:
+        """How long Ollama keeps the model loaded after each request."""
+        return self._keep_alive or config.get_ollama_keep_alive()
+
+    @property
+    def api(self) -> str:
+        """The Ollama endpoint completions are requested from."""
+        return self._api or config.get_ollama_api()
+
+    @property
+    def options(self) -> dict:
+        """
+        The sampling options sent with every request.
+
+        `num_predict` bounds requests that do not set their own limit; the
+        context window is sized per request (see `_build_payload`).
+        """
+        return {
+            "temperature": 0.25,
+            "top_p": 0.9,
+            "num_predict": config.get_ollama_num_predict(),
+        }
+
+    def _context_floor(self) -> int:
+        """
+        The context window for any prompt within the token budget.
+
+        Prompts compacted to the budget all get this window, and warm-up
+        loads the model with it, so Ollama does not reload the model to
+        resize its context between commits.
+        """
+        return context_size(
+            config.get_token_budget(), config.get_ollama_num_predict(),
+            config.get_ollama_max_context(),
+        )
 
-    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """The breaker guarding this endpoint, created on first use."""
+        if self._circuit_breaker is None:
+            self._circuit_breaker = CircuitBreaker(self.url)
+        return self._circuit_breaker
+
+    @property
+    def _completion_url(self) -> str:
+        """Where completion requests are sent."""
+        return f"{self.url}/api/{self.api}"
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Returns the shared client, creating it if needed."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._new_client()
+        return self._client
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=self._timeout, limits=self._limits, headers=self._headers(),
+        )
+
+    async def open(self) -> None:
+        """
+        Creates the shared client without blocking the event loop.
+
+        Setting up the client's SSL context takes a noticeable fraction of a
+        second, so it is done in a worker thread while other work, such as
+        reading the staged diff, goes on.
+        """
+        if self._client is not None and not self._client.is_closed:
+            return
+        if self._opening is None:
+            self._opening = asyncio.get_running_loop().run_in_executor(
+                None, self._new_client
+            )
+        opening = self._opening
+        try:
+            client = await asyncio.shield(opening)
+        finally:
+            if opening.done() and self._opening is opening:
+                self._opening = None
+        if self._client is None or self._client.is_closed:
+            self._client = client
+        elif self._client is not client:
+            await client.aclose()
+
+    def _headers(self) -> dict:
+        """Headers sent with every request."""
+        return {}
+
+    async def aclose(self) -> None:
+        """Closes the shared client and its pooled connections."""
+        self._opening = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "OllamaProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def _build_payload(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: bool,
+        options: Optional[dict] = None,
+    ) -> dict:
+        """Builds the request body for the `/api/generate` or `/api/chat` endpoint."""
+        payload = {"model": self.model}
+        if self.api == "chat":
+            payload["messages"] = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
+        else:
+            payload["system"] = system_prompt
+            payload["prompt"] = user_prompt
+        options = {**self.options, **(options or {})}
+        if "num_ctx" not in options:
+            options["num_ctx"] = context_size(
+                estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+                options["num_predict"], config.get_ollama_max_context(),
+                minimum=self._context_floor(),
+            )
+        return {
+            **payload,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": options,
+        }
+
+    def _parse_response(self, body: dict) -> dict:
+        """Turns a non-streaming response into Ollama's shape."""
+        return body
+
+    def _parse_stream_line(self, line: str) -> Optional[dict]:
+        """Turns a line of a streaming response into Ollama's shape, if it has one."""
+        return json.loads(line) if line.strip() else None
+
+    def _check_circuit(self) -> None:
+        """Raises CircuitOpenError while the breaker is open."""
+        wait = self.circuit_breaker.retry_after()
+        if wait > 0:
+            raise CircuitOpenError(
+                f"Ollama at {self.url} keeps failing; not trying it again "
+                f"for {wait:.0f}s."
+            )
+
+    def _attempt_timeout(self) -> httpx.Timeout:
+        """The timeout for the next attempt, cut short by any deadline."""
+        left = deadline.remaining()
+        if left is None:
+            return self._timeout
+        if left <= 0:
+            raise DeadlineExceeded("The deadline passed before Ollama answered.")
+        return httpx.Timeout(min(self._timeout_seconds, left))
+
+    async def _after_failure(self, attempt: int, error: httpx.HTTPError) -> None:
+        """
+        Waits before retrying a failed request, or raises if it is not retried.
+
+        Raises:
+            DeadlineExceeded: If the attempt timed out at the deadline.
+            OllamaConnectionError: If the failure is permanent, the retries
+                                   are used up, or the deadline would pass
+                                   during the backoff.
+        """
+        left = deadline.remaining()
+        if (isinstance(error, httpx.TimeoutException)
+                and left is not None and left <= 0):
+            raise DeadlineExceeded(
+                "The deadline passed before Ollama answered."
+            ) from error
+
+        delay = max(
+            self._retry_backoff * 2 ** attempt * random.uniform(0.5, 1.5),
+            _retry_after(error),
+        )
+        if (_is_transient(error) and attempt < self._max_retries
+                and (left is None or delay < left)):
+            await asyncio.sleep(delay)
+            return
+        if _is_outage(error):
+            self.circuit_breaker.record_failure()
+        raise _connection_error(error) from error
+
+    @timings.timed("ollama.warm_up")
+    async def warm_up(self) -> None:
+        """
+        Asks Ollama to load the model without generating anything.
+
+        A request without a prompt makes Ollama load the model into memory,
+        with the context window most requests use, and keep it there for
+        `keep_alive`. Sending it while other start-up
+        work runs hides the model load time behind that work. It is tried
+        only once and does not count towards the circuit breaker.
+        """
+        self._check_circuit()
+        payload = {
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "options": {"num_ctx": self._context_floor()},
+        }
+        await self.open()
+        try:
+            response = await self._get_client().post(
+                f"{self.url}/api/generate", json=payload,
+                timeout=self._attempt_timeout(),
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise _connection_error(e) from e
+
+    @timings.timed("ollama.complete")
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> str:
         """Generates a completion using the Ollama API."""
-        url = config.get_ollama_url()
-        model = config.get_ollama_model()
+        payload = self._build_payload(
+            system_prompt, user_prompt, stream=False, options=options
+        )
+        body, attempts = await self._post(self._completion_url, payload)
+        data = self._parse_response(body)
+        timings.annotate(attempts=attempts, **_metrics(data))
+        return _content(data).strip()
+
+    async def _post(self, url: str, payload: dict) -> tuple[dict, int]:
+        """
+        Sends a non-streaming request, retrying it as the settings allow.
+
+        Returns:
+            The response body and how many attempts it took.
+        """
+        self._check_circuit()
+        await self.open()
+
+        for attempt in itertools.count():
+            try:
+                # httpx timeouts apply to each read, not to the whole request.
+                response = await asyncio.wait_for(
+                    self._get_client().post(
+                        url, json=payload, timeout=self._attempt_timeout(),
+                    ),
+                    timeout=deadline.remaining(),
+                )
+                response.raise_for_status()
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(
+                    "The deadline passed before Ollama answered."
+                ) from None
+            except httpx.HTTPError as e:
+                await self._after_failure(attempt, e)
+            else:
+                self.circuit_breaker.record_success()
+                return response.json(), attempt + 1
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streams a completion from the Ollama API.
+
+        Ollama answers a streaming request with one JSON object per line, each
+        carrying the next fragment (in `response`, or in `message.content`
+        from `/api/chat`), until an object with `done` set to true arrives.
+        Failures are retried only until the first fragment has been yielded.
+        """
+        self._check_circuit()
+        payload = self._build_payload(
+            system_prompt, user_prompt, stream=True, options=options
+        )
+        started = time.perf_counter()
+        tokens = self._stream(payload)
+        try:
+            with timings.span("ollama.stream"):
+                async for token in tokens:
+                    if started is not None:
+                        timings.annotate(
+                            time_to_first_token=time.perf_counter() - started
+                        )
+                        started = None
+                    yield token
+        finally:
+            # Closes the HTTP response too when the caller stops early.
+            await tokens.aclose()
+
+    async def _stream(self, payload: dict) -> AsyncIterator[str]:
+        """Sends a streaming request, retrying until the first fragment."""
+        await self.open()
+        streamed = False
+        for attempt in itertools.count():
+            try:
+                async with self._get_client().stream(
+                    "POST", self._completion_url, json=payload,
+                    timeout=self._attempt_timeout(),
+                ) as response:
+                    if response.is_error:
+                        # The body must be read before it can be reported.
+                        await response.aread()
+                    response.raise_for_status()
+                    # Ollama reports its counts on the last chunk; OpenAI
+                    # servers send usage in a chunk of its own before it.
+                    metrics: dict = {}
+                    async for line in response.aiter_lines():
+                        chunk = self._parse_stream_line(line)
+                        if chunk is None:
+                            continue
+                        metrics.update(_metrics(chunk))
+                        if "error" in chunk:
+                            raise OllamaConnectionError(
+                                f"Ollama API returned an error: {chunk['error']}"
+                            )
+                        left = deadline.remaining()
+                        if left is not None and left <= 0:
+                            raise DeadlineExceeded(
+                                "The deadline passed before Ollama finished."
+                            )
+                        token = _content(chunk)
+                        if token:
+                            streamed = True
+                            yield token
+                        if chunk.get("done"):
+                            timings.annotate(attempts=attempt + 1, **metrics)
+                            break
+            except httpx.HTTPError as e:
+                if streamed:
+                    if _is_outage(e):
+                        self.circuit_breaker.record_failure()
+                    raise _connection_error(e) from e
+                await self._after_failure(attempt, e)
+            else:
+                self.circuit_breaker.record_success()
+                return
+
+
+def _openai_metrics(body: dict) -> dict:
+    """An OpenAI `usage` object, as the Ollama metrics `timings` reports."""
+    usage = body.get("usage") or {}
+    metrics = {}
+    if "prompt_tokens" in usage:
+        metrics["prompt_eval_count"] = usage["prompt_tokens"]
+    if "completion_tokens" in usage:
+        metrics["eval_count"] = usage["completion_tokens"]
+    return metrics
+
+
+# Ollama options whose OpenAI counterparts are named differently.
+_OPENAI_OPTION_NAMES = {"num_predict": "max_tokens"}
+
+
+class OpenAIProvider(OllamaProvider):
+    """
+    An LLMProvider for servers with an OpenAI-compatible chat API.
+
+    llama.cpp server, vLLM and similar local servers expose
+    `/v1/chat/completions` and batch concurrent requests on the GPU, so
+    their throughput grows with the requests in flight. Share one provider
+    between workers (backfill `-j`, batch `--concurrency`) to make use of
+    that.
+
+    Connection pooling, retries, deadlines and the circuit breaker work as
+    in OllamaProvider. Responses are translated into Ollama's shape, with
+    the reported token usage as `prompt_eval_count` and `eval_count`.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        model: Optional[str] = None,
+        api_key: Optional[str] = None,
+        **provider_options,
+    ):
+        """
+        Args:
+            url: The base URL, `/v1` included. Defaults to
+                 `config.get_openai_url()`.
+            model: The model name. Defaults to `config.get_openai_model()`.
+            api_key: Sent as a bearer token. Defaults to
+                     `config.get_openai_api_key()`.
+            **provider_options: Timeouts, connection limits, retries and
+                                the circuit breaker, as for OllamaProvider.
+        """
+        super().__init__(url=url, model=model, **provider_options)
+        self._api_key = api_key
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server's OpenAI-compatible API."""
+        return self._url or config.get_openai_url()
+
+    @property
+    def model(self) -> str:
+        """The name of the model used for completions."""
+        return self._model or config.get_openai_model()
+
+    @property
+    def api(self) -> str:
+        return "chat"
+
+    @property
+    def _completion_url(self) -> str:
+        return f"{self.url}/chat/completions"
 
-        prompt = f"{system_prompt}\n\n{user_prompt}"
+    def _headers(self) -> dict:
+        api_key = self._api_key or config.get_openai_api_key()
+        return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    def _build_payload(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: bool,
+        options: Optional[dict] = None,
+    ) -> dict:
+        """
+        Builds the request body for `/v1/chat/completions`.
+
+        Ollama option names are translated: `num_predict` becomes
+        `max_tokens`, and `num_ctx` is dropped, as these servers fix their
+        context size at start-up.
+        """
         payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.25,
-                "top_p": 0.9,
-                "max_tokens": 40
-            }
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "stream": stream,
+            **self._request_options(options),
         }
+        if stream:
+            # Ask for the token usage in a last chunk, as Ollama reports it.
+            payload["stream_options"] = {"include_usage": True}
+        return payload
 
+    def _request_options(self, options: Optional[dict]) -> dict:
+        """The sampling options, under the names the OpenAI API uses."""
+        return {
+            _OPENAI_OPTION_NAMES.get(name, name): value
+            for name, value in {**self.options, **(options or {})}.items()
+            if name != "num_ctx"
+        }
+
+    def _parse_response(self, body: dict) -> dict:
+        choices = body.get("choices") or [{}]
+        content = (choices[0].get("message") or {}).get("content") or ""
+        return {"message": {"content": content}, **_openai_metrics(body)}
+
+    def _parse_stream_line(self, line: str) -> Optional[dict]:
+        """Reads one server-sent event; `[DONE]` ends the stream."""
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return {"done": True}
+        chunk = json.loads(data)
+        if "error" in chunk:
+            return chunk
+        choices = chunk.get("choices") or [{}]
+        content = (choices[0].get("delta") or {}).get("content") or ""
+        return {"message": {"content": content}, **_openai_metrics(chunk)}
+
+    @timings.timed("openai.complete_batch")
+    async def complete_batch(
+        self,
+        prompts: list[tuple[str, str]],
+        options: Optional[dict] = None,
+    ) -> list[str]:
+        """
+        Generates several completions in one request to `/v1/completions`.
+
+        That API takes a list of prompts, which the server schedules as one
+        batch. It applies no chat template, so each system and user prompt
+        are sent as plain text, one after the other.
+
+        Args:
+            prompts: `(system_prompt, user_prompt)` pairs.
+            options: Sampling options shared by every prompt.
+
+        Returns:
+            The completions, in the order of `prompts`.
+        """
+        payload = {
+            "model": self.model,
+            "prompt": [f"{system}\n\n{user}\n" for system, user in prompts],
+            **self._request_options(options),
+        }
+        body, attempts = await self._post(f"{self.url}/completions", payload)
+        timings.annotate(
+            attempts=attempts, prompts=len(prompts), **_openai_metrics(body)
+        )
+        choices = sorted(body.get("choices") or [], key=lambda c: c.get("index", 0))
+        return [(choice.get("text") or "").strip() for choice in choices]
+
+    @timings.timed("openai.warm_up")
+    async def warm_up(self) -> None:
+        """
+        Opens a pooled connection by listing the server's models.
+
+        These servers load their model at start-up, so only the connection
+        is worth warming. It is tried once and does not count towards the
+        circuit breaker.
+        """
+        self._check_circuit()
+        await self.open()
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(f"{url}/api/generate", json=payload)
-                response.raise_for_status()
-                return response.json()["response"].strip()
-        except httpx.HTTPStatusError as e:
-            raise OllamaConnectionError(
-                f"Ollama API returned an error: {e.response.status_code} "
-                f"- {e.response.text}"
-            ) from e
-        except httpx.RequestError as e:
-            raise OllamaConnectionError(f"Connection to Ollama failed: {e}") from e
+            response = await self._get_client().get(
+                f"{self.url}/models", timeout=self._attempt_timeout()
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise _connection_error(e) from e
+
+
+# Seconds an endpoint that failed is passed over before it is tried again.
+ENDPOINT_COOLDOWN = 30.0
+# Response times kept to compute the hedging percentile.
+LATENCY_WINDOW = 100
+# Requests are not hedged until this many response times have been seen.
+MIN_HEDGE_SAMPLES = 5
+
+
+def _is_retryable(error: OllamaConnectionError) -> bool:
+    """Whether another endpoint might succeed where this one failed."""
+    if isinstance(error, CircuitOpenError):
+        return True
+    cause = error.__cause__
+    if isinstance(cause, httpx.HTTPStatusError):
+        return cause.response.status_code >= 500
+    return isinstance(cause, httpx.RequestError)
+
+
+@dataclass(eq=False)
+class _Endpoint:
+    """One Ollama instance in a pool, with its load and health."""
+    provider: OllamaProvider
+    outstanding: int = 0
+    latency: Optional[float] = None
+    down_until: float = 0.0
+
+
+class OllamaPoolProvider:
+    """
+    An LLMProvider that spreads requests across several Ollama instances.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight, preferring the one with the lowest recent latency. An endpoint
+    that cannot be reached or answers with a server error is passed over for
+    `ENDPOINT_COOLDOWN` seconds and the request fails over to the next one.
+
+    With a hedge percentile set, a completion still running after that
+    percentile of recent response times is also sent to a second endpoint;
+    whichever answers first wins and the other request is cancelled.
+    Streams fail over only until their first token arrives, and are not
+    hedged.
+    """
+
+    def __init__(
+        self,
+        urls: Optional[list[str]] = None,
+        model: Optional[str] = None,
+        hedge_percentile: Optional[float] = None,
+        **provider_options,
+    ):
+        """
+        Args:
+            urls: The Ollama base URLs. Defaults to `config.get_ollama_urls()`.
+            model: The model name. Defaults to `config.get_ollama_model()`.
+            hedge_percentile: Latency percentile after which completions are
+                              hedged. Defaults to
+                              `config.get_ollama_hedge_percentile()`.
+            **provider_options: Passed on to each endpoint's OllamaProvider.
+                                Endpoints do not retry by default, since
+                                the pool fails over instead.
+        """
+        provider_options.setdefault("max_retries", 0)
+        self._endpoints = [
+            _Endpoint(OllamaProvider(url=url, model=model, **provider_options))
+            for url in urls or config.get_ollama_urls()
+        ]
+        self._hedge_percentile = (
+            hedge_percentile
+            if hedge_percentile is not None
+            else config.get_ollama_hedge_percentile()
+        )
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def urls(self) -> list[str]:
+        """The base URLs of the pooled Ollama instances."""
+        return [endpoint.provider.url for endpoint in self._endpoints]
+
+    @property
+    def model(self) -> str:
+        """The name of the model used for completions."""
+        return self._endpoints[0].provider.model
+
+    @property
+    def keep_alive(self) -> str:
+        """How long Ollama keeps the model loaded after each request."""
+        return self._endpoints[0].provider.keep_alive
+
+    @property
+    def options(self) -> dict:
+        """The sampling options sent with every request."""
+        return self._endpoints[0].provider.options
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while hedging is off."""
+        if not self._hedge_percentile or len(self._latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        position = int(len(ordered) * self._hedge_percentile / 100)
+        return ordered[min(position, len(ordered) - 1)]
+
+    def _ranked(self, exclude: list[_Endpoint]) -> list[_Endpoint]:
+        """The endpoints not in `exclude`, best candidate first."""
+        now = time.monotonic()
+        return sorted(
+            (endpoint for endpoint in self._endpoints if endpoint not in exclude),
+            key=lambda endpoint: (
+                endpoint.down_until > now,
+                endpoint.outstanding,
+                endpoint.latency or 0.0,
+            ),
+        )
+
+    async def _complete_on(
+        self,
+        endpoint: _Endpoint,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict],
+    ) -> str:
+        """Runs one completion on `endpoint`, recording its latency and health."""
+        started = time.monotonic()
+        try:
+            result = await endpoint.provider.complete(
+                system_prompt, user_prompt, options
+            )
+        except OllamaConnectionError as e:
+            if _is_retryable(e):
+                endpoint.down_until = time.monotonic() + ENDPOINT_COOLDOWN
+            raise
+
+        elapsed = time.monotonic() - started
+        endpoint.latency = (
+            elapsed if endpoint.latency is None
+            else 0.7 * endpoint.latency + 0.3 * elapsed
+        )
+        endpoint.down_until = 0.0
+        self._latencies.append(elapsed)
+        return result
+
+    def _start(
+        self,
+        endpoint: _Endpoint,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict],
+    ) -> asyncio.Future:
+        """
+        Schedules a completion on `endpoint`.
+
+        The endpoint counts the request as outstanding from this moment, so
+        requests issued together are spread out before any of them starts.
+        """
+        endpoint.outstanding += 1
+
+        def finished(_: asyncio.Future) -> None:
+            endpoint.outstanding -= 1
+
+        task = asyncio.ensure_future(
+            self._complete_on(endpoint, system_prompt, user_prompt, options)
+        )
+        task.add_done_callback(finished)
+        return task
+
+    async def _hedged(
+        self,
+        primary: _Endpoint,
+        backup: Optional[_Endpoint],
+        tried: list[_Endpoint],
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict],
+    ) -> str:
+        """Runs a completion on `primary`, hedging onto `backup` if it is slow."""
+        tasks = [self._start(primary, system_prompt, user_prompt, options)]
+        try:
+            delay = self.hedge_delay() if backup is not None else None
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                tried.append(backup)
+                tasks.append(
+                    self._start(backup, system_prompt, user_prompt, options)
+                )
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> str:
+        """Generates a completion on the best endpoint, failing over if needed."""
+        tried: list[_Endpoint] = []
+        while True:
+            ranked = self._ranked(exclude=tried)
+            primary = ranked[0]
+            tried.append(primary)
+            backup = ranked[1] if len(ranked) > 1 else None
+            try:
+                return await self._hedged(
+                    primary, backup, tried, system_prompt, user_prompt, options
+                )
+            except OllamaConnectionError as e:
+                if not _is_retryable(e) or len(tried) == len(self._endpoints):
+                    raise
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """Streams a completion, failing over until the first token arrives."""
+        ranked = self._ranked(exclude=[])
+        for position, endpoint in enumerate(ranked):
+            streamed = False
+            endpoint.outstanding += 1
+            try:
+                async for token in endpoint.provider.stream(
+                    system_prompt, user_prompt, options
+                ):
+                    streamed = True
+                    yield token
+                return
+            except OllamaConnectionError as e:
+                if not _is_retryable(e):
+                    raise
+                endpoint.down_until = time.monotonic() + ENDPOINT_COOLDOWN
+                if streamed or position == len(ranked) - 1:
+                    raise
+            finally:
+                endpoint.outstanding -= 1
+
+    async def warm_up(self) -> None:
+        """
+        Loads the model on every endpoint.
+
+        Raises:
+            OllamaConnectionError: If no endpoint could be reached.
+        """
+        results = await asyncio.gather(
+            *(endpoint.provider.warm_up() for endpoint in self._endpoints),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) == len(results):
+            raise errors[0]
+
+    async def aclose(self) -> None:
+        """Closes every endpoint's client."""
+        for endpoint in self._endpoints:
+            await endpoint.provider.aclose()
+
+    async def __aenter__(self) -> "OllamaPoolProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+class BoundedProvider:
+    """
+    An LLMProvider that caps how many requests reach another one at once.
+
+    Callers beyond `max_concurrency` wait for a free slot, so any number of
+    tasks can share one provider without flooding Ollama. A stream holds
+    its slot until it is exhausted or closed, and a batch takes one slot.
+    """
+
+    def __init__(self, provider: LLMProvider, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            provider: The provider requests are passed on to.
+            max_concurrency: Requests allowed in flight. Defaults to
+                             `config.get_max_concurrency()`.
+        """
+        self.provider = provider
+        self.max_concurrency = max_concurrency or config.get_max_concurrency()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        if hasattr(provider, "complete_batch"):
+            # Offered only when the wrapped provider can take batches.
+            self.complete_batch = self._complete_batch
+
+    @property
+    def model(self) -> str:
+        """The wrapped provider's model, so cache keys are unchanged."""
+        return getattr(self.provider, "model", type(self.provider).__name__)
+
+    @property
+    def options(self) -> dict:
+        """The wrapped provider's sampling options."""
+        return getattr(self.provider, "options", {})
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> str:
+        """Generates a completion once a slot is free."""
+        async with self._slots:
+            if options is None:
+                return await self.provider.complete(system_prompt, user_prompt)
+            return await self.provider.complete(system_prompt, user_prompt, options)
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """Streams a completion once a slot is free."""
+        async with self._slots:
+            async for token in self.provider.stream(
+                system_prompt, user_prompt, options
+            ):
+                yield token
+
+    async def _complete_batch(
+        self, prompts: list[tuple[str, str]], options: Optional[dict] = None
+    ) -> list[str]:
+        """Generates a batch of completions once a slot is free."""
+        async with self._slots:
+            return await self.provider.complete_batch(prompts, options)
+
+    async def warm_up(self) -> None:
+        """Loads the model through the wrapped provider, if it supports that."""
+        warm_up = getattr(self.provider, "warm_up", None)
+        if warm_up is not None:
+            await warm_up()
+
+    async def aclose(self) -> None:
+        """Closes the wrapped provider."""
+        await self.provider.aclose()
+
+    async def __aenter__(self) -> "BoundedProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+class _SharedStream:
+    """One stream from the model, replayed to every caller following it."""
+
+    def __init__(self, tokens: AsyncIterator[str]):
+        self.tokens: list[str] = []
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.abandoned = False
+        self.followers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(tokens))
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self, tokens: AsyncIterator[str]) -> None:
+        try:
+            async for token in tokens:
+                self.tokens.append(token)
+                self._wake()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._wake()
+            aclose = getattr(tokens, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Yields every token, from the first, as the model produces them."""
+        self.followers += 1
+        try:
+            sent = 0
+            while True:
+                while sent < len(self.tokens):
+                    yield self.tokens[sent]
+                    sent += 1
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.followers -= 1
+            if not self.followers and not self.finished:
+                # Nobody is left to read the rest.
+                self.abandoned = True
+                self.task.cancel()
+
+
+class CoalescingProvider:
+    """
+    An LLMProvider that merges concurrent identical requests to another one.
+
+    Identical completions or streams in flight at the same time (same
+    prompts and options) share one request to the model, and every caller
+    receives its whole answer. A caller that is cancelled does not cancel
+    the request for the others; a stream stops once all its callers have.
+
+    When the wrapped provider has a `complete_batch(prompts, options)`
+    method, as OpenAIProvider does, distinct completions with the same
+    options are also collected for up to `max_wait` seconds and sent
+    together, at most `max_batch_size` at a time. A completion nothing
+    else arrived for is sent on its own, through `complete`.
+
+    Attributes:
+        coalesced: Requests answered by one already in flight.
+        batches: Batch requests sent.
+    """
+
+    def __init__(
+        self,
+        provider: LLMProvider,
+        max_batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+    ):
+        """
+        Args:
+            provider: The provider requests are passed on to.
+            max_batch_size: Completions sent in one batch. Defaults to
+                            `config.get_batch_max_size()`.
+            max_wait: Seconds a completion waits for others to batch with.
+                      Defaults to `config.get_batch_max_wait()`.
+        """
+        self.provider = provider
+        self.max_batch_size = max_batch_size or config.get_batch_max_size()
+        self.max_wait = (
+            max_wait if max_wait is not None else config.get_batch_max_wait()
+        )
+        self.coalesced = 0
+        self.batches = 0
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+        self._streams: dict[tuple, _SharedStream] = {}
+        # Completions waiting to be batched, by their options.
+        self._pending: dict[Optional[str], list[tuple[tuple, asyncio.Future]]] = {}
+        self._timers: dict[Optional[str], asyncio.TimerHandle] = {}
+        self._sending: set[asyncio.Future] = set()
+
+    @property
+    def model(self) -> str:
+        """The wrapped provider's model, so cache keys are unchanged."""
+        return getattr(self.provider, "model", type(self.provider).__name__)
+
+    @property
+    def options(self) -> dict:
+        """The wrapped provider's sampling options."""
+        return getattr(self.provider, "options", {})
+
+    @staticmethod
+    def _key(system_prompt: str, user_prompt: str, options: Optional[dict]) -> tuple:
+        return (
+            system_prompt, user_prompt,
+            json.dumps(options, sort_keys=True) if options else None,
+        )
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> str:
+        """Generates a completion, sharing any identical one in flight."""
+        key = self._key(system_prompt, user_prompt, options)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(
+                self._request(system_prompt, user_prompt, options)
+            )
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def _forget(self, key: tuple, future: asyncio.Future) -> None:
+        """Drops a finished request, so the next identical one is sent anew."""
+        self._in_flight.pop(key, None)
+        if not future.cancelled():
+            # Marks the error as seen even if every caller was cancelled.
+            future.exception()
+
+    async def _request(
+        self, system_prompt: str, user_prompt: str, options: Optional[dict]
+    ) -> str:
+        if self.max_batch_size > 1 and hasattr(self.provider, "complete_batch"):
+            future = asyncio.get_running_loop().create_future()
+            group = json.dumps(options, sort_keys=True) if options else None
+            batch = self._pending.setdefault(group, [])
+            batch.append(((system_prompt, user_prompt, options), future))
+            if len(batch) >= self.max_batch_size:
+                self._flush(group)
+            elif group not in self._timers:
+                self._timers[group] = asyncio.get_running_loop().call_later(
+                    self.max_wait, self._flush, group
+                )
+            return await future
+        return await self._complete(system_prompt, user_prompt, options)
+
+    async def _complete(
+        self, system_prompt: str, user_prompt: str, options: Optional[dict]
+    ) -> str:
+        if options is None:
+            return await self.provider.complete(system_prompt, user_prompt)
+        return await self.provider.complete(system_prompt, user_prompt, options)
+
+    def _flush(self, group: Optional[str]) -> None:
+        """Sends the completions waiting with the same options."""
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, [])
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: list[tuple[tuple, asyncio.Future]]) -> None:
+        """Answers every future in the batch, whatever happens to the request."""
+        try:
+            if len(batch) == 1:
+                results = [await self._complete(*batch[0][0])]
+            else:
+                self.batches += 1
+                options = batch[0][0][2]
+                results = await self.provider.complete_batch(
+                    [(system, user) for (system, user, _), _ in batch], options
+                )
+            if len(results) != len(batch):
+                raise OllamaConnectionError(
+                    f"Asked for {len(batch)} completions in one batch, "
+                    f"got {len(results)}."
+                )
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # Cancelled while sending: nobody is left waiting forever.
+            for _, future in batch:
+                future.cancel()
+
+    def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        options: Optional[dict] = None,
+    ) -> AsyncIterator[str]:
+        """Streams a completion, following any identical stream in flight."""
+        key = self._key(system_prompt, user_prompt, options)
+        shared = self._streams.get(key)
+        if shared is None or shared.finished or shared.abandoned:
+            shared = _SharedStream(
+                self.provider.stream(system_prompt, user_prompt, options)
+            )
+            self._streams[key] = shared
+            shared.task.add_done_callback(
+                lambda done: self._forget_stream(key, shared)
+            )
+        else:
+            self.coalesced += 1
+        return shared.follow()
+
+    def _forget_stream(self, key: tuple, shared: _SharedStream) -> None:
+        """Drops a finished stream, unless a newer one has taken its place."""
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    async def warm_up(self) -> None:
+        """Loads the model through the wrapped provider, if it supports that."""
+        warm_up = getattr(self.provider, "warm_up", None)
+        if warm_up is not None:
+            await warm_up()
+
+    async def aclose(self) -> None:
+        """Sends any completions still waiting, then closes the wrapped provider."""
+        for group in list(self._pending):
+            self._flush(group)
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+        await self.provider.aclose()
+
+    async def __aenter__(self) -> "CoalescingProvider":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+def create_provider() -> LLMProvider:
+    """
+    Returns the provider for the configured backend and endpoints.
+
+    With `AI_COMMIT_BACKEND=openai` this is an OpenAIProvider. Otherwise a
+    single Ollama URL gets a plain OllamaProvider; several get an
+    OllamaPoolProvider that balances across them.
+    """
+    if config.get_backend() == "openai":
+        return OpenAIProvider()
+    urls = config.get_ollama_urls()
+    if len(urls) > 1:
+        return OllamaPoolProvider(urls)
+    return OllamaProvider()
@@ -1,8 +1,22 @@
 from functools import lru_cache
 from pathlib import Path
 
+from ai_commit import timings
+
 PROMPT_DIR = Path(__file__).parent / "prompts"
 
+# Generation limits for commit messages. The styles ask for one line of at
+# most 70 characters, about 20 tokens; the cap leaves room for emoji, which
+# take several tokens each, and a blank line ends the message before any
+# commentary the model adds after it.
+DEFAULT_STYLE_OPTIONS = {"num_predict": 48, "stop": ["\n\n"]}
+
+# Styles whose messages run longer in tokens than in characters.
+STYLE_OPTIONS = {
+    "funny": {"num_predict": 64},
+    "ghanaian": {"num_predict": 64},
+}
+
 
 @lru_cache(maxsize=1)
 def list_styles() -> list[str]:
@@ -32,10 +46,25 @@ def load_style(name: str) -> str:
     Raises:
         KeyError: If the specified style name does not correspond to a file.
     """
-    prompt_file = PROMPT_DIR / f"{name}.txt"
-    if not prompt_file.is_file():
-        available = list_styles()
-        raise KeyError(
-            f"Prompt style '{name}' not found. Available styles: {available}"
-        )
-    return prompt_file.read_text(encoding="utf-8")
+    with timings.span("prompt.load_style", style=name):
+        prompt_file = PROMPT_DIR / f"{name}.txt"
+        if not prompt_file.is_file():
+            available = list_styles()
+            raise KeyError(
+                f"Prompt style '{name}' not found. Available styles: {available}"
+            )
+        return prompt_file.read_text(encoding="utf-8")
+
+
+def style_options(name: str) -> dict:
+    """
+    Returns the generation options for messages in a style.
+
+    Args:
+        name: The name of the style.
+
+    Returns:
+        Ollama options capping the message length (`num_predict`) and
+        ending it (`stop`), to pass with each request in that style.
+    """
+    return {**DEFAULT_STYLE_OPTIONS, **STYLE_OPTIONS.get(name, {})}
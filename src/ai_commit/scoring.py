@@ -0,0 +1,60 @@
+import re
+from pathlib import PurePosixPath
+
+CONVENTIONAL_SUBJECT = re.compile(
+    r"^\W*(feat|fix|refactor|perf|style|chore|docs|test|build|ci|revert)"
+    r"(\([^)]+\))?!?: \S"
+)
+
+# The conventional prompt asks for at most 70 characters.
+MAX_SUBJECT_LENGTH = 70
+
+
+def _mentions_path(message: str, paths: list[str]) -> bool:
+    """Whether the message names any changed file, by name or stem."""
+    lowered = message.lower()
+    for path in paths:
+        name = PurePosixPath(path)
+        if name.name.lower() in lowered:
+            return True
+        if len(name.stem) > 2 and name.stem.lower() in lowered:
+            return True
+    return False
+
+
+def score_message(message: str, style: str, paths: list[str]) -> float:
+    """
+    Rates a candidate commit message with cheap local checks.
+
+    Higher is better. Messages earn points for following the Conventional
+    Commits format (only for the "conventional" style), for a subject line
+    within the length limit, and for naming at least one changed file.
+
+    Args:
+        message: The candidate message.
+        style: The prompt style it was generated in.
+        paths: The paths of the files changed by the diff.
+
+    Returns:
+        The score, or negative infinity for an empty message.
+    """
+    message = message.strip()
+    if not message:
+        return float("-inf")
+    subject = message.splitlines()[0].strip()
+
+    score = 0.0
+    if style == "conventional":
+        if CONVENTIONAL_SUBJECT.match(subject):
+            score += 3.0
+        if len(message.splitlines()) == 1:
+            score += 1.0
+    if len(subject) <= MAX_SUBJECT_LENGTH:
+        score += 2.0
+    else:
+        score -= (len(subject) - MAX_SUBJECT_LENGTH) / 10
+    if subject.endswith("."):
+        score -= 0.5
+    if paths and _mentions_path(message, paths):
+        score += 1.0
+    return score
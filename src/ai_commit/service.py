@@ -1,18 +1,67 @@
-from ai_commit import prompt_manager
+import asyncio
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Optional, Union
+
+from ai_commit import cache as completion_cache
+from ai_commit import compaction, config, prompt_manager, scoring, timings
+from ai_commit.diff_parser import FileDiff, parse_diff
 from ai_commit.llm_provider import LLMProvider
+from ai_commit.tokens import estimate_tokens
+
+SUMMARY_PROMPT = (
+    "You will be shown part of a git diff. Summarize what it changes in one or "
+    "two short sentences, naming the files involved. Describe the intent of "
+    "the change, not individual lines. Do not write a commit message."
+)
+
+REDUCE_PREAMBLE = (
+    "The staged changes were too large to show at once. "
+    "These are summaries of each part of the diff:\n"
+)
+
+FILE_SUMMARY_PROMPT = (
+    "You will be shown the git diff of a single file. Summarize what it "
+    "changes in one short sentence. Describe the intent of the change, not "
+    "individual lines. Do not write a commit message."
+)
+
+FILE_SUMMARY_PREAMBLE = (
+    "The staged changes were too large to show at once. "
+    "These are summaries of the changes to each file:\n"
+)
+
+
+def _cache_key(diff: str, system_prompt: str, provider: LLMProvider) -> str:
+    """Derives the completion cache key for a request to `provider`."""
+    return completion_cache.make_key(
+        diff=diff,
+        system_prompt=system_prompt,
+        model=getattr(provider, "model", type(provider).__name__),
+        options=getattr(provider, "options", {}),
+    )
 
 
-async def generate_commit(diff: str, style: str, provider: LLMProvider) -> str:
+@timings.timed("service.generate_commit")
+async def generate_commit(
+    diff: str,
+    style: str,
+    provider: LLMProvider,
+    cache: Optional[completion_cache.CompletionCache] = None,
+) -> str:
     """
     Generates a commit message by orchestrating prompt loading and an LLM call.
 
-    This is a pure domain function, decoupled from I/O. It relies on a
-    prompt loader and an LLM provider passed in as dependencies.
+    Not a pure function: the style prompt is read from disk, a given
+    completion cache is read and written on disk, and the provider usually
+    makes a network request.
 
     Args:
         diff: The git diff to be used as the user prompt.
         style: The name of the prompt style to use.
         provider: An object that conforms to the LLMProvider protocol.
+        cache: An optional completion cache. A cached message for the same
+               diff, style, model and options is returned without calling
+               the provider; fresh completions are stored in it.
 
     Returns:
         The generated commit message, stripped of leading/trailing whitespace.
@@ -20,13 +69,413 @@ async def generate_commit(diff: str, style: str, provider: LLMProvider) -> str:
     # Build the system prompt from the specified style
     system_prompt = prompt_manager.load_style(style)
 
+    if cache is not None:
+        key = _cache_key(diff, system_prompt, provider)
+        cached = cache.get(key)
+        if cached is not None:
+            timings.annotate(cached=True)
+            return cached
+
     # The user prompt is the git diff itself
     user_prompt = diff
 
-    # Call the provider to get the completion
+    # Call the provider to get the completion, capped to the style's length
     completion = await provider.complete(
         system_prompt=system_prompt,
-        user_prompt=user_prompt
+        user_prompt=user_prompt,
+        options=prompt_manager.style_options(style),
     )
 
-    return completion.strip()
+    message = completion.strip()
+    if cache is not None and message:
+        cache.set(key, message)
+    return message
+
+
+async def stream_commit(
+    diff: str,
+    style: str,
+    provider: LLMProvider,
+    cache: Optional[completion_cache.CompletionCache] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of `generate_commit`.
+
+    Yields the commit message in fragments as the provider produces them, so
+    callers can render it before generation has finished. Leading whitespace
+    is dropped; joining the fragments and stripping the result gives the
+    same message `generate_commit` would return.
+
+    Args:
+        diff: The git diff to be used as the user prompt.
+        style: The name of the prompt style to use.
+        provider: An object that conforms to the LLMProvider protocol.
+        cache: An optional completion cache. A cached message is yielded in
+               a single fragment; a fully streamed message is stored in it.
+
+    Yields:
+        Successive fragments of the generated commit message.
+    """
+    system_prompt = prompt_manager.load_style(style)
+
+    if cache is not None:
+        key = _cache_key(diff, system_prompt, provider)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    fragments = []
+    started = False
+    with timings.span("service.stream_commit"):
+        async for token in provider.stream(
+            system_prompt=system_prompt,
+            user_prompt=diff,
+            options=prompt_manager.style_options(style),
+        ):
+            if not started:
+                token = token.lstrip()
+                if not token:
+                    continue
+                started = True
+            fragments.append(token)
+            yield token
+
+    message = "".join(fragments).strip()
+    if cache is not None and message:
+        cache.set(key, message)
+
+
+def candidate_options(count: int) -> list[Optional[dict]]:
+    """
+    Sampling overrides for `count` candidates.
+
+    The first candidate uses the provider's own settings; each further one
+    samples at a higher temperature with its own seed, so the candidates
+    actually differ.
+    """
+    return [None] + [
+        {"temperature": round(min(1.0, 0.25 + 0.2 * i), 2), "seed": i}
+        for i in range(1, count)
+    ]
+
+
+def _succeeded(task: asyncio.Future) -> bool:
+    return (
+        not task.cancelled()
+        and task.exception() is None
+        and bool(task.result().strip())
+    )
+
+
+@timings.timed("service.generate_best_commit")
+async def generate_best_commit(
+    diff: str,
+    style: str,
+    provider: LLMProvider,
+    candidates: int,
+    time_limit: Optional[float] = None,
+) -> str:
+    """
+    Generates several commit messages concurrently and returns the best.
+
+    The candidates are requested at once with varied sampling (see
+    `candidate_options`) and ranked by `scoring.score_message`. When
+    `time_limit` expires, the best candidate finished so far wins and the
+    rest are cancelled; if none has finished, the first one to finish is
+    used.
+
+    Args:
+        diff: The git diff to be used as the user prompt.
+        style: The name of the prompt style to use.
+        provider: An object that conforms to the LLMProvider protocol.
+        candidates: How many messages to generate.
+        time_limit: Seconds to wait for candidates.
+                    Defaults to `config.get_candidate_timeout()`.
+
+    Returns:
+        The highest-scoring message.
+
+    Raises:
+        Exception: Whatever the provider raised, if every candidate failed.
+    """
+    system_prompt = prompt_manager.load_style(style)
+    limits = prompt_manager.style_options(style)
+    paths = [file.path for file in parse_diff(diff)]
+    tasks = [
+        asyncio.ensure_future(provider.complete(
+            system_prompt=system_prompt, user_prompt=diff,
+            options={**limits, **(options or {})},
+        ))
+        for options in candidate_options(candidates)
+    ]
+    try:
+        timeout = (
+            config.get_candidate_timeout() if time_limit is None else time_limit
+        )
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        while pending and not any(_succeeded(task) for task in done):
+            finished, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            done |= finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    messages = [
+        task.result().strip() for task in tasks
+        if task in done and _succeeded(task)
+    ]
+    if not messages:
+        failed = [task for task in tasks if task in done and task.exception()]
+        if failed:
+            raise failed[0].exception()
+        return ""
+    # max() keeps the earliest of equal scores: the default-sampled candidate.
+    return max(messages, key=lambda m: scoring.score_message(m, style, paths))
+
+
+def split_diff(diff: str, max_tokens: int) -> list[str]:
+    """
+    Splits a diff into chunks of whole files, each within `max_tokens`.
+
+    Consecutive files are grouped until the next one would overflow the
+    chunk. A single file larger than `max_tokens` becomes its own chunk,
+    compacted to fit.
+
+    Args:
+        diff: The unified git diff to split.
+        max_tokens: The estimated token budget for each chunk.
+
+    Returns:
+        The chunks, in the original file order.
+    """
+    chunks: list[str] = []
+    current = ""
+    for file in parse_diff(diff):
+        text = file.text
+        if estimate_tokens(text) > max_tokens:
+            text = compaction.compact_diff(text, budget=max_tokens).diff
+        if current and estimate_tokens(current + text) > max_tokens:
+            chunks.append(current)
+            current = ""
+        current += text
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def summarize_diff(
+    diff: str,
+    provider: LLMProvider,
+    chunk_tokens: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> str:
+    """
+    The map step of map-reduce generation.
+
+    Splits the diff into chunks and summarizes each through the provider,
+    with at most `max_concurrency` requests in flight. The summaries are
+    joined into a prompt for the final, reduce step.
+
+    Args:
+        diff: The unified git diff to summarize.
+        provider: An object that conforms to the LLMProvider protocol.
+        chunk_tokens: Budget for each chunk.
+                      Defaults to `config.get_token_budget()`.
+        max_concurrency: Concurrent request limit.
+                         Defaults to `config.get_max_concurrency()`.
+
+    Returns:
+        The user prompt for the reduce step.
+    """
+    chunks = split_diff(diff, chunk_tokens or config.get_token_budget())
+    semaphore = asyncio.Semaphore(max_concurrency or config.get_max_concurrency())
+
+    async def summarize(chunk: str) -> str:
+        async with semaphore:
+            summary = await provider.complete(
+                system_prompt=SUMMARY_PROMPT, user_prompt=chunk
+            )
+        return summary.strip()
+
+    summaries = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+    return REDUCE_PREAMBLE + "".join(f"- {summary}\n" for summary in summaries)
+
+
+def _describe_without_hunks(file: FileDiff) -> str:
+    """What changed in a file that has no hunks to summarize."""
+    if file.is_binary:
+        return "binary file changed"
+    # Stand-ins for files whose hunks were not fetched carry their own note,
+    # "# <path>: <what was elided>".
+    prefix = f"# {file.path}: "
+    for line in file.header.splitlines():
+        if line.startswith(prefix):
+            return line[len(prefix):]
+    return "file mode or name changed"
+
+
+async def summarize_files(
+    diff: str,
+    provider: LLMProvider,
+    summary_cache: Optional[completion_cache.SummaryCache] = None,
+    file_tokens: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> str:
+    """
+    The map step of incremental generation: one cached summary per file.
+
+    Each file's summary is cached under its path and blob ids (see
+    `cache.make_summary_key`), so after staging one more file or amending
+    a typo only the files whose content changed are sent to the model.
+    Files without hunks (binaries, mode changes, files left out of the
+    diff) are described without a model call.
+
+    Args:
+        diff: The unified git diff to summarize.
+        provider: An object that conforms to the LLMProvider protocol.
+        summary_cache: Where summaries are looked up and stored.
+        file_tokens: Budget for each file's diff; larger ones are compacted.
+                     Defaults to `config.get_token_budget()`.
+        max_concurrency: Concurrent request limit.
+                         Defaults to `config.get_max_concurrency()`.
+
+    Returns:
+        The user prompt for the final, combining step.
+    """
+    file_tokens = file_tokens or config.get_token_budget()
+    semaphore = asyncio.Semaphore(max_concurrency or config.get_max_concurrency())
+    model = getattr(provider, "model", type(provider).__name__)
+    generated = 0
+
+    async def summarize(file: FileDiff) -> str:
+        nonlocal generated
+        if not file.hunks or file.is_binary:
+            return _describe_without_hunks(file)
+        key = completion_cache.make_summary_key(
+            file.path, file.blob_ids, file.text, FILE_SUMMARY_PROMPT, model
+        )
+        if summary_cache is not None:
+            cached = summary_cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = file.text
+        if estimate_tokens(text) > file_tokens:
+            text = compaction.compact_diff(text, budget=file_tokens).diff
+        async with semaphore:
+            summary = await provider.complete(
+                system_prompt=FILE_SUMMARY_PROMPT, user_prompt=text
+            )
+        generated += 1
+        summary = " ".join(summary.split())
+        if summary_cache is not None and summary:
+            summary_cache.set(key, summary)
+        return summary
+
+    files = parse_diff(diff)
+    summaries = await asyncio.gather(*(summarize(file) for file in files))
+    timings.annotate(files=len(files), summaries_generated=generated)
+    return FILE_SUMMARY_PREAMBLE + "".join(
+        f"- {file.path}: {summary}\n" for file, summary in zip(files, summaries)
+    )
+
+
+@dataclass
+class PreparedPrompt:
+    """
+    The user prompt for the final generation, and how it was derived.
+
+    Attributes:
+        user_prompt: The text to send alongside the style prompt.
+        cacheable: Whether the prompt is deterministic for a given diff and
+                   therefore worth looking up in the completion cache.
+        elided: Notes on content compaction removed from the diff.
+        original_tokens: Estimated size of the diff before preparation.
+        tokens: Estimated size of `user_prompt`.
+    """
+    user_prompt: str
+    cacheable: bool = True
+    elided: list[str] = field(default_factory=list)
+    original_tokens: int = 0
+    tokens: int = 0
+
+
+@timings.timed("prompt.prepare")
+async def prepare_prompt(
+    diff: Union[str, AsyncIterable[FileDiff]],
+    provider: LLMProvider,
+    token_budget: Optional[int] = None,
+    map_reduce: bool = False,
+    incremental: bool = False,
+    summary_cache: Optional[completion_cache.SummaryCache] = None,
+) -> PreparedPrompt:
+    """
+    Turns a staged diff into a user prompt that fits the token budget.
+
+    By default the diff is compacted (see `compaction.compact_diff`). With
+    `map_reduce`, a diff spanning several chunks is instead summarized
+    chunk by chunk (see `summarize_diff`). With `incremental`, a diff over
+    the budget is summarized file by file, reusing cached summaries of
+    files that have not changed (see `summarize_files`).
+
+    The diff may also be given file by file, e.g. by
+    `async_git.iter_staged_files`. Compaction then consumes the files as
+    they arrive and never holds the whole diff; the summarizing modes need
+    all of it and join the files first.
+
+    Args:
+        diff: The unified git diff, or its files.
+        provider: The provider used for map-reduce and per-file summaries.
+        token_budget: The token budget. Defaults to `config.get_token_budget()`.
+        map_reduce: Summarize large diffs instead of compacting them.
+        incremental: Summarize large diffs per file, with caching.
+        summary_cache: The per-file summary cache used with `incremental`.
+
+    Returns:
+        The prepared prompt.
+    """
+    budget = token_budget or config.get_token_budget()
+    if not isinstance(diff, str):
+        if not (map_reduce or incremental):
+            compactor = compaction.Compactor(budget)
+            async for file in diff:
+                compactor.add(file)
+            return _compacted(compactor.result())
+        diff = "".join([file.text async for file in diff])
+
+    if incremental and estimate_tokens(diff) > budget:
+        summaries = await summarize_files(
+            diff, provider, summary_cache, file_tokens=budget
+        )
+        # Unchanged files give the same summaries, so the final message can
+        # be cached as well.
+        return PreparedPrompt(
+            user_prompt=summaries,
+            original_tokens=estimate_tokens(diff),
+            tokens=estimate_tokens(summaries),
+        )
+    if map_reduce and len(split_diff(diff, budget)) > 1:
+        summaries = await summarize_diff(diff, provider, chunk_tokens=budget)
+        # Summaries differ from run to run, so they are not worth caching.
+        return PreparedPrompt(
+            user_prompt=summaries,
+            cacheable=False,
+            original_tokens=estimate_tokens(diff),
+            tokens=estimate_tokens(summaries),
+        )
+
+    return _compacted(compaction.compact_diff(diff, budget=budget))
+
+
+def _compacted(result: compaction.CompactionResult) -> PreparedPrompt:
+    timings.annotate(original_tokens=result.original_tokens, tokens=result.tokens)
+    return PreparedPrompt(
+        user_prompt=result.diff,
+        elided=result.elided,
+        original_tokens=result.original_tokens,
+        tokens=result.tokens,
+    )
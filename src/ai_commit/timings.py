@@ -0,0 +1,277 @@
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+# Per-request metrics Ollama reports alongside a completion. Durations are
+# in nanoseconds.
+OLLAMA_METRICS = (
+    "total_duration", "load_duration",
+    "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration",
+)
+
+
+@dataclass
+class Span:
+    """
+    One timed stage.
+
+    Attributes:
+        name: What was timed, e.g. "git diff" or "ollama.complete".
+        start: Start time, in seconds on the `time.perf_counter` clock.
+        end: End time, on the same clock.
+        depth: How many spans enclose this one.
+        lane: Identifies the thread or asyncio task the span ran in.
+        attrs: Extra details, such as Ollama's own metrics.
+    """
+    name: str
+    start: float
+    end: float = 0.0
+    depth: int = 0
+    lane: int = 0
+    attrs: dict = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+# The recorder collecting spans in this context, and the innermost open span.
+# Both are None unless timing was requested, which keeps `span` close to free.
+_recorder: ContextVar[Optional["Recorder"]] = ContextVar("recorder", default=None)
+_current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _lane() -> int:
+    """The current asyncio task, or else thread, as a small stable number."""
+    asyncio = sys.modules.get("asyncio")
+    task = None
+    if asyncio is not None:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            pass
+    return id(task) if task is not None else threading.get_ident()
+
+
+def process_age() -> Optional[float]:
+    """
+    Seconds since this process started, or None where that is unknown.
+
+    Lets the time spent starting Python and importing modules be shown as a
+    stage of its own. Only Linux exposes it cheaply, through /proc.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the parenthesised command name; starttime is 22nd.
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Recorder:
+    """Collects the spans recorded while it is active (see `recording`)."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self.origin = time.perf_counter()
+
+    def add_startup_span(self) -> None:
+        """Records the time from process start until now as "startup"."""
+        age = process_age()
+        if age is not None and age > 0:
+            now = time.perf_counter()
+            self.origin = now - age
+            self.spans.append(
+                Span("startup", start=self.origin, end=now, lane=_lane())
+            )
+
+    def ollama_metrics(self) -> dict:
+        """Ollama's own metrics, summed over every request."""
+        totals: dict = {}
+        for span in self.spans:
+            for key in OLLAMA_METRICS:
+                if key in span.attrs:
+                    totals[key] = totals.get(key, 0) + span.attrs[key]
+        return totals
+
+    def summary(self) -> str:
+        """A human-readable table of the stages and Ollama's metrics."""
+        lines = ["Timings:"]
+        for span in sorted(self.spans, key=lambda s: s.start):
+            label = "  " * (span.depth + 1) + span.name
+            extra = ""
+            if "time_to_first_token" in span.attrs:
+                extra = (
+                    f"  first token "
+                    f"{span.attrs['time_to_first_token'] * 1000:.0f}ms"
+                )
+            lines.append(f"{label:<36}{span.duration * 1000:>10.1f}ms{extra}")
+
+        metrics = self.ollama_metrics()
+        if metrics:
+            parts = []
+            if "load_duration" in metrics:
+                parts.append(f"load {metrics['load_duration'] / 1e6:.0f}ms")
+            for label, count, duration in (
+                ("prompt", "prompt_eval_count", "prompt_eval_duration"),
+                ("generated", "eval_count", "eval_duration"),
+            ):
+                if count in metrics and metrics.get(duration):
+                    seconds = metrics[duration] / 1e9
+                    parts.append(
+                        f"{label} {metrics[count]} tokens in "
+                        f"{seconds * 1000:.0f}ms "
+                        f"({metrics[count] / seconds:.0f} tokens/s)"
+                    )
+            if parts:
+                lines.append("Ollama: " + ", ".join(parts))
+        return "\n".join(lines)
+
+    def to_json(self) -> dict:
+        """The spans as plain data, with times in ms since recording began."""
+        return {
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": round((span.start - self.origin) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    "depth": span.depth,
+                    "attrs": span.attrs,
+                }
+                for span in sorted(self.spans, key=lambda s: s.start)
+            ],
+            "ollama": self.ollama_metrics(),
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """
+        The spans in the Chrome trace event format.
+
+        Load the file in chrome://tracing or https://ui.perfetto.dev. Each
+        Ollama request also gets child slices for the model load, prompt
+        evaluation and generation phases it reported, placed at the end of
+        the request in that order.
+        """
+        lanes: dict[int, int] = {}
+        events = []
+
+        def add(name: str, start: float, duration: float, lane: int,
+                args: dict) -> None:
+            events.append({
+                "name": name, "ph": "X", "pid": os.getpid(),
+                "tid": lanes.setdefault(lane, len(lanes) + 1),
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "args": args,
+            })
+
+        for span in sorted(self.spans, key=lambda s: s.start):
+            add(span.name, span.start, span.duration, span.lane, span.attrs)
+            end = span.end
+            for phase, key in (
+                ("ollama.eval", "eval_duration"),
+                ("ollama.prompt_eval", "prompt_eval_duration"),
+                ("ollama.load", "load_duration"),
+            ):
+                if key in span.attrs:
+                    duration = span.attrs[key] / 1e9
+                    add(phase, end - duration, duration, span.lane, {})
+                    end -= duration
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: Path, format: str = "chrome") -> None:
+        """Writes the trace to `path` as "chrome" trace events or plain "json"."""
+        data = self.to_chrome_trace() if format == "chrome" else self.to_json()
+        Path(path).write_text(json.dumps(data, indent=1), encoding="utf-8")
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[Recorder]:
+    """Records spans from everything run inside the block, including tasks."""
+    recorder = Recorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+class _ActiveSpan:
+    __slots__ = ("_recorder", "_span", "_token")
+
+    def __init__(self, recorder: Recorder, name: str, attrs: dict):
+        self._recorder = recorder
+        self._span = Span(name, start=0.0, attrs=attrs)
+
+    def __enter__(self) -> "_ActiveSpan":
+        parent = _current.get()
+        self._span.depth = parent.depth + 1 if parent is not None else 0
+        self._span.lane = _lane()
+        self._token = _current.set(self._span)
+        self._span.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._span.end = time.perf_counter()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # An async generator finalized outside the context it ran in.
+            pass
+        self._recorder.spans.append(self._span)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attrs):
+    """
+    Times the enclosed block as a stage called `name`.
+
+    Does nothing, at the cost of one context variable lookup, unless a
+    `recording` is active.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NULL_SPAN
+    return _ActiveSpan(recorder, name, attrs)
+
+
+def timed(name: str):
+    """Decorates a coroutine function so each call is timed as `name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def annotate(**attrs) -> None:
+    """Adds details to the innermost span being recorded, if any."""
+    current = _current.get()
+    if current is not None:
+        current.attrs.update(attrs)
@@ -0,0 +1,52 @@
+# The estimate is tuned for prose; code and diffs split into somewhat more
+# tokens, so context windows get this much headroom on top of it.
+CONTEXT_HEADROOM = 1.25
+# Room for the chat template wrapped around the system and user prompts.
+TEMPLATE_TOKENS = 64
+MIN_CONTEXT = 2048
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates how many tokens a model will see for `text`.
+
+    This is a deliberately cheap approximation (about four characters per
+    token) used for budgeting prompts, not an exact tokenizer.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
+def context_size(
+    prompt_tokens: int,
+    num_predict: int,
+    maximum: int,
+    minimum: int = MIN_CONTEXT,
+) -> int:
+    """
+    Picks a context window large enough for a prompt and its completion.
+
+    Sizes are powers of two. Ollama reloads the model whenever `num_ctx`
+    changes, so prompts of similar size should get the same window.
+
+    Args:
+        prompt_tokens: The estimated size of the system and user prompts.
+        num_predict: The most tokens that will be generated.
+        maximum: The largest window to return.
+        minimum: The smallest window to return.
+
+    Returns:
+        The smallest power of two, at least `minimum`, that holds the
+        prompt with headroom plus the completion, or `maximum` if that is
+        smaller.
+    """
+    needed = int(prompt_tokens * CONTEXT_HEADROOM) + num_predict + TEMPLATE_TOKENS
+    size = minimum
+    while size < needed:
+        size *= 2
+    return min(size, maximum)
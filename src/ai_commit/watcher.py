@@ -0,0 +1,124 @@
+import asyncio
+import contextlib
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from ai_commit import async_git, cache, service
+from ai_commit.git_integration import NoStagedChanges
+from ai_commit.llm_provider import LLMProvider
+
+OnGenerated = Callable[[str], Awaitable[None]]
+OnError = Callable[[Exception], Awaitable[None]]
+
+
+async def _index_path(cwd: Optional[Path] = None) -> Path:
+    """Locates the index file, which also works inside linked worktrees."""
+    output = await async_git.run_git("rev-parse", "--git-path", "index", cwd=cwd)
+    path = Path(output.strip())
+    return path if path.is_absolute() else Path(cwd or ".") / path
+
+
+def _signature(path: Path) -> Optional[tuple[int, int]]:
+    """Cheap change detector for the index: modification time and size."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+async def pregenerate(
+    style: str,
+    provider: LLMProvider,
+    completion_cache: cache.CompletionCache,
+    token_budget: Optional[int] = None,
+    cwd: Optional[Path] = None,
+) -> Optional[str]:
+    """
+    Generates and caches the message for the currently staged diff.
+
+    The prompt is prepared exactly as the interactive flow prepares it, so
+    the cache entry is found when the user runs `ai-commit` on the same
+    staged changes.
+
+    Returns:
+        The message, or None when nothing is staged.
+    """
+    try:
+        diff = await async_git.get_staged_diff(cwd=cwd)
+    except NoStagedChanges:
+        return None
+    prepared = await service.prepare_prompt(diff, provider, token_budget)
+    return await service.generate_commit(
+        diff=prepared.user_prompt,
+        style=style,
+        provider=provider,
+        cache=completion_cache,
+    )
+
+
+async def watch(
+    style: str,
+    provider: LLMProvider,
+    completion_cache: cache.CompletionCache,
+    token_budget: Optional[int] = None,
+    cwd: Optional[Path] = None,
+    poll_interval: float = 0.5,
+    debounce: float = 1.5,
+    on_generated: Optional[OnGenerated] = None,
+    on_error: Optional[OnError] = None,
+) -> None:
+    """
+    Pre-generates commit messages whenever the staged changes settle.
+
+    Polls the git index; once it has stopped changing for `debounce`
+    seconds, the message for the staged diff is generated in the background
+    and stored in `completion_cache`. A further change cancels a generation
+    still in progress. Runs until cancelled.
+
+    Args:
+        style: The prompt style to generate with.
+        provider: The provider used for generation.
+        completion_cache: Where generated messages are stored.
+        token_budget: The token budget the interactive flow will use.
+        cwd: A directory inside the repository to watch.
+        poll_interval: Seconds between index checks.
+        debounce: Seconds the index must stay unchanged before generating.
+        on_generated: Awaited with each message generated.
+        on_error: Awaited with any error from a background generation;
+                  the watcher keeps running either way.
+    """
+    index = await _index_path(cwd)
+    seen = _signature(index)
+    changed_at: Optional[float] = asyncio.get_running_loop().time()
+    task: Optional[asyncio.Task] = None
+
+    async def generate() -> None:
+        try:
+            message = await pregenerate(
+                style, provider, completion_cache, token_budget, cwd
+            )
+        except Exception as e:
+            if on_error is not None:
+                await on_error(e)
+            return
+        if message is not None and on_generated is not None:
+            await on_generated(message)
+
+    try:
+        while True:
+            now = asyncio.get_running_loop().time()
+            current = _signature(index)
+            if current != seen:
+                seen, changed_at = current, now
+                if task is not None:
+                    task.cancel()
+            elif changed_at is not None and now - changed_at >= debounce:
+                changed_at = None
+                task = asyncio.ensure_future(generate())
+            await asyncio.sleep(poll_interval)
+    finally:
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
@@ -0,0 +1,63 @@
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+
+
+class CountingProvider:
+    """Answers after `delay`, counting calls and the most in flight at once."""
+    model = "counting"
+    options: dict = {}
+
+    def __init__(self, delay: float = 0.0, fail_on: str = ""):
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.delay = delay
+        self.fail_on = fail_on
+
+    async def complete(
+        self, system_prompt: str, user_prompt: str, options=None
+    ) -> str:
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail_on and self.fail_on in user_prompt:
+                raise RuntimeError("model failed")
+            return f"feat: message {self.calls}"
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def counting_provider():
+    """The CountingProvider class, for tests to create providers with."""
+    return CountingProvider
+
+
+@pytest.fixture
+def style_prompt(monkeypatch):
+    """Serves every prompt style from memory."""
+    monkeypatch.setattr(
+        "ai_commit.prompt_manager.load_style", lambda style: "style prompt"
+    )
+
+
+@pytest.fixture
+def make_git_repo(tmp_path: Path, monkeypatch):
+    """Creates empty git repositories under tmp_path that can be committed to."""
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "Test")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "test@example.com")
+
+    def make(name: str = "repo") -> Path:
+        repo_path = tmp_path / name
+        repo_path.mkdir()
+        subprocess.run(["git", "init"], cwd=repo_path,
+                       check=True, capture_output=True)
+        return repo_path
+
+    return make
@@ -0,0 +1,232 @@
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from ai_commit import async_git, git_integration
+
+
+@pytest.fixture
+def git_repo(tmp_path: Path, monkeypatch):
+    """Creates a temporary git repository with one commit."""
+    for var in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{var}_NAME", "Test")
+        monkeypatch.setenv(f"GIT_{var}_EMAIL", "test@example.com")
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    subprocess.run(["git", "init", "-b", "main"], cwd=repo_path,
+                   check=True, capture_output=True)
+    (repo_path / "app.py").write_text("value = 1\n")
+    subprocess.run(["git", "add", "."], cwd=repo_path, check=True)
+    subprocess.run(["git", "commit", "-m", "initial"], cwd=repo_path,
+                   check=True, capture_output=True)
+    return repo_path
+
+
+async def test_get_staged_diff_returns_diff(git_repo: Path):
+    """Verify the async diff matches what `git diff --staged` reports."""
+    (git_repo / "app.py").write_text("value = 2\n")
+    subprocess.run(["git", "add", "app.py"], cwd=git_repo, check=True)
+
+    diff = await async_git.get_staged_diff(cwd=git_repo)
+
+    assert "-value = 1" in diff
+    assert "+value = 2" in diff
+
+
+async def test_get_staged_diff_no_changes_raises_exception(git_repo: Path):
+    """Verify NoStagedChanges is raised when nothing is staged."""
+    with pytest.raises(git_integration.NoStagedChanges):
+        await async_git.get_staged_diff(cwd=git_repo)
+
+
+async def test_outside_repository_raises_not_a_git_repository(tmp_path: Path):
+    """Verify git's 'not a git repository' failure maps to the domain error."""
+    with pytest.raises(git_integration.NotAGitRepositoryError):
+        await async_git.get_staged_diff(cwd=tmp_path)
+
+
+async def test_commit_and_recent_subjects(git_repo: Path):
+    """Verify commit() records the message and the log reflects it."""
+    (git_repo / "app.py").write_text("value = 3\n")
+    subprocess.run(["git", "add", "app.py"], cwd=git_repo, check=True)
+
+    await async_git.commit("feat: async commit", cwd=git_repo)
+
+    assert await async_git.get_recent_subjects(2, cwd=git_repo) == [
+        "feat: async commit", "initial"
+    ]
+
+
+async def test_recent_subjects_of_a_repository_without_commits(make_git_repo):
+    """Verify an empty repository has no log rather than an error."""
+    assert await async_git.get_recent_subjects(cwd=make_git_repo()) == []
+
+
+async def test_get_current_branch(git_repo: Path):
+    """Verify the branch name is reported, and "HEAD" once detached."""
+    assert await async_git.get_current_branch(cwd=git_repo) == "main"
+
+    subprocess.run(["git", "checkout", "--detach"], cwd=git_repo,
+                   check=True, capture_output=True)
+    assert await async_git.get_current_branch(cwd=git_repo) == "HEAD"
+
+
+async def test_run_git_timeout_raises_timeout_expired(git_repo: Path):
+    """Verify a git command exceeding its timeout is killed and reported."""
+    with pytest.raises(subprocess.TimeoutExpired):
+        await async_git.run_git("log", cwd=git_repo, timeout=1e-6)
+
+
+async def test_get_staged_diff_skips_excluded_and_binary_files(git_repo: Path):
+    """Verify lockfiles and binaries are never fetched, only summarized."""
+    (git_repo / "app.py").write_text("value = 2\n")
+    (git_repo / "poetry.lock").write_text("".join(f"pin {i}\n" for i in range(50)))
+    (git_repo / "logo.bin").write_bytes(b"\0\1\2")
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    diff = await async_git.get_staged_diff(cwd=git_repo)
+
+    assert "+value = 2" in diff
+    assert "pin 1" not in diff
+    assert "# poetry.lock: 50 changed lines elided (excluded)" in diff
+    assert "# logo.bin: binary file elided" in diff
+
+
+async def test_get_staged_diff_custom_exclude_and_size_cap(git_repo: Path):
+    """Verify exclude patterns are configurable and big files are skipped."""
+    (git_repo / "app.py").write_text("value = 2\n")
+    (git_repo / "big.py").write_text("".join(f"line {i}\n" for i in range(500)))
+    (git_repo / "poetry.lock").write_text("pin\n")
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    diff = await async_git.get_staged_diff(
+        cwd=git_repo, max_bytes=1000, exclude=["app.*"]
+    )
+
+    assert "# app.py: 2 changed lines elided (excluded)" in diff
+    assert "# big.py: 500 changed lines elided (over size cap)" in diff
+    assert "+pin" in diff
+
+
+async def test_files_read_before_the_cap_are_kept_and_not_fetched_again(
+    git_repo: Path, monkeypatch
+):
+    """Verify the sync and async readers agree once the whole diff overflows."""
+    (git_repo / "a.py").write_text("first = 1\n")
+    (git_repo / "b.py").write_text("".join(f"line {i}\n" for i in range(500)))
+    (git_repo / "c.py").write_text("last = 1\n")
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    diff = await async_git.get_staged_diff(cwd=git_repo, max_bytes=2000)
+    monkeypatch.chdir(git_repo)
+    sync_diff = git_integration.get_staged_diff_capped(max_bytes=2000)
+
+    assert diff == sync_diff
+    assert diff.count("+first = 1") == 1
+    assert "+last = 1" in diff
+    assert "# b.py: 500 changed lines elided (over size cap)" in diff
+
+
+async def test_run_git_capped_stops_reading_at_the_cap(git_repo: Path):
+    """Verify output past the cap is not read and git is stopped."""
+    (git_repo / "big.py").write_text("x" * 200_000)
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    output, truncated = await async_git.run_git_capped(
+        "diff", "--staged", max_bytes=1000, cwd=git_repo
+    )
+
+    assert truncated
+    assert len(output) < 200_000
+
+
+async def test_iter_staged_files_yields_files_then_stubs(git_repo: Path):
+    """Verify files arrive parsed, one by one, with skipped files last."""
+    (git_repo / "app.py").write_text("value = 2\n")
+    (git_repo / "new.py").write_text("added = True\n")
+    (git_repo / "poetry.lock").write_text("pin\n")
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    files = [file async for file in async_git.iter_staged_files(cwd=git_repo)]
+
+    assert [f.path for f in files] == ["app.py", "new.py", "poetry.lock"]
+    assert files[1].status == "added"
+    assert "+value = 2\n" in files[0].hunks[0]
+    assert files[2].hunks == []
+    assert "1 changed lines elided (excluded)" in files[2].text
+
+
+async def test_staged_files_with_quoted_paths_are_kept(git_repo: Path):
+    """Verify a non-ASCII path, which git quotes, reaches the prompt."""
+    (git_repo / "café.py").write_text("x = 1\n")
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    diff = await async_git.get_staged_diff(cwd=git_repo)
+    whole = [file async for file in async_git.iter_staged_files(cwd=git_repo)]
+    fetched = [
+        file async for file in async_git.iter_staged_files(
+            cwd=git_repo, max_bytes=100
+        )
+    ]
+
+    assert "+x = 1" in diff
+    assert [f.path for f in whole] == ["café.py"]
+    assert [f.path for f in fetched] == ["café.py"]
+
+
+async def test_iter_staged_files_stops_at_the_byte_cap(git_repo: Path):
+    """Verify git's output is cut off at the cap and the cut is noted."""
+    (git_repo / "long.py").write_text("".join("x" * 1000 + "\n" for _ in range(10)))
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    files = [
+        file async for file in async_git.iter_staged_files(
+            cwd=git_repo, max_bytes=3000
+        )
+    ]
+
+    text = "".join(file.text for file in files)
+    assert len(text) < 4000
+    assert text.endswith("# ... diff output truncated at 3000 bytes\n")
+
+
+async def test_get_staged_diff_under_the_cap_needs_no_numstat(
+    git_repo: Path, monkeypatch
+):
+    """Verify a diff that fits is read in one git call and still trimmed."""
+    (git_repo / "app.py").write_text("value = 2\n")
+    (git_repo / "poetry.lock").write_text("pin\n")
+    subprocess.run(["git", "add", "."], cwd=git_repo, check=True)
+
+    async def no_numstat(cwd=None):
+        raise AssertionError("numstat should not be needed")
+
+    monkeypatch.setattr(async_git, "get_staged_stats", no_numstat)
+
+    diff = await async_git.get_staged_diff(cwd=git_repo)
+    files = [file async for file in async_git.iter_staged_files(cwd=git_repo)]
+
+    assert "+value = 2" in diff
+    assert "# poetry.lock: 1 changed lines elided (excluded)" in diff
+    assert "".join(file.text for file in files) == diff
+
+
+async def test_iter_git_lines_kills_git_that_goes_silent(
+    tmp_path: Path, monkeypatch
+):
+    """Verify a git process producing no output within the timeout is killed."""
+    hanging_git = tmp_path / "bin" / "git"
+    hanging_git.parent.mkdir()
+    hanging_git.write_text("#!/bin/sh\nexec sleep 5\n")
+    hanging_git.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{hanging_git.parent}{os.pathsep}{os.environ['PATH']}")
+
+    started = time.perf_counter()
+    with pytest.raises(subprocess.TimeoutExpired):
+        async for _ in async_git.iter_git_lines("log", "-p", timeout=0.2):
+            pass
+
+    assert time.perf_counter() - started < 2
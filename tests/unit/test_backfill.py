@@ -0,0 +1,86 @@
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from ai_commit import backfill
+
+pytestmark = pytest.mark.usefixtures("style_prompt")
+
+
+@pytest.fixture
+def git_repo(make_git_repo) -> Path:
+    """A repository with five commits, each adding one file."""
+    repo_path = make_git_repo()
+    for number in range(1, 6):
+        (repo_path / f"file{number}.py").write_text(f"value = {number}\n")
+        subprocess.run(["git", "add", "."], cwd=repo_path, check=True)
+        subprocess.run(
+            ["git", "commit", "-q", "-m", f"commit {number}"],
+            cwd=repo_path, check=True,
+        )
+    return repo_path
+
+
+async def test_iter_commit_diffs_streams_each_commit_oldest_first(git_repo: Path):
+    """
+    Verify every commit in the range arrives with its own subject and diff.
+    """
+    commits = [c async for c in backfill.iter_commit_diffs("HEAD~3..HEAD", git_repo)]
+
+    assert [c.subject for c in commits] == ["commit 3", "commit 4", "commit 5"]
+    assert all(len(c.sha) == 40 for c in commits)
+    assert "+value = 4" in commits[1].diff
+    assert "file3.py" not in commits[1].diff
+
+
+async def test_run_backfill_writes_jsonl_with_bounded_concurrency(
+    git_repo: Path, tmp_path: Path, counting_provider
+):
+    """
+    Verify all commits are generated concurrently, never beyond the limit,
+    and each result is written as one JSON line.
+    """
+    provider = counting_provider(delay=0.02)
+    output = tmp_path / "out.jsonl"
+
+    stats = await backfill.run_backfill(
+        "HEAD~4..HEAD", "conventional", provider, output,
+        concurrency=2, cwd=git_repo,
+    )
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert stats.commits == 4 and stats.failed == 0
+    assert provider.peak == 2
+    assert sorted(r["subject"] for r in records) == [
+        "commit 2", "commit 3", "commit 4", "commit 5",
+    ]
+    assert all(r["message"].startswith("feat:") for r in records)
+    assert stats.commits_per_minute > 0 and stats.tokens_per_second > 0
+
+
+async def test_run_backfill_resumes_and_retries_failures(
+    git_repo: Path, tmp_path: Path, counting_provider
+):
+    """
+    Verify a second run skips commits already recorded and retries only
+    the ones that failed.
+    """
+    output = tmp_path / "out.jsonl"
+    failing = counting_provider(fail_on="value = 3")
+    first = await backfill.run_backfill(
+        "HEAD~4..HEAD", "conventional", failing, output, cwd=git_repo
+    )
+    assert first.commits == 4 and first.failed == 1
+
+    provider = counting_provider()
+    second = await backfill.run_backfill(
+        "HEAD~4..HEAD", "conventional", provider, output, cwd=git_repo
+    )
+
+    assert provider.calls == 1
+    assert second.commits == 1 and second.skipped == 3
+    assert backfill.load_completed(output) == {
+        json.loads(line)["sha"] for line in output.read_text().splitlines()
+    }
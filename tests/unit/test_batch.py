@@ -0,0 +1,89 @@
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from ai_commit import batch, cli
+
+pytestmark = pytest.mark.usefixtures("style_prompt")
+
+
+@pytest.fixture
+def make_repo(make_git_repo):
+    """Creates git repositories with one staged change each."""
+    def make(name: str) -> Path:
+        repo_path = make_git_repo(name)
+        (repo_path / "app.py").write_text(f"name = {name!r}\n")
+        subprocess.run(["git", "add", "."], cwd=repo_path, check=True)
+        return repo_path
+
+    return make
+
+
+async def test_run_batch_shares_a_bounded_provider(make_repo, counting_provider):
+    """Verify every repository gets a message with limited concurrency."""
+    repos = [make_repo(f"repo{i}") for i in range(6)]
+    provider = counting_provider(delay=0.02)
+
+    records = await batch.run_batch(
+        repos, "conventional", provider, jobs=6, concurrency=2
+    )
+
+    assert [record.repo for record in records] == [str(repo) for repo in repos]
+    assert all(record.message and not record.error for record in records)
+    assert set(records[0].timings) == {"prepare", "generate"}
+    assert provider.calls == 6
+    assert provider.peak == 2
+
+
+async def test_run_batch_records_failures_without_stopping(
+    make_repo, tmp_path, counting_provider
+):
+    """Verify a failing repository does not stop the others."""
+    good = make_repo("good")
+    empty = tmp_path / "not-a-repo"
+    empty.mkdir()
+    seen = []
+
+    records = await batch.run_batch(
+        [empty, good], "conventional", counting_provider(), on_record=seen.append
+    )
+
+    assert records[0].error.startswith("NotAGitRepositoryError")
+    assert records[0].message is None
+    assert records[1].message == "feat: message 1"
+    assert sorted(record.repo for record in seen) == sorted([str(empty), str(good)])
+
+
+def test_cli_batch_prints_json_per_repository(make_repo, tmp_path):
+    """Verify the batch command emits one JSON record per repository."""
+    good = make_repo("good")
+    missing = tmp_path / "missing"
+    missing.mkdir()
+
+    result = CliRunner().invoke(
+        cli.app, ["batch", "--dry-run", str(good), str(missing)]
+    )
+
+    assert result.exit_code == 1
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    by_repo = {record["repo"]: record for record in records}
+    assert by_repo[str(good)]["message"].startswith("Mock Response:")
+    assert by_repo[str(missing)]["error"]
+
+
+async def test_run_batch_generates_identical_changes_once(make_repo, counting_provider):
+    """Verify repositories with the same staged change share one request."""
+    repos = [make_repo(f"clone{i}") for i in range(3)]
+    for repo in repos:
+        (repo / "app.py").write_text("name = 'shared'\n")
+        subprocess.run(["git", "add", "."], cwd=repo, check=True)
+    # Long enough for every repository's git work to finish meanwhile.
+    provider = counting_provider(delay=0.5)
+
+    records = await batch.run_batch(repos, "conventional", provider, jobs=3)
+
+    assert provider.calls == 1
+    assert {record.message for record in records} == {"feat: message 1"}
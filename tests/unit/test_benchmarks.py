@@ -0,0 +1,94 @@
+import asyncio
+
+from ai_commit.llm_provider import (
+    BoundedProvider,
+    CoalescingProvider,
+    OllamaProvider,
+    OpenAIProvider,
+)
+from benchmarks.prompt_cache import make_diffs, measure
+from benchmarks.run import find_regressions, summarize
+from benchmarks.stub_ollama import StubOllama, StubSettings
+from benchmarks.throughput import run
+
+
+async def test_stub_ollama_answers_like_ollama(tmp_path, monkeypatch):
+    """Verify the stub serves plain and streamed completions and warm-ups."""
+    monkeypatch.setenv("AI_COMMIT_CACHE_DIR", str(tmp_path))
+    settings = StubSettings(response="feat: add stub", tokens_per_chunk=2)
+    with StubOllama(settings) as stub:
+        async with OllamaProvider(url=stub.url, model="stub") as provider:
+            await provider.warm_up()
+            completion = await provider.complete("system", "user")
+            tokens = [token async for token in provider.stream("system", "user")]
+
+    assert completion == "feat: add stub"
+    assert tokens == ["feat: add ", "stub"]
+    assert stub.requests == 3
+
+
+def test_find_regressions_allows_tolerance_and_slack():
+    """Only medians past the tolerance and absolute slack count."""
+    baseline = {"results": {
+        "fast": {"median_ms": 1.0},
+        "slow": {"median_ms": 100.0},
+        "gone": {"median_ms": 5.0},
+    }}
+    report = {"results": {
+        "fast": {"median_ms": 2.5},
+        "slow": {"median_ms": 140.0},
+    }}
+
+    regressions = find_regressions(report, baseline, tolerance=0.25)
+
+    assert len(regressions) == 1 and regressions[0].startswith("slow:")
+
+
+def test_summarize_reports_milliseconds():
+    """Timings in seconds are reduced to median, p95 and minimum."""
+    summary = summarize([0.010, 0.020, 0.030, 0.040, 0.100])
+
+    assert summary == {
+        "median_ms": 30.0, "p95_ms": 100.0, "min_ms": 10.0, "runs": 5,
+    }
+
+
+async def test_prompt_cache_measures_tokens_saved(tmp_path, monkeypatch):
+    """Verify later requests only evaluate what follows the shared prefix."""
+    monkeypatch.setenv("AI_COMMIT_CACHE_DIR", str(tmp_path))
+    with StubOllama() as stub:
+        result = await measure(
+            stub.url, "stub", "chat", "conventional", make_diffs(3)
+        )
+
+    assert 0 < result["later_tokens"] < result["first_tokens"]
+    assert result["saved"] > 0.5
+
+
+def test_throughput_grows_with_concurrency_on_a_batching_server(
+    tmp_path, monkeypatch
+):
+    """Verify both backends talk to the stub and overlap their requests."""
+    monkeypatch.setenv("AI_COMMIT_CACHE_DIR", str(tmp_path))
+    settings = StubSettings(first_token_latency=0.05)
+
+    results = run({}, "stub", [1, 8], requests=8, settings=settings)
+
+    for backend in ("ollama", "openai"):
+        assert results[backend][8]["per_second"] > 3 * results[backend][1]["per_second"]
+
+
+async def test_distinct_requests_reach_the_stub_as_one_batch(tmp_path, monkeypatch):
+    """Verify concurrent completions are batched into one /v1/completions call."""
+    monkeypatch.setenv("AI_COMMIT_CACHE_DIR", str(tmp_path))
+    with StubOllama(StubSettings(response="feat: batched")) as stub:
+        async with CoalescingProvider(
+            BoundedProvider(OpenAIProvider(url=stub.openai_url, model="stub")),
+            max_batch_size=8, max_wait=0.05,
+        ) as provider:
+            results = await asyncio.gather(
+                *(provider.complete("system", f"diff {n}") for n in range(8))
+            )
+
+    assert results == ["feat: batched"] * 8
+    assert stub.requests == 1
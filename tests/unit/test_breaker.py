@@ -0,0 +1,55 @@
+import time
+
+from ai_commit.breaker import CircuitBreaker
+
+
+def test_breaker_opens_after_threshold(tmp_path):
+    """Consecutive failures up to the threshold open the breaker."""
+    breaker = CircuitBreaker("http://a", threshold=2, cooldown=30, directory=tmp_path)
+
+    breaker.record_failure()
+    assert breaker.retry_after() == 0
+
+    breaker.record_failure()
+    assert 29 < breaker.retry_after() <= 30
+
+
+def test_breaker_success_resets_failures(tmp_path):
+    """A success in between means failures are no longer consecutive."""
+    breaker = CircuitBreaker("http://a", threshold=2, cooldown=30, directory=tmp_path)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.retry_after() == 0
+
+
+def test_breaker_state_is_shared_between_instances(tmp_path):
+    """Another process sees the open breaker; other endpoints are unaffected."""
+    CircuitBreaker("http://a", threshold=1, directory=tmp_path).record_failure()
+
+    assert CircuitBreaker("http://a", directory=tmp_path).retry_after() > 0
+    assert CircuitBreaker("http://b", directory=tmp_path).retry_after() == 0
+
+
+def test_breaker_half_opens_after_cooldown(tmp_path):
+    """Once the cool-down passes one request is let through; failing reopens."""
+    breaker = CircuitBreaker(
+        "http://a", threshold=1, cooldown=0.05, directory=tmp_path
+    )
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.retry_after() == 0
+
+    breaker.record_failure()
+    assert breaker.retry_after() > 0
+
+
+def test_breaker_ignores_corrupt_state(tmp_path):
+    """Unreadable state is treated as a closed breaker."""
+    breaker = CircuitBreaker("http://a", directory=tmp_path)
+    breaker.path.parent.mkdir(parents=True)
+    breaker.path.write_text("{not json")
+
+    assert breaker.retry_after() == 0
@@ -0,0 +1,86 @@
+import os
+import time
+
+from ai_commit import cache
+
+
+def test_make_key_ignores_line_endings_but_not_content():
+    """
+    Verify the cache key is stable across CRLF/LF diffs but changes
+    with the diff, style prompt, model or options.
+    """
+    base = cache.make_key("diff\n+line\n", "style", "llama3", {"temperature": 0})
+
+    assert base == cache.make_key(
+        "diff\r\n+line\r\n", "style", "llama3", {"temperature": 0}
+    )
+    assert base != cache.make_key("diff\n+other\n", "style", "llama3", {})
+    assert base != cache.make_key("diff\n+line\n", "pirate", "llama3", {})
+    assert base != cache.make_key("diff\n+line\n", "style", "mistral", {})
+    assert base != cache.make_key(
+        "diff\n+line\n", "style", "llama3", {"temperature": 1}
+    )
+
+
+def test_get_returns_stored_message_and_counts_stats(tmp_path):
+    """Verify a stored message is returned and hits/misses are counted."""
+    store = cache.CompletionCache(directory=tmp_path, max_entries=10, max_age=60)
+
+    assert store.get("abc") is None
+    store.set("abc", "feat: cache completions")
+
+    assert store.get("abc") == "feat: cache completions"
+    assert store.stats == cache.CacheStats(hits=1, misses=1)
+
+
+def test_expired_entries_are_misses(tmp_path):
+    """Verify entries older than max_age are treated as misses and removed."""
+    store = cache.CompletionCache(directory=tmp_path, max_entries=10, max_age=60)
+    store.set("abc", "old message")
+    entry = store.directory / "abc.json"
+    entry.write_text('{"message": "old message", "created": 0}')
+
+    assert store.get("abc") is None
+    assert not entry.exists()
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    """Verify the least recently used entry is evicted past max_entries."""
+    store = cache.CompletionCache(directory=tmp_path, max_entries=2, max_age=3600)
+    store.set("first", "1")
+    store.set("second", "2")
+    now = time.time()
+    os.utime(store.directory / "first.json", (now - 20, now - 20))
+    os.utime(store.directory / "second.json", (now - 10, now - 10))
+
+    # Reading "first" makes "second" the least recently used entry.
+    assert store.get("first") == "1"
+    store.set("third", "3")
+
+    assert store.get("second") is None
+    assert store.get("first") == "1"
+    assert store.get("third") == "3"
+    assert not list(store.directory.glob("*.tmp"))
+
+
+def test_summary_cache_is_keyed_by_blob_ids_apart_from_completions(tmp_path):
+    """
+    Verify summary keys follow the blob ids rather than the diff text, and
+    summaries are stored apart from commit messages.
+    """
+    key = cache.make_summary_key("a.py", ("111", "222"), "diff one", "p", "llama3")
+
+    assert key == cache.make_summary_key(
+        "a.py", ("111", "222"), "diff two", "p", "llama3"
+    )
+    assert key != cache.make_summary_key(
+        "a.py", ("111", "333"), "diff one", "p", "llama3"
+    )
+    assert key != cache.make_summary_key(
+        "b.py", ("111", "222"), "diff one", "p", "llama3"
+    )
+    assert key != cache.make_summary_key("a.py", None, "diff one", "p", "llama3")
+
+    cache.SummaryCache(directory=tmp_path).set(key, "renames a helper")
+    assert cache.CompletionCache(directory=tmp_path).get(key) is None
+    assert cache.SummaryCache(directory=tmp_path).get(key) == "renames a helper"
@@ -1,19 +1,31 @@
+import asyncio
 import subprocess
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from typer.testing import CliRunner
 
-from ai_commit import cli
+from ai_commit import cli, flows
+from ai_commit.diff_parser import FileDiff
+from ai_commit.llm_provider import MockProvider
 
 runner = CliRunner()
 
+FAKE_FILE = FileDiff(
+    path="fake.py",
+    header="diff --git a/fake.py b/fake.py\n",
+    hunks=["@@ -0,0 +1 @@\n+fake diff\n"],
+)
+
 
 @pytest.fixture
 def mock_dependencies(monkeypatch):
     """A central fixture to mock all external dependencies."""
+    async def mock_iter_staged_files():
+        yield FAKE_FILE
+
     monkeypatch.setattr(
-        "ai_commit.git_integration.get_staged_diff", lambda: "fake diff")
+        "ai_commit.async_git.iter_staged_files", mock_iter_staged_files)
 
     generated_msg = "feat: implement new feature"
 
@@ -22,8 +34,14 @@ def mock_dependencies(monkeypatch):
 
     monkeypatch.setattr("ai_commit.service.generate_commit", mock_generate_commit)
 
-    mock_commit_func = MagicMock()
-    monkeypatch.setattr("ai_commit.git_integration.commit", mock_commit_func)
+    async def mock_stream_commit(*args, **kwargs):
+        for token in generated_msg.split(" "):
+            yield token + " "
+
+    monkeypatch.setattr("ai_commit.service.stream_commit", mock_stream_commit)
+
+    mock_commit_func = AsyncMock()
+    monkeypatch.setattr("ai_commit.async_git.commit", mock_commit_func)
 
     return generated_msg, mock_commit_func
 
@@ -58,3 +76,157 @@ def test_cli_confirm_edit(mock_dependencies, monkeypatch):
 
     assert result.exit_code == 0, result.stdout
     mock_commit.assert_called_once_with(edited_msg)
+
+
+def test_cli_streams_message_tokens(mock_dependencies):
+    """Test that the streamed tokens are rendered as one message."""
+    generated_msg, mock_commit = mock_dependencies
+
+    result = runner.invoke(cli.app, ["--dry-run", "--print"])
+
+    assert result.exit_code == 0, result.stdout
+    assert generated_msg in result.stdout
+    mock_commit.assert_not_called()
+
+
+def test_cli_timings_summary_and_trace(mock_dependencies, tmp_path):
+    """Test that --timings reports stages and --trace writes a trace file."""
+    trace = tmp_path / "trace.json"
+
+    result = runner.invoke(
+        cli.app, ["--dry-run", "--print", "--timings", "--trace", str(trace)]
+    )
+
+    assert result.exit_code == 0, result.stdout
+    assert "Timings:" in result.stderr
+    assert "prompt.prepare" in result.stderr
+    assert "traceEvents" in trace.read_text()
+
+
+def test_model_warm_up_overlaps_diff_collection(monkeypatch):
+    """Test that the model warm-up starts while the staged diff is read."""
+    events = []
+
+    class WarmingProvider(MockProvider):
+        async def warm_up(self):
+            events.append("warm-up started")
+            await asyncio.sleep(1)
+
+    async def slow_diff():
+        await asyncio.sleep(0.05)
+        events.append("diff collected")
+        yield FAKE_FILE
+
+    monkeypatch.setattr("ai_commit.async_git.iter_staged_files", slow_diff)
+
+    message = asyncio.run(flows.generate_message(
+        WarmingProvider(), flows.GenerationOptions(style="conventional")
+    ))
+
+    assert events == ["warm-up started", "diff collected"]
+    assert "fake diff" in message
+
+
+def test_cli_live_prefers_running_daemon(monkeypatch):
+    """Test that --live delegates to a running daemon."""
+    calls = []
+    monkeypatch.setattr(
+        "ai_commit.daemon_client.run_generate", lambda **kw: calls.append(kw)
+    )
+    fallback = MagicMock()
+    monkeypatch.setattr("ai_commit.flows.run_generate", fallback)
+
+    result = runner.invoke(cli.app, ["--live", "--print"])
+
+    assert result.exit_code == 0, result.stdout
+    assert calls and calls[0]["print_commit"] is True
+    fallback.assert_not_called()
+
+
+def test_cli_live_falls_back_without_daemon(monkeypatch, tmp_path):
+    """Test that --live generates in-process when no daemon is listening."""
+    monkeypatch.setenv("AI_COMMIT_SOCKET", str(tmp_path / "missing.sock"))
+    read_diff = MagicMock(return_value="fake diff")
+    monkeypatch.setattr(
+        "ai_commit.git_integration.get_staged_diff_capped", read_diff
+    )
+    fallback = MagicMock()
+    monkeypatch.setattr("ai_commit.flows.run_generate", fallback)
+
+    result = runner.invoke(cli.app, ["--live", "--print"])
+
+    assert result.exit_code == 0, result.stdout
+    fallback.assert_called_once()
+    # The in-process generation reads the diff; the probe must not.
+    read_diff.assert_not_called()
+
+
+def test_live_mode_names_the_configured_backend(
+    mock_dependencies, monkeypatch, capsys
+):
+    """Test that live mode reports the backend it will actually call."""
+    monkeypatch.setenv("AI_COMMIT_BACKEND", "openai")
+    monkeypatch.setattr("ai_commit.llm_provider.create_provider", MockProvider)
+
+    flows.run_generate(flows.GenerationOptions(), print_commit=True, no_cache=True)
+
+    output = capsys.readouterr().out
+    assert "Using real OpenAI-compatible provider." in output
+    assert "Ollama" not in output
+
+
+def test_cli_backfill_reports_throughput(monkeypatch, tmp_path):
+    """Test that backfill runs over the range and prints a summary."""
+    from ai_commit import backfill
+
+    calls = {}
+
+    async def fake_run_backfill(rev_range, style, provider, output, **kwargs):
+        calls.update(rev_range=rev_range, output=output, **kwargs)
+        return backfill.BackfillStats(commits=6, prompt_tokens=600, seconds=3.0)
+
+    monkeypatch.setattr("ai_commit.prompt_manager.load_style", lambda s: "prompt")
+    monkeypatch.setattr("ai_commit.backfill.run_backfill", fake_run_backfill)
+    output = tmp_path / "out.jsonl"
+
+    result = runner.invoke(
+        cli.app, ["backfill", "main~6..main", "-o", str(output), "-j", "3",
+                  "--dry-run"],
+    )
+
+    assert result.exit_code == 0, result.stdout
+    assert calls["rev_range"] == "main~6..main"
+    assert calls["concurrency"] == 3
+    assert "120.0 commits/min" in result.stdout
+    assert "~200 tokens/s" in result.stdout
+
+
+def test_cli_hook_mode_writes_message_file(mock_dependencies, tmp_path):
+    """Test that --message-file fills in the hook's file instead of committing."""
+    generated_msg, mock_commit = mock_dependencies
+    message_file = tmp_path / "COMMIT_EDITMSG"
+    message_file.write_text("\n# Please enter the commit message.\n")
+
+    result = runner.invoke(
+        cli.app, ["--dry-run", "--message-file", str(message_file)], input="y\n"
+    )
+
+    assert result.exit_code == 0, result.stdout
+    assert message_file.read_text() == (
+        f"{generated_msg}\n\n# Please enter the commit message.\n"
+    )
+    mock_commit.assert_not_called()
+
+
+def test_cli_print_best_of_candidates(mock_dependencies):
+    """Test that --candidates picks and prints one of the generated messages."""
+    _, mock_commit = mock_dependencies
+
+    result = runner.invoke(
+        cli.app, ["--dry-run", "--print", "--candidates", "2"]
+    )
+
+    assert result.exit_code == 0, result.stdout
+    assert "Picking the best of 2 candidates..." in result.stdout
+    assert "Mock Response" in result.stdout
+    mock_commit.assert_not_called()
@@ -0,0 +1,100 @@
+from ai_commit import compaction
+from ai_commit.diff_parser import parse_diff
+
+
+def _file_diff(
+    path: str, added_lines: int, line: str = "+value = 1", hunks: int = 1
+) -> str:
+    body = "\n".join([line] * added_lines)
+    hunk = f"@@ -0,0 +1,{added_lines} @@\n{body}\n"
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        f"--- a/{path}\n+++ b/{path}\n" + hunk * hunks
+    )
+
+
+def test_small_diff_is_left_untouched():
+    """Verify a diff under budget passes through unchanged."""
+    diff = _file_diff("src/app.py", 3)
+
+    result = compaction.compact_diff(diff, budget=1000)
+
+    assert result.diff == diff
+    assert result.elided == []
+    assert result.tokens == result.original_tokens
+
+
+def test_lockfiles_and_binaries_are_summarized():
+    """Verify low-value files are replaced by a one-line summary."""
+    diff = (
+        _file_diff("src/app.py", 5)
+        + _file_diff("package-lock.json", 400, '+    "integrity": "sha512-abc"')
+        + "diff --git a/logo.png b/logo.png\n"
+        "Binary files a/logo.png and b/logo.png differ\n"
+    )
+
+    result = compaction.compact_diff(diff, budget=500)
+
+    assert "+value = 1" in result.diff
+    assert "sha512" not in result.diff
+    assert "package-lock.json: 400 changed lines elided (lockfile)" in result.diff
+    assert "package-lock.json (lockfile)" in result.elided
+    assert "logo.png (binary file)" in result.elided
+    assert result.tokens <= 500 < result.original_tokens
+
+
+def test_source_files_are_kept_before_docs():
+    """Verify lower-priority files are the first to be elided."""
+    diff = (
+        _file_diff("README.md", 10, hunks=6)
+        + _file_diff("src/core.py", 10, hunks=6)
+    )
+
+    result = compaction.compact_diff(diff, budget=250)
+
+    assert result.diff.index("README.md") < result.diff.index("src/core.py")
+    assert "README.md (over token budget)" in result.elided
+    assert "src/core.py" not in " ".join(result.elided)
+    assert result.tokens <= 250
+
+
+def test_oversized_hunks_are_truncated():
+    """Verify a single huge hunk is cut down to a share of the budget."""
+    diff = _file_diff("src/big.py", 2000) + _file_diff("src/small.py", 2)
+
+    result = compaction.compact_diff(diff, budget=400)
+
+    assert "src/big.py (large hunk truncated)" in result.elided
+    assert "more lines in this hunk elided" in result.diff
+    assert "src/small.py" in result.diff
+    assert result.tokens <= 400
+
+
+def test_files_without_hunks_are_kept_verbatim():
+    """Stand-ins for files that were never fetched keep their line counts."""
+    stub = (
+        "diff --git a/yarn.lock b/yarn.lock\n"
+        "# yarn.lock: 900 changed lines elided (excluded)\n"
+    )
+    diff = stub + _file_diff("src/app.py", 200)
+
+    result = compaction.compact_diff(diff, budget=100)
+
+    assert result.diff.startswith(stub)
+
+
+def test_compact_files_matches_compact_diff():
+    """Verify compacting files as they arrive gives the same diff."""
+    diff = (
+        _file_diff("README.md", 10, hunks=6)
+        + _file_diff("package-lock.json", 400, '+    "integrity": "sha512-abc"')
+        + _file_diff("src/big.py", 2000)
+        + _file_diff("src/core.py", 10, hunks=6)
+    )
+
+    streamed = compaction.compact_files(iter(parse_diff(diff)), budget=400)
+    whole = compaction.compact_diff(diff, budget=400)
+
+    assert streamed.diff == whole.diff
+    assert streamed.elided == whole.elided
+    assert streamed.tokens <= 400
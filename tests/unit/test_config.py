@@ -9,6 +9,9 @@ def clean_environment(monkeypatch):
     """Ensure a clean environment by removing test-related env vars."""
     monkeypatch.delenv("OLLAMA_URL", raising=False)
     monkeypatch.delenv("OLLAMA_MODEL", raising=False)
+    monkeypatch.delenv("OLLAMA_TIMEOUT", raising=False)
+    monkeypatch.delenv("OLLAMA_MAX_CONNECTIONS", raising=False)
+    monkeypatch.delenv("AI_COMMIT_CACHE_DIR", raising=False)
 
 
 def test_get_ollama_url_default():
@@ -39,6 +42,40 @@ def test_get_ollama_url_empty_raises_error(monkeypatch):
         config.get_ollama_url()
 
 
+def test_get_ollama_urls_splits_list(monkeypatch):
+    """
+    Test that get_ollama_urls() accepts several comma-separated URLs and
+    that get_ollama_url() returns the first.
+    """
+    monkeypatch.setenv("OLLAMA_URL", "http://a:11434/, http://b:11434 ,")
+    assert config.get_ollama_urls() == ["http://a:11434", "http://b:11434"]
+    assert config.get_ollama_url() == "http://a:11434"
+
+
+def test_get_ollama_hedge_percentile(monkeypatch):
+    """
+    Test that hedging is off by default and rejects percentiles of 100.
+    """
+    monkeypatch.delenv("OLLAMA_HEDGE_PERCENTILE", raising=False)
+    assert config.get_ollama_hedge_percentile() is None
+    monkeypatch.setenv("OLLAMA_HEDGE_PERCENTILE", "95")
+    assert config.get_ollama_hedge_percentile() == 95.0
+    monkeypatch.setenv("OLLAMA_HEDGE_PERCENTILE", "100")
+    with pytest.raises(ValueError, match="below 100"):
+        config.get_ollama_hedge_percentile()
+
+
+def test_get_ollama_max_retries_allows_zero(monkeypatch):
+    """
+    Test that retries can be disabled but not made negative.
+    """
+    monkeypatch.setenv("OLLAMA_MAX_RETRIES", "0")
+    assert config.get_ollama_max_retries() == 0
+    monkeypatch.setenv("OLLAMA_MAX_RETRIES", "-1")
+    with pytest.raises(ValueError, match="OLLAMA_MAX_RETRIES.*negative"):
+        config.get_ollama_max_retries()
+
+
 def test_get_ollama_model_default():
     """
     Test that get_ollama_model() returns the default value
@@ -65,3 +102,125 @@ def test_get_ollama_model_empty_raises_error(monkeypatch):
     monkeypatch.setenv("OLLAMA_MODEL", "")
     with pytest.raises(ValueError, match="OLLAMA_MODEL.*cannot be an empty string"):
         config.get_ollama_model()
+
+
+def test_get_ollama_timeout_default_and_override(monkeypatch):
+    """
+    Test that get_ollama_timeout() defaults to 30 seconds
+    and honours the OLLAMA_TIMEOUT environment variable.
+    """
+    assert config.get_ollama_timeout() == 30.0
+    monkeypatch.setenv("OLLAMA_TIMEOUT", "2.5")
+    assert config.get_ollama_timeout() == 2.5
+
+
+def test_get_ollama_max_connections_invalid_raises_error(monkeypatch):
+    """
+    Test that get_ollama_max_connections() rejects non-integer
+    and non-positive values.
+    """
+    monkeypatch.setenv("OLLAMA_MAX_CONNECTIONS", "many")
+    with pytest.raises(ValueError, match="OLLAMA_MAX_CONNECTIONS.*integer"):
+        config.get_ollama_max_connections()
+
+    monkeypatch.setenv("OLLAMA_MAX_CONNECTIONS", "0")
+    with pytest.raises(ValueError, match="OLLAMA_MAX_CONNECTIONS.*positive"):
+        config.get_ollama_max_connections()
+
+
+def test_get_cache_dir_follows_xdg_and_override(monkeypatch, tmp_path):
+    """
+    Test that get_cache_dir() lives under XDG_CACHE_HOME by default
+    and honours the AI_COMMIT_CACHE_DIR environment variable.
+    """
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert config.get_cache_dir() == tmp_path / "ai-commit"
+
+    monkeypatch.setenv("AI_COMMIT_CACHE_DIR", str(tmp_path / "custom"))
+    assert config.get_cache_dir() == tmp_path / "custom"
+
+
+def test_get_diff_max_bytes_and_exclude(monkeypatch):
+    """
+    Test the staged diff size cap and exclude patterns, including
+    an empty AI_COMMIT_DIFF_EXCLUDE turning exclusion off.
+    """
+    monkeypatch.delenv("AI_COMMIT_DIFF_MAX_BYTES", raising=False)
+    monkeypatch.delenv("AI_COMMIT_DIFF_EXCLUDE", raising=False)
+    assert config.get_diff_max_bytes() == 1_000_000
+    assert config.get_diff_exclude() is None
+
+    monkeypatch.setenv("AI_COMMIT_DIFF_MAX_BYTES", "5000")
+    monkeypatch.setenv("AI_COMMIT_DIFF_EXCLUDE", "third_party/*, *.lock")
+    assert config.get_diff_max_bytes() == 5000
+    assert config.get_diff_exclude() == ["third_party/*", "*.lock"]
+
+    monkeypatch.setenv("AI_COMMIT_DIFF_EXCLUDE", "")
+    assert config.get_diff_exclude() == []
+
+
+def test_get_ollama_api_default_override_and_invalid(monkeypatch):
+    """
+    Test that get_ollama_api() defaults to "generate", accepts "chat"
+    and rejects anything else.
+    """
+    monkeypatch.delenv("OLLAMA_API", raising=False)
+    assert config.get_ollama_api() == "generate"
+
+    monkeypatch.setenv("OLLAMA_API", "chat")
+    assert config.get_ollama_api() == "chat"
+
+    monkeypatch.setenv("OLLAMA_API", "completions")
+    with pytest.raises(ValueError, match="OLLAMA_API"):
+        config.get_ollama_api()
+
+
+def test_backend_and_openai_settings(monkeypatch):
+    """
+    Test the backend choice and the OpenAI-compatible server's URL, model
+    and optional API key.
+    """
+    for name in ("AI_COMMIT_BACKEND", "OPENAI_BASE_URL", "OPENAI_MODEL",
+                 "OPENAI_API_KEY", "OLLAMA_MODEL"):
+        monkeypatch.delenv(name, raising=False)
+    assert config.get_backend() == "ollama"
+    assert config.get_openai_url() == "http://localhost:8080/v1"
+    assert config.get_openai_model() == config.get_ollama_model()
+    assert config.get_openai_api_key() is None
+
+    monkeypatch.setenv("AI_COMMIT_BACKEND", "openai")
+    monkeypatch.setenv("OPENAI_MODEL", "qwen2.5-coder")
+    monkeypatch.setenv("OPENAI_API_KEY", "secret")
+    assert config.get_backend() == "openai"
+    assert config.get_openai_model() == "qwen2.5-coder"
+    assert config.get_openai_api_key() == "secret"
+
+    monkeypatch.setenv("AI_COMMIT_BACKEND", "vllm")
+    with pytest.raises(ValueError, match="AI_COMMIT_BACKEND"):
+        config.get_backend()
+
+
+def test_ollama_num_predict_and_max_context(monkeypatch):
+    """Test the generation cap and context window limit."""
+    monkeypatch.delenv("OLLAMA_NUM_PREDICT", raising=False)
+    monkeypatch.delenv("OLLAMA_MAX_NUM_CTX", raising=False)
+    assert config.get_ollama_num_predict() == 128
+    assert config.get_ollama_max_context() == 32768
+
+    monkeypatch.setenv("OLLAMA_NUM_PREDICT", "64")
+    monkeypatch.setenv("OLLAMA_MAX_NUM_CTX", "8192")
+    assert config.get_ollama_num_predict() == 64
+    assert config.get_ollama_max_context() == 8192
+
+
+def test_batch_max_size_and_wait(monkeypatch):
+    """Test the micro-batching limits' defaults and overrides."""
+    monkeypatch.delenv("AI_COMMIT_BATCH_MAX_SIZE", raising=False)
+    monkeypatch.delenv("AI_COMMIT_BATCH_MAX_WAIT", raising=False)
+    assert config.get_batch_max_size() == 8
+    assert config.get_batch_max_wait() == 0.01
+
+    monkeypatch.setenv("AI_COMMIT_BATCH_MAX_SIZE", "32")
+    monkeypatch.setenv("AI_COMMIT_BATCH_MAX_WAIT", "0.05")
+    assert config.get_batch_max_size() == 32
+    assert config.get_batch_max_wait() == 0.05
@@ -0,0 +1,224 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+import typer
+
+from ai_commit import cache, daemon, daemon_client, deadline
+from ai_commit.llm_provider import CoalescingProvider, MockProvider
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets are required"
+)
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return tmp_path / "d.sock"
+
+
+@pytest.fixture
+def style_prompt(monkeypatch):
+    """Serves every style except 'missing' from memory."""
+    def load_style(name):
+        if name == "missing":
+            raise KeyError(f"Prompt style '{name}' not found.")
+        return "style prompt"
+
+    monkeypatch.setattr("ai_commit.prompt_manager.load_style", load_style)
+
+
+async def _request(socket_path, **kwargs) -> list[dict]:
+    """Runs the blocking client in a thread so the server can answer it."""
+    def collect():
+        return list(daemon_client.stream_commit(socket_path=socket_path, **kwargs))
+
+    return await asyncio.get_running_loop().run_in_executor(None, collect)
+
+
+async def test_daemon_streams_generated_message(socket_path, style_prompt):
+    """Verify a generation request streams tokens and then a done event."""
+    server = await daemon.CommitDaemon(MockProvider()).start(socket_path)
+    async with server:
+        events = await _request(socket_path, diff="a diff", style="conventional")
+
+    tokens = "".join(e["token"] for e in events if "token" in e)
+    assert tokens.strip() == (
+        "Mock Response:\nSystem Prompt: style prompt\nUser Prompt: a diff"
+    )
+    assert events[-1] == {"done": True, "cached": False}
+
+
+async def test_daemon_serves_repeats_from_its_cache(
+    socket_path, style_prompt, tmp_path
+):
+    """Verify the daemon's warm cache answers a repeated request."""
+    store = cache.CompletionCache(directory=tmp_path, max_entries=10, max_age=60)
+    server = await daemon.CommitDaemon(MockProvider(), store).start(socket_path)
+    async with server:
+        await _request(socket_path, diff="a diff", style="conventional")
+        events = await _request(socket_path, diff="a diff", style="conventional")
+
+    assert events[-1] == {"done": True, "cached": True}
+    assert store.stats.hits == 1
+
+
+async def test_daemon_reports_errors_to_the_client(socket_path, style_prompt):
+    """Verify failures inside the daemon surface as DaemonError."""
+    server = await daemon.CommitDaemon(MockProvider()).start(socket_path)
+    async with server:
+        with pytest.raises(daemon_client.DaemonError) as exc_info:
+            await _request(socket_path, diff="a diff", style="missing")
+
+    assert exc_info.value.kind == "KeyError"
+
+
+def test_client_reports_unavailable_without_daemon(socket_path):
+    """Verify the client signals a missing daemon so callers can fall back."""
+    with pytest.raises(daemon_client.DaemonUnavailable):
+        next(daemon_client.stream_commit("diff", "conventional",
+                                         socket_path=socket_path))
+
+
+async def test_daemon_replaces_stale_socket_but_not_live_one(socket_path):
+    """Verify a dead daemon's socket is reused and a live one is respected."""
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(socket_path))
+    stale.close()
+
+    server = await daemon.CommitDaemon(MockProvider()).start(socket_path)
+    async with server:
+        with pytest.raises(daemon.DaemonAlreadyRunning):
+            await daemon.CommitDaemon(MockProvider()).start(socket_path)
+
+
+
+async def test_daemon_generates_identical_requests_once(socket_path, style_prompt):
+    """Verify clients asking for the same message at once share one stream."""
+    class CountingProvider(MockProvider):
+        streams = 0
+
+        async def stream(self, system_prompt, user_prompt, options=None):
+            CountingProvider.streams += 1
+            await asyncio.sleep(0.05)
+            async for token in super().stream(system_prompt, user_prompt):
+                yield token
+
+    provider = CoalescingProvider(CountingProvider())
+    server = await daemon.CommitDaemon(provider).start(socket_path)
+    async with server:
+        results = await asyncio.gather(*(
+            _request(socket_path, diff="a diff", style="conventional")
+            for _ in range(3)
+        ))
+
+    assert results[0] == results[1] == results[2]
+    assert CountingProvider.streams == 1
+
+async def test_client_connects_before_reading_the_diff(
+    socket_path, style_prompt, monkeypatch
+):
+    """Verify run_generate reads the staged diff only once a daemon answers."""
+    monkeypatch.setenv("AI_COMMIT_SOCKET", str(socket_path))
+    order = []
+    real_connect = daemon_client.connect
+
+    def connect(*args):
+        order.append("connect")
+        return real_connect(*args)
+
+    def read_diff():
+        order.append("diff")
+        return "a diff"
+
+    monkeypatch.setattr("ai_commit.daemon_client.connect", connect)
+    monkeypatch.setattr(
+        "ai_commit.git_integration.get_staged_diff_capped", read_diff
+    )
+
+    server = await daemon.CommitDaemon(MockProvider()).start(socket_path)
+    async with server:
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: daemon_client.run_generate("conventional",
+                                                     print_commit=True)
+        )
+
+    assert order == ["connect", "diff"]
+
+
+@pytest.fixture
+def fake_daemon(socket_path, monkeypatch):
+    """Serves one connection with canned reply lines, then stays silent."""
+    monkeypatch.setenv("AI_COMMIT_SOCKET", str(socket_path))
+    monkeypatch.setattr(
+        "ai_commit.git_integration.get_staged_diff_capped", lambda: "a diff"
+    )
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen()
+    done = threading.Event()
+
+    def serve(replies: bytes):
+        conn, _ = server.accept()
+        with conn:
+            conn.makefile("rb").readline()
+            conn.sendall(replies)
+            done.wait(5)
+
+    def start(replies: bytes = b""):
+        threading.Thread(target=serve, args=(replies,), daemon=True).start()
+
+    yield start
+    done.set()
+    server.close()
+
+
+def test_client_falls_back_when_the_daemon_is_silent(fake_daemon, monkeypatch):
+    """Verify a daemon that never answers is treated as unavailable."""
+    monkeypatch.setenv("OLLAMA_TIMEOUT", "0.2")
+    monkeypatch.setenv("OLLAMA_MAX_RETRIES", "0")
+    fake_daemon()
+
+    with pytest.raises(daemon_client.DaemonUnavailable):
+        daemon_client.run_generate("conventional", print_commit=True)
+
+
+def test_client_reports_a_broken_reply_after_output(fake_daemon, capsys):
+    """Verify a garbled reply mid-stream is an error, not a traceback."""
+    fake_daemon(b'{"token": "feat: "}\nnot json\n')
+
+    with pytest.raises(typer.Exit) as exc_info:
+        daemon_client.run_generate("conventional", print_commit=True)
+
+    assert exc_info.value.exit_code == 1
+    assert "Error: The daemon sent an invalid reply" in capsys.readouterr().out
+
+
+def test_client_labels_model_failures(fake_daemon, capsys):
+    """Verify failures reaching the model are reported as Ollama errors."""
+    fake_daemon(b'{"error": "circuit open", "kind": "CircuitOpenError"}\n')
+
+    with pytest.raises(typer.Exit):
+        daemon_client.run_generate("conventional", print_commit=True)
+
+    assert "Ollama Error: circuit open" in capsys.readouterr().out
+
+
+def test_read_timeout_covers_retries_and_candidates(monkeypatch):
+    """Verify the silence allowed grows with backoff and best-of-N waits."""
+    monkeypatch.setenv("OLLAMA_TIMEOUT", "10")
+    monkeypatch.setenv("OLLAMA_MAX_RETRIES", "2")
+    monkeypatch.setenv("OLLAMA_RETRY_BACKOFF", "1")
+    monkeypatch.setenv("AI_COMMIT_CANDIDATE_TIMEOUT", "5")
+    base = 30 + 1.5 * 3 + daemon_client.CONNECT_TIMEOUT
+
+    assert daemon_client.read_timeout({"diff": "d"}) == base
+    assert daemon_client.read_timeout({"diff": "d", "candidates": 3}) == base + 5
+    assert daemon_client.read_timeout({"timeout": 2}) == (
+        2 + daemon_client.CONNECT_TIMEOUT
+    )
+    with deadline.within(1):
+        assert daemon_client.read_timeout({"diff": "d"}) <= (
+            1 + daemon_client.CONNECT_TIMEOUT
+        )
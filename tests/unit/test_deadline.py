@@ -0,0 +1,31 @@
+import asyncio
+
+from ai_commit import deadline
+
+
+def test_no_deadline_by_default():
+    """Without a deadline there is no limit."""
+    assert deadline.remaining() is None
+    with deadline.within(None):
+        assert deadline.remaining() is None
+
+
+def test_nested_deadline_keeps_the_earlier_one():
+    """An inner block cannot extend the time its caller allowed."""
+    with deadline.within(1):
+        with deadline.within(60):
+            assert deadline.remaining() <= 1
+        with deadline.within(0.5):
+            assert deadline.remaining() <= 0.5
+    assert deadline.remaining() is None
+
+
+async def test_tasks_inherit_the_deadline():
+    """Work started in the background is bound by the same deadline."""
+    with deadline.within(5):
+        remaining = await asyncio.ensure_future(_remaining())
+    assert 0 < remaining <= 5
+
+
+async def _remaining():
+    return deadline.remaining()
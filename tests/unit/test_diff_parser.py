@@ -0,0 +1,107 @@
+from ai_commit.diff_parser import header_paths, iter_file_diffs, parse_diff
+
+SAMPLE_DIFF = """diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1,2 +1,2 @@
+-old = 1
++new = 1
+@@ -10,1 +10,2 @@
+ context
++added
+diff --git a/logo.png b/logo.png
+index 3333333..4444444 100644
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+def test_parse_diff_splits_files_and_hunks():
+    """Verify parse_diff returns one FileDiff per file with its hunks."""
+    files = parse_diff(SAMPLE_DIFF)
+
+    assert [f.path for f in files] == ["src/app.py", "logo.png"]
+    assert len(files[0].hunks) == 2
+    assert files[0].hunks[1].startswith("@@ -10,1 +10,2 @@")
+    assert not files[0].is_binary
+    assert files[1].is_binary
+    assert files[1].hunks == []
+
+
+def test_parse_diff_round_trips_text():
+    """Verify the per-file sections concatenate back into the original diff."""
+    files = parse_diff(SAMPLE_DIFF)
+
+    assert "".join(f.text for f in files) == SAMPLE_DIFF
+
+
+def test_parse_diff_empty_input():
+    """Verify an empty diff yields no files."""
+    assert parse_diff("") == []
+
+
+def test_blob_ids_come_from_the_index_line():
+    """Verify the old and new blob ids are read from each file's header."""
+    files = parse_diff(SAMPLE_DIFF + "diff --git a/x.py b/x.py\n# x.py: elided\n")
+
+    assert files[0].blob_ids == ("1111111", "2222222")
+    assert files[1].blob_ids == ("3333333", "4444444")
+    assert files[2].blob_ids is None
+
+
+def test_iter_file_diffs_yields_each_file_once_it_is_complete():
+    """Verify files are parsed lazily, before the rest of the diff is read."""
+    read = []
+
+    def lines():
+        for line in SAMPLE_DIFF.splitlines(keepends=True):
+            read.append(line)
+            yield line
+
+    files = iter_file_diffs(lines())
+    first = next(files)
+
+    assert first.path == "src/app.py"
+    assert read[-1].startswith("diff --git a/logo.png")
+    assert [f.path for f in files] == ["logo.png"]
+
+
+def test_status_comes_from_the_header():
+    """Verify additions, deletions and renames are told apart."""
+    files = parse_diff(
+        "diff --git a/new.py b/new.py\nnew file mode 100644\n"
+        "diff --git a/old.py b/old.py\ndeleted file mode 100644\n"
+        "diff --git a/a.py b/b.py\nsimilarity index 90%\n"
+        "rename from a.py\nrename to b.py\n"
+    )
+
+    assert [f.status for f in files] == ["added", "deleted", "renamed"]
+    assert parse_diff(SAMPLE_DIFF)[0].status == "modified"
+
+
+def test_quoted_paths_are_unquoted():
+    """Verify paths git C-quotes, such as non-ASCII names, are still parsed."""
+    diff = (
+        'diff --git "a/caf\\303\\251.py" "b/caf\\303\\251.py"\n'
+        "new file mode 100644\n@@ -0,0 +1 @@\n+x = 1\n"
+        'diff --git a/old name.py "b/tab\\there.py"\n'
+        "similarity index 90%\nrename from old name.py\n"
+        'rename to "tab\\there.py"\n'
+    )
+
+    files = parse_diff(diff)
+
+    assert [f.path for f in files] == ["café.py", "tab\there.py"]
+    assert files[1].old_path == "old name.py"
+    assert header_paths(diff) == ["café.py", "café.py", "old name.py", "tab\there.py"]
+
+
+def test_no_text_is_dropped():
+    """Verify text outside the usual headers still reaches the parsed files."""
+    diff = "preamble\ndiff --git x.py x.py\n@@ -1 +1 @@\n-a\n+b\n"
+
+    files = parse_diff(diff)
+
+    assert "".join(f.text for f in files) == diff
+    assert files[0].path == "x.py x.py"
+    assert parse_diff("not a diff\n")[0].text == "not a diff\n"
@@ -0,0 +1,86 @@
+from ai_commit import diff_selection
+from ai_commit.diff_selection import FileStat
+
+
+def test_parse_numstat_records_binaries_and_renames():
+    """Verify binary files and the old path of renames are recognised."""
+    output = "3\t1\tapp.py\0-\t-\tlogo.png\0" "0\t0\t\0old.py\0new.py\0"
+
+    stats = diff_selection.parse_numstat(output)
+
+    assert [s.path for s in stats] == ["app.py", "logo.png", "new.py"]
+    assert stats[0].changed == 4
+    assert stats[1].is_binary
+    assert stats[2].paths == ["old.py", "new.py"]
+
+
+def test_select_files_admits_smallest_files_under_the_cap():
+    """Verify files are admitted smallest first and the rest are skipped."""
+    stats = [
+        FileStat("big.py", 80, 0),
+        FileStat("small.py", 5, 0),
+        FileStat("medium.py", 30, 0),
+        FileStat("yarn.lock", 1, 0),
+    ]
+
+    selection = diff_selection.select_files(stats, max_bytes=4000, exclude=None)
+
+    assert [s.path for s in selection.fetch] == ["small.py", "medium.py"]
+    assert [(s.path, reason) for s, reason in selection.skipped] == [
+        ("big.py", "over size cap"), ("yarn.lock", "excluded"),
+    ]
+
+
+def test_pathspecs_use_the_shorter_of_includes_and_excludes():
+    """Verify a few fetched files are named, and a few skipped ones excluded."""
+    stats = [FileStat(f"src/{i}.py", 1, 0) for i in range(5)]
+    stats.append(FileStat("vendor.bin", None, None))
+
+    few_skipped = diff_selection.select_files(stats, max_bytes=10_000, exclude=[])
+    few_fetched = diff_selection.select_files(
+        stats, max_bytes=10_000, exclude=["src/[1-4].py"]
+    )
+
+    assert few_skipped.pathspecs() == [":/", ":(top,exclude,literal)vendor.bin"]
+    assert few_fetched.pathspecs() == [":(top,literal)src/0.py"]
+    assert diff_selection.select_files(stats[:5], 10_000, []).pathspecs() == []
+
+
+def test_trim_diff_replaces_binary_and_excluded_files():
+    """Verify a whole diff keeps its files and stubs out the others."""
+    diff = (
+        "diff --git a/app.py b/app.py\n"
+        "@@ -1 +1 @@\n-old\n+new\n"
+        "diff --git a/old.lock b/yarn.lock\n"
+        "similarity index 50%\nrename from old.lock\nrename to yarn.lock\n"
+        "@@ -1 +1,2 @@\n-a\n+b\n+c\n"
+        "diff --git a/logo.png b/logo.png\n"
+        "Binary files a/logo.png and b/logo.png differ\n"
+    )
+
+    trimmed = diff_selection.trim_diff(diff, exclude=["*.lock"])
+
+    assert trimmed == (
+        "diff --git a/app.py b/app.py\n"
+        "@@ -1 +1 @@\n-old\n+new\n"
+        "diff --git a/old.lock b/yarn.lock\n"
+        "# yarn.lock: 3 changed lines elided (excluded)\n"
+        "diff --git a/logo.png b/logo.png\n"
+        "# logo.png: binary file elided\n"
+    )
+    assert diff_selection.trim_diff(diff[:diff.index("diff --git a/old")], []) == (
+        diff[:diff.index("diff --git a/old")]
+    )
+
+
+def test_trim_diff_excludes_quoted_paths():
+    """Verify files with C-quoted paths are matched against the excludes."""
+    diff = (
+        'diff --git "a/caf\\303\\251.lock" "b/caf\\303\\251.lock"\n'
+        "@@ -1 +1 @@\n-a\n+b\n"
+    )
+
+    assert diff_selection.trim_diff(diff, exclude=["*.lock"]) == (
+        "diff --git a/café.lock b/café.lock\n"
+        "# café.lock: 2 changed lines elided (excluded)\n"
+    )
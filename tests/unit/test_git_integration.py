@@ -89,3 +89,33 @@ def test_commit_calls_subprocess_correctly(monkeypatch):
         text=True,
         encoding="utf-8"
     )
+
+
+def test_get_staged_diff_capped_truncates_at_the_cap(tmp_path, monkeypatch):
+    """
+    Verify the capped diff stops at the byte cap and notes the truncation.
+    """
+    monkeypatch.chdir(tmp_path)
+    subprocess.run(["git", "init"], check=True, capture_output=True)
+    # Few but long lines: numstat's size estimate fits, the real diff doesn't.
+    (tmp_path / "a.py").write_text(f"{'x' * 1000}\n" * 10)
+    subprocess.run(["git", "add", "a.py"], check=True)
+
+    diff = git_integration.get_staged_diff_capped(max_bytes=1_000_000)
+    capped = git_integration.get_staged_diff_capped(max_bytes=2000)
+
+    assert diff.count("+x") == 10
+    assert len(capped) < 2100
+    assert capped.endswith("# ... diff output truncated at 2000 bytes\n")
+
+
+def test_write_message_file_keeps_gits_template(tmp_path):
+    """Verify the message goes above the comments git wrote to the file."""
+    message_file = tmp_path / "COMMIT_EDITMSG"
+    message_file.write_text("\n# Lines starting with '#' will be ignored.\n")
+
+    git_integration.write_message_file(message_file, "feat: add hook mode\n")
+
+    assert message_file.read_text() == (
+        "feat: add hook mode\n\n# Lines starting with '#' will be ignored.\n"
+    )
@@ -78,3 +78,8 @@ def test_get_local_hook_path_not_in_repo(tmp_path: Path):
             hook_manager._get_local_hooks_path()
     finally:
         os.chdir(original_cwd)
+
+
+def test_hook_passes_the_message_file():
+    """Verify the hook hands git's message file over instead of committing."""
+    assert 'ai-commit --live --message-file "$1"' in hook_manager.HOOK_SCRIPT_CONTENT
@@ -1,12 +1,25 @@
+import asyncio
+import json
+import time
+
 import httpx
 import pytest
 import respx
 
+from ai_commit import deadline, timings
+from ai_commit.breaker import CircuitBreaker
 from ai_commit.llm_provider import (
+    BoundedProvider,
+    CircuitOpenError,
+    CoalescingProvider,
+    DeadlineExceeded,
     LLMProvider,
     MockProvider,
     OllamaConnectionError,
+    OllamaPoolProvider,
     OllamaProvider,
+    OpenAIProvider,
+    create_provider,
 )
 
 TEST_OLLAMA_URL = "http://testhost:12345"
@@ -14,10 +27,13 @@ TEST_MODEL = "test-llama"
 
 
 @pytest.fixture
-def mock_config(monkeypatch):
+def mock_config(monkeypatch, tmp_path):
     """Mocks the config functions to return predictable values."""
     monkeypatch.setattr("ai_commit.config.get_ollama_url", lambda: TEST_OLLAMA_URL)
     monkeypatch.setattr("ai_commit.config.get_ollama_model", lambda: TEST_MODEL)
+    monkeypatch.setattr("ai_commit.config.get_ollama_retry_backoff", lambda: 0.001)
+    # Circuit breaker state must not leak between tests.
+    monkeypatch.setattr("ai_commit.config.get_cache_dir", lambda: tmp_path)
 
 
 @respx.mock
@@ -67,6 +83,135 @@ async def test_ollama_provider_raises_on_http_error(mock_config):
         await provider.complete("system", "user")
 
 
+@respx.mock
+@pytest.mark.asyncio
+async def test_ollama_provider_stream_yields_tokens(mock_config):
+    """Verify OllamaProvider.stream yields each fragment of a streamed reply."""
+    lines = [
+        '{"response": "feat: ", "done": false}',
+        '{"response": "add streaming", "done": false}',
+        '{"response": "", "done": true}',
+    ]
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, text="\n".join(lines))
+    )
+
+    provider = OllamaProvider()
+
+    tokens = [token async for token in provider.stream("system", "user")]
+
+    assert tokens == ["feat: ", "add streaming"]
+    assert b'"stream":true' in route.calls.last.request.content.replace(b" ", b"")
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ollama_provider_sends_style_as_system_prompt(mock_config):
+    """Verify the style and the diff travel separately, style first."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, json={"response": "ok"})
+    )
+
+    await OllamaProvider(api="generate").complete("the style", "the diff")
+
+    payload = json.loads(route.calls.last.request.content)
+    assert payload["system"] == "the style"
+    assert payload["prompt"] == "the diff"
+    assert payload["keep_alive"]
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ollama_provider_chat_api(mock_config):
+    """Verify chat mode sends messages and reads replies from /api/chat."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/chat").mock(side_effect=[
+        httpx.Response(200, json={"message": {"content": "feat: chat"}}),
+        httpx.Response(200, text="\n".join([
+            '{"message": {"content": "feat: "}, "done": false}',
+            '{"message": {"content": "stream"}, "done": false}',
+            '{"message": {"content": ""}, "done": true}',
+        ])),
+    ])
+
+    async with OllamaProvider(api="chat") as provider:
+        result = await provider.complete("the style", "the diff")
+        tokens = [token async for token in provider.stream("the style", "the diff")]
+
+    assert result == "feat: chat"
+    assert tokens == ["feat: ", "stream"]
+    assert json.loads(route.calls[0].request.content)["messages"] == [
+        {"role": "system", "content": "the style"},
+        {"role": "user", "content": "the diff"},
+    ]
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ollama_provider_stream_raises_on_http_error(mock_config):
+    """Verify OllamaProvider.stream raises OllamaConnectionError on 500 status."""
+    respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(500, text="Internal Server Error")
+    )
+
+    provider = OllamaProvider()
+
+    with pytest.raises(OllamaConnectionError,
+                       match="Ollama API returned an error: 500"):
+        async for _ in provider.stream("system", "user"):
+            pass
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ollama_provider_reuses_one_client(mock_config):
+    """Verify consecutive completions share the provider's pooled client."""
+    respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, json={"response": "ok"})
+    )
+
+    async with OllamaProvider() as provider:
+        await provider.complete("system", "user")
+        client = provider._client
+        await provider.complete("system", "user")
+
+        assert provider._client is client
+        assert not client.is_closed
+
+    assert client.is_closed
+    assert provider._client is None
+
+
+def test_ollama_provider_pool_settings_from_arguments(mock_config):
+    """Verify explicit pool limits and timeouts override the config defaults."""
+    provider = OllamaProvider(
+        timeout=5.0, max_connections=3, max_keepalive_connections=2
+    )
+
+    assert provider._timeout.read == 5.0
+    assert provider._limits.max_connections == 3
+    assert provider._limits.max_keepalive_connections == 2
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_ollama_provider_warm_up_loads_model(mock_config):
+    """Verify warm_up sends a prompt-less request with keep_alive and num_ctx."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, json={"response": "", "done": True})
+    )
+
+    async with OllamaProvider(keep_alive="1h") as provider:
+        await provider.warm_up()
+        await provider.complete("system", "user")
+
+    warm_up_body = json.loads(route.calls[0].request.content)
+    assert warm_up_body == {
+        "model": TEST_MODEL, "keep_alive": "1h", "options": {"num_ctx": 4096},
+    }
+    request = json.loads(route.calls[1].request.content)
+    assert request["keep_alive"] == "1h"
+    # A small prompt is loaded into the same context window.
+    assert request["options"]["num_ctx"] == 4096
 
 
 def test_mock_provider_conforms_to_protocol():
@@ -105,3 +250,546 @@ async def test_mock_provider_with_empty_prompts():
     assert "Mock Response" in result
     assert "System Prompt: " in result
     assert "User Prompt: " in result
+
+
+async def test_mock_provider_stream_matches_complete():
+    """
+    Ensure the streamed MockProvider output joins back into the full response.
+    """
+    provider = MockProvider()
+
+    tokens = [token async for token in provider.stream("system", "user")]
+
+    assert len(tokens) > 1
+    assert "".join(tokens) == await provider.complete("system", "user")
+
+
+@respx.mock
+async def test_ollama_provider_merges_request_options(mock_config):
+    """Verify per-request options override the defaults for that request only."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, json={"response": "feat: x"})
+    )
+    provider = OllamaProvider()
+
+    await provider.complete("system", "user", options={"temperature": 0.9})
+    await provider.complete("system", "user")
+
+    first, second = (json.loads(call.request.content) for call in route.calls)
+    assert first["options"]["temperature"] == 0.9
+    assert first["options"]["top_p"] == 0.9
+    assert second["options"]["temperature"] == 0.25
+
+
+POOL_URLS = ["http://gpu-a:11434", "http://gpu-b:11434"]
+
+
+def _stub(route_url: str, response: str, delay: float = 0.0, calls=None):
+    """A stub Ollama endpoint answering after `delay` seconds."""
+    async def handler(request):
+        if calls is not None:
+            calls.append(route_url)
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"response": response})
+
+    return respx.post(f"{route_url}/api/generate").mock(side_effect=handler)
+
+
+@respx.mock
+async def test_pool_fails_over_on_connection_error(mock_config):
+    """Verify an unreachable endpoint is skipped, now and for later requests."""
+    down = respx.post(f"{POOL_URLS[0]}/api/generate").mock(
+        side_effect=httpx.ConnectError("refused")
+    )
+    _stub(POOL_URLS[1], "feat: from b")
+    provider = OllamaPoolProvider(POOL_URLS, hedge_percentile=0)
+
+    assert await provider.complete("system", "user") == "feat: from b"
+    assert await provider.complete("system", "user") == "feat: from b"
+    assert down.call_count == 1
+
+
+@respx.mock
+async def test_pool_does_not_fail_over_on_client_error(mock_config):
+    """Verify a request the server rejects is not retried elsewhere."""
+    respx.post(f"{POOL_URLS[0]}/api/generate").mock(
+        return_value=httpx.Response(404, text="model not found")
+    )
+    other = _stub(POOL_URLS[1], "feat: from b")
+    provider = OllamaPoolProvider(POOL_URLS, hedge_percentile=0)
+
+    with pytest.raises(OllamaConnectionError, match="404"):
+        await provider.complete("system", "user")
+    assert other.call_count == 0
+
+
+@respx.mock
+async def test_pool_spreads_concurrent_requests(mock_config):
+    """Verify concurrent requests go to the endpoint with less in flight."""
+    calls = []
+    for url in POOL_URLS:
+        _stub(url, "feat: x", delay=0.05, calls=calls)
+    provider = OllamaPoolProvider(POOL_URLS, hedge_percentile=0)
+
+    await asyncio.gather(*(provider.complete("system", "user") for _ in range(4)))
+
+    assert sorted(calls) == sorted(POOL_URLS * 2)
+
+
+@respx.mock
+async def test_pool_hedges_slow_request_and_cancels_loser(mock_config):
+    """Verify a slow request is duplicated to another endpoint after the
+    latency percentile passes, and the faster answer wins."""
+    _stub(POOL_URLS[0], "feat: slow", delay=5)
+    fast = _stub(POOL_URLS[1], "feat: fast", delay=0.01)
+    provider = OllamaPoolProvider(POOL_URLS, hedge_percentile=90)
+    provider._latencies.extend([0.02] * 10)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    result = await provider.complete("system", "user")
+
+    assert result == "feat: fast"
+    assert fast.call_count == 1
+    assert loop.time() - started < 1
+    assert all(endpoint.outstanding == 0 for endpoint in provider._endpoints)
+
+
+@respx.mock
+async def test_pool_stream_fails_over_before_first_token(mock_config):
+    """Verify a stream moves to another endpoint if its first one is down."""
+    respx.post(f"{POOL_URLS[0]}/api/generate").mock(
+        side_effect=httpx.ConnectError("refused")
+    )
+    body = (
+        json.dumps({"response": "feat: ", "done": False}) + "\n"
+        + json.dumps({"response": "streamed", "done": True}) + "\n"
+    )
+    respx.post(f"{POOL_URLS[1]}/api/generate").mock(
+        return_value=httpx.Response(200, text=body)
+    )
+    provider = OllamaPoolProvider(POOL_URLS)
+
+    tokens = [token async for token in provider.stream("system", "user")]
+
+    assert "".join(tokens) == "feat: streamed"
+
+
+def test_create_provider_pools_several_urls(monkeypatch):
+    """Verify a comma-separated OLLAMA_URL yields a pooled provider."""
+    monkeypatch.setenv("OLLAMA_URL", ",".join(POOL_URLS))
+    assert isinstance(create_provider(), OllamaPoolProvider)
+    assert create_provider().urls == POOL_URLS
+
+    monkeypatch.setenv("OLLAMA_URL", POOL_URLS[0])
+    assert isinstance(create_provider(), OllamaProvider)
+
+
+@respx.mock
+async def test_ollama_provider_retries_while_model_loads(mock_config):
+    """Verify a 503 is retried and the later answer returned."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(side_effect=[
+        httpx.Response(503, text="loading model"),
+        httpx.ConnectError("refused"),
+        httpx.Response(200, json={"response": "feat: loaded"}),
+    ])
+
+    result = await OllamaProvider(max_retries=2).complete("system", "user")
+
+    assert result == "feat: loaded"
+    assert route.call_count == 3
+
+
+@respx.mock
+async def test_ollama_provider_does_not_retry_client_errors(mock_config):
+    """Verify a rejected request fails at once."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(404, text="model not found")
+    )
+
+    with pytest.raises(OllamaConnectionError, match="404"):
+        await OllamaProvider(max_retries=3).complete("system", "user")
+    assert route.call_count == 1
+
+
+@respx.mock
+async def test_ollama_provider_stops_at_deadline(mock_config):
+    """Verify a slow request is cut off at the caller's deadline."""
+    async def slow(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json={"response": "too late"})
+
+    respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(side_effect=slow)
+    provider = OllamaProvider(timeout=30)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    with deadline.within(0.05):
+        with pytest.raises(DeadlineExceeded):
+            await provider.complete("system", "user")
+    assert loop.time() - started < 1
+
+
+@respx.mock
+async def test_ollama_provider_fails_fast_while_circuit_open(mock_config):
+    """Verify a host that keeps failing is not contacted during the cool-down."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        side_effect=httpx.ConnectError("refused")
+    )
+    provider = OllamaProvider(
+        max_retries=0,
+        circuit_breaker=CircuitBreaker(TEST_OLLAMA_URL, threshold=2),
+    )
+
+    for _ in range(2):
+        with pytest.raises(OllamaConnectionError, match="Connection to Ollama"):
+            await provider.complete("system", "user")
+    with pytest.raises(CircuitOpenError):
+        await provider.complete("system", "user")
+    assert route.call_count == 2
+
+
+@respx.mock
+async def test_ollama_provider_records_ollama_metrics(mock_config):
+    """Verify Ollama's timing fields are kept on the request's span."""
+    respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, json={
+            "response": "feat: x", "load_duration": 5, "eval_count": 3,
+            "eval_duration": 7,
+        })
+    )
+
+    with timings.recording() as recorder:
+        await OllamaProvider().complete("system", "user")
+
+    (span,) = recorder.spans
+    assert span.name == "ollama.complete"
+    assert span.attrs == {
+        "attempts": 1, "load_duration": 5, "eval_count": 3, "eval_duration": 7,
+    }
+
+
+async def test_bounded_provider_holds_a_slot_while_streaming():
+    """Verify a stream keeps its slot until it is exhausted."""
+    provider = BoundedProvider(MockProvider(), max_concurrency=1)
+
+    stream = provider.stream("system", "user")
+    first = await stream.__anext__()
+    waiting = asyncio.ensure_future(provider.complete("system", "other"))
+    await asyncio.sleep(0.01)
+
+    assert first == "Mock "
+    assert not waiting.done()
+    rest = [token async for token in stream]
+    assert "User Prompt: other" in await waiting
+    assert "".join([first] + rest).endswith("user")
+    assert provider.model == "mock"
+
+
+TEST_OPENAI_URL = "http://testhost:8080/v1"
+
+
+@respx.mock
+async def test_openai_provider_complete_and_stream(mock_config):
+    """Verify chat completions are requested and server-sent events read."""
+    route = respx.post(f"{TEST_OPENAI_URL}/chat/completions").mock(side_effect=[
+        httpx.Response(200, json={
+            "choices": [{"message": {"role": "assistant", "content": "feat: x"}}],
+            "usage": {"prompt_tokens": 12, "completion_tokens": 3},
+        }),
+        httpx.Response(200, text="\n\n".join([
+            'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+            'data: {"choices": [{"delta": {"content": "feat: "}}]}',
+            'data: {"choices": [{"delta": {"content": "stream"}}]}',
+            'data: {"choices": [], "usage": '
+            '{"prompt_tokens": 14, "completion_tokens": 2}}',
+            "data: [DONE]",
+        ])),
+    ])
+
+    async with OpenAIProvider(url=TEST_OPENAI_URL, api_key="secret") as provider:
+        with timings.recording() as recorder:
+            result = await provider.complete("the style", "the diff")
+        with timings.recording() as stream_recorder:
+            tokens = [
+                token async for token in provider.stream("the style", "the diff")
+            ]
+
+    assert result == "feat: x"
+    assert tokens == ["feat: ", "stream"]
+    assert recorder.ollama_metrics()["prompt_eval_count"] == 12
+    # The usage chunk comes before [DONE], which carries no counts.
+    assert stream_recorder.ollama_metrics()["prompt_eval_count"] == 14
+    assert stream_recorder.ollama_metrics()["eval_count"] == 2
+    request = route.calls[0].request
+    assert request.headers["Authorization"] == "Bearer secret"
+    body = json.loads(request.content)
+    assert body["model"] == TEST_MODEL
+    assert body["messages"][0] == {"role": "system", "content": "the style"}
+    assert body["temperature"] == 0.25 and "options" not in body
+    assert body["max_tokens"] == 128
+    assert "num_predict" not in body and "num_ctx" not in body
+    assert json.loads(route.calls[1].request.content)["stream"] is True
+
+
+@respx.mock
+async def test_openai_provider_retries_server_errors(mock_config):
+    """Verify the OpenAI backend shares the retry and error handling."""
+    respx.post(f"{TEST_OPENAI_URL}/chat/completions").mock(side_effect=[
+        httpx.Response(503, text="busy"),
+        httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}),
+    ])
+    respx.get(f"{TEST_OPENAI_URL}/models").mock(
+        return_value=httpx.Response(401, text="no key")
+    )
+
+    async with OpenAIProvider(url=TEST_OPENAI_URL) as provider:
+        assert await provider.complete("system", "user") == "ok"
+        with pytest.raises(OllamaConnectionError, match="401"):
+            await provider.warm_up()
+
+
+def test_create_provider_selects_the_openai_backend(monkeypatch):
+    """Verify AI_COMMIT_BACKEND=openai yields the OpenAI-compatible provider."""
+    monkeypatch.setenv("AI_COMMIT_BACKEND", "openai")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://gpu-box:8000/v1/")
+    provider = create_provider()
+
+    assert isinstance(provider, OpenAIProvider)
+    assert provider.url == "http://gpu-box:8000/v1"
+
+
+class SlowProvider:
+    """Counts the requests it receives and answers after a short delay."""
+    model = "slow"
+
+    def __init__(self):
+        self.requests = []
+
+    async def complete(self, system_prompt, user_prompt, options=None):
+        self.requests.append(user_prompt)
+        await asyncio.sleep(0.01)
+        return f"answer to {user_prompt}"
+
+    async def stream(self, system_prompt, user_prompt, options=None):
+        self.requests.append(user_prompt)
+        for word in ("answer ", "to ", user_prompt):
+            await asyncio.sleep(0.01)
+            yield word
+
+
+async def test_coalescing_provider_shares_identical_requests():
+    """Verify identical requests in flight are sent once and answered alike."""
+    inner = SlowProvider()
+    provider = CoalescingProvider(inner)
+
+    results = await asyncio.gather(
+        provider.complete("s", "a"),
+        provider.complete("s", "a"),
+        provider.complete("s", "a", {"temperature": 0.9}),
+        provider.complete("s", "b"),
+    )
+    again = await provider.complete("s", "a")
+
+    assert results == ["answer to a"] * 3 + ["answer to b"]
+    assert again == "answer to a"
+    assert inner.requests == ["a", "a", "b", "a"]
+    assert provider.coalesced == 1
+
+
+async def test_coalescing_provider_survives_a_cancelled_caller():
+    """Verify cancelling one caller leaves the shared request running."""
+    provider = CoalescingProvider(SlowProvider())
+
+    first = asyncio.ensure_future(provider.complete("s", "a"))
+    second = asyncio.ensure_future(provider.complete("s", "a"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "answer to a"
+    assert first.cancelled()
+
+
+async def test_coalescing_provider_shares_identical_streams():
+    """Verify identical streams in flight are generated once, whole for all."""
+    inner = SlowProvider()
+    provider = CoalescingProvider(inner)
+
+    async def read(user_prompt, delay=0.0):
+        await asyncio.sleep(delay)
+        return "".join(
+            [token async for token in provider.stream("s", user_prompt)]
+        )
+
+    # The late caller joins after the first tokens and still gets them all.
+    results = await asyncio.gather(read("a"), read("a", delay=0.015), read("b"))
+    again = await read("a")
+
+    assert results == ["answer to a", "answer to a", "answer to b"]
+    assert again == "answer to a"
+    assert inner.requests == ["a", "b", "a"]
+    assert provider.coalesced == 1
+
+
+async def test_coalescing_provider_stream_errors_reach_every_caller():
+    """Verify a failing shared stream fails each caller following it."""
+    class FailingProvider:
+        async def stream(self, system_prompt, user_prompt, options=None):
+            yield "partial"
+            await asyncio.sleep(0.01)
+            raise OllamaConnectionError("model went away")
+
+    provider = CoalescingProvider(FailingProvider())
+
+    async def read():
+        return [token async for token in provider.stream("s", "a")]
+
+    results = await asyncio.gather(read(), read(), return_exceptions=True)
+
+    assert all(isinstance(r, OllamaConnectionError) for r in results)
+
+
+async def test_coalescing_provider_stops_a_stream_nobody_reads():
+    """Verify the shared stream is stopped once its last caller leaves."""
+    inner = SlowProvider()
+    provider = CoalescingProvider(inner)
+
+    tokens = provider.stream("s", "a")
+    assert await tokens.__anext__() == "answer "
+    await tokens.aclose()
+    fresh = "".join([token async for token in provider.stream("s", "a")])
+
+    assert fresh == "answer to a"
+    assert inner.requests == ["a", "a"]
+
+
+class BatchingProvider(SlowProvider):
+    """A SlowProvider that also takes batches, recording each one."""
+
+    def __init__(self, answers=None):
+        super().__init__()
+        self.batches = []
+        self.answers = answers
+
+    async def complete_batch(self, prompts, options=None):
+        self.batches.append([user_prompt for _, user_prompt in prompts])
+        await asyncio.sleep(0.01)
+        if self.answers is not None:
+            return self.answers
+        return [f"answer to {user_prompt}" for _, user_prompt in prompts]
+
+
+async def test_coalescing_provider_batches_within_the_window():
+    """Verify distinct requests are grouped by options, up to the batch size."""
+    inner = BatchingProvider()
+    provider = CoalescingProvider(inner, max_batch_size=3, max_wait=0.05)
+
+    results = await asyncio.gather(
+        *(provider.complete("s", str(number)) for number in range(5)),
+        provider.complete("s", "hot", {"temperature": 0.9}),
+    )
+
+    assert results == [f"answer to {n}" for n in range(5)] + ["answer to hot"]
+    assert inner.batches == [["0", "1", "2"], ["3", "4"]]
+    # Alone in its group, the last request was sent as it was.
+    assert inner.requests == ["hot"]
+    assert provider.batches == 2
+
+
+async def test_coalescing_provider_fails_a_short_batch_for_everyone():
+    """Verify a batch answered with too few completions fails each caller."""
+    provider = CoalescingProvider(
+        BatchingProvider(answers=["only one"]), max_wait=0.01
+    )
+
+    results = await asyncio.gather(
+        provider.complete("s", "a"), provider.complete("s", "b"),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, OllamaConnectionError) for r in results)
+
+
+async def test_bounded_provider_passes_batches_through_in_one_slot():
+    """Verify batching survives a BoundedProvider in between."""
+    inner = BatchingProvider()
+    provider = CoalescingProvider(BoundedProvider(inner, 1), max_wait=0.01)
+
+    results = await asyncio.gather(provider.complete("s", "a"),
+                                   provider.complete("s", "b"))
+
+    assert results == ["answer to a", "answer to b"]
+    assert inner.batches == [["a", "b"]]
+    assert not hasattr(BoundedProvider(SlowProvider()), "complete_batch")
+
+
+@respx.mock
+async def test_openai_provider_sends_batches_as_prompt_lists(mock_config):
+    """Verify a batch is one /v1/completions request, answered in order."""
+    route = respx.post(f"{TEST_OPENAI_URL}/completions").mock(
+        return_value=httpx.Response(200, json={
+            "choices": [{"index": 1, "text": " fix: b"},
+                        {"index": 0, "text": "feat: a\n"}],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 6},
+        })
+    )
+
+    async with OpenAIProvider(url=TEST_OPENAI_URL) as provider:
+        results = await provider.complete_batch(
+            [("style", "diff a"), ("style", "diff b")], {"num_predict": 32}
+        )
+
+    assert results == ["feat: a", "fix: b"]
+    body = json.loads(route.calls[0].request.content)
+    assert body["prompt"] == ["style\n\ndiff a\n", "style\n\ndiff b\n"]
+    assert body["max_tokens"] == 32 and body["model"] == TEST_MODEL
+
+
+@respx.mock
+async def test_ollama_provider_sizes_context_and_caps_generation(mock_config):
+    """Verify num_ctx follows the prompt size and num_predict is always set."""
+    route = respx.post(f"{TEST_OLLAMA_URL}/api/generate").mock(
+        return_value=httpx.Response(200, json={"response": "feat: x"})
+    )
+
+    async with OllamaProvider() as provider:
+        await provider.complete("system", "user", {"num_predict": 48})
+        await provider.complete("system", "x" * 40_000)
+        await provider.complete("system", "x" * 1_000_000)
+        await provider.complete("system", "user", {"num_ctx": 1024})
+
+    options = [json.loads(call.request.content)["options"] for call in route.calls]
+    assert options[0]["num_predict"] == 48 and "max_tokens" not in options[0]
+    assert options[1]["num_predict"] == 128
+    assert [o["num_ctx"] for o in options] == [4096, 16384, 32768, 1024]
+
+
+async def test_provider_opens_its_client_off_the_event_loop(mock_config, monkeypatch):
+    """Verify the slow client setup runs once, in a thread, while the loop runs."""
+    provider = OllamaProvider()
+    builds = []
+    build = provider._new_client
+
+    def slow_build():
+        builds.append(1)
+        time.sleep(0.1)
+        return build()
+
+    monkeypatch.setattr(provider, "_new_client", slow_build)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.ensure_future(tick())
+    async with provider:
+        await asyncio.gather(provider.open(), provider.open())
+        client = provider._get_client()
+    ticker.cancel()
+
+    assert builds == [1]
+    assert ticks >= 5
+    assert client.is_closed
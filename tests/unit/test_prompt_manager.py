@@ -66,3 +66,13 @@ def test_list_styles_returns_empty_list_if_dir_missing(tmp_path, monkeypatch):
     prompt_manager.list_styles.cache_clear()
 
     assert prompt_manager.list_styles() == []
+
+
+def test_style_options_cap_length_and_stop_after_the_message():
+    """Verify every style gets a length cap and stop sequence, some larger."""
+    conventional = prompt_manager.style_options("conventional")
+    ghanaian = prompt_manager.style_options("ghanaian")
+
+    assert conventional == {"num_predict": 48, "stop": ["\n\n"]}
+    assert ghanaian["num_predict"] > conventional["num_predict"]
+    assert prompt_manager.style_options("custom") == conventional
@@ -0,0 +1,38 @@
+from ai_commit.scoring import score_message
+
+PATHS = ["src/ai_commit/parser.py"]
+
+
+def test_conventional_format_scores_higher():
+    """A well-formed conventional subject beats free-form prose."""
+    good = score_message("fix: handle empty input", "conventional", PATHS)
+    bad = score_message("Handled empty input.", "conventional", PATHS)
+
+    assert good > bad
+
+
+def test_format_is_not_required_for_other_styles():
+    """Other styles are only judged on length and relevance."""
+    assert score_message("Arr, fixed the parser", "pirate", PATHS) == score_message(
+        "fix: the parser", "pirate", PATHS
+    )
+
+
+def test_long_subject_is_penalised():
+    """Subjects past the length limit lose points."""
+    short = score_message("feat: add parser cache", "conventional", [])
+    long = score_message("feat: " + "x" * 120, "conventional", [])
+
+    assert short > long
+
+
+def test_mentioning_a_changed_path_scores_higher():
+    """Naming a changed file, even by stem, earns a point."""
+    assert score_message("fix: parser crash", "conventional", PATHS) == (
+        score_message("fix: crash on start", "conventional", PATHS) + 1
+    )
+
+
+def test_empty_message_scores_lowest():
+    """An empty completion never wins."""
+    assert score_message("  \n", "conventional", PATHS) == float("-inf")
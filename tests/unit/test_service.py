@@ -1,21 +1,35 @@
+import asyncio
+
 import pytest
 
-from ai_commit import service
+from ai_commit import cache, prompt_manager, service
+from ai_commit.diff_parser import parse_diff
 from ai_commit.llm_provider import LLMProvider
 
 
 # The fake provider must conform to the async protocol
 class FakeLLMProvider(LLMProvider):
     def __init__(self, response: str):
+        self.calls = 0
         self.system_prompt_received = None
         self.user_prompt_received = None
         self.response = response
 
-    async def complete(self, system_prompt: str, user_prompt: str) -> str:
+    async def complete(
+        self, system_prompt: str, user_prompt: str, options=None
+    ) -> str:
+        self.calls += 1
         self.system_prompt_received = system_prompt
         self.user_prompt_received = user_prompt
+        self.options_received = options
         return self.response
 
+    async def stream(self, system_prompt: str, user_prompt: str, options=None):
+        self.system_prompt_received = system_prompt
+        self.user_prompt_received = user_prompt
+        for token in self.response.split(" "):
+            yield token + " "
+
 
 @pytest.mark.asyncio
 async def test_generate_commit_orchestrates_correctly(monkeypatch):
@@ -42,4 +56,277 @@ async def test_generate_commit_orchestrates_correctly(monkeypatch):
 
     assert fake_provider.system_prompt_received == expected_system_prompt
     assert fake_provider.user_prompt_received == test_diff
+    assert fake_provider.options_received == prompt_manager.style_options(test_style)
     assert result == "fix(service): implement core logic"
+
+
+@pytest.mark.asyncio
+async def test_stream_commit_yields_message_fragments(monkeypatch):
+    """
+    Verify stream_commit streams the provider output without leading whitespace.
+    """
+    monkeypatch.setattr(
+        "ai_commit.prompt_manager.load_style", lambda style: "system prompt"
+    )
+    fake_provider = FakeLLMProvider(response="  feat: stream the message")
+
+    tokens = [
+        token async for token in service.stream_commit(
+            diff="a diff", style="conventional", provider=fake_provider
+        )
+    ]
+
+    assert fake_provider.system_prompt_received == "system prompt"
+    assert fake_provider.user_prompt_received == "a diff"
+    assert tokens[0] == "feat: "
+    assert "".join(tokens).strip() == "feat: stream the message"
+
+
+@pytest.mark.asyncio
+async def test_generate_commit_uses_cache(monkeypatch, tmp_path):
+    """
+    Verify a repeated request is answered from the cache without the provider.
+    """
+    monkeypatch.setattr(
+        "ai_commit.prompt_manager.load_style", lambda style: "system prompt"
+    )
+    fake_provider = FakeLLMProvider(response="fix: cached message")
+    store = cache.CompletionCache(directory=tmp_path, max_entries=10, max_age=60)
+
+    first = await service.generate_commit(
+        diff="a diff", style="conventional", provider=fake_provider, cache=store
+    )
+    second = await service.generate_commit(
+        diff="a diff", style="conventional", provider=fake_provider, cache=store
+    )
+
+    assert first == second == "fix: cached message"
+    assert fake_provider.calls == 1
+    assert store.stats == cache.CacheStats(hits=1, misses=1)
+
+
+def _file_diff(path: str, lines: int) -> str:
+    body = "".join("+line\n" for _ in range(lines))
+    return f"diff --git a/{path} b/{path}\n@@ -0,0 +1,{lines} @@\n{body}"
+
+
+def test_split_diff_groups_whole_files():
+    """Verify split_diff packs consecutive files into chunks within budget."""
+    diff = _file_diff("a.py", 10) + _file_diff("b.py", 10) + _file_diff("c.py", 40)
+
+    chunks = service.split_diff(diff, max_tokens=60)
+
+    assert len(chunks) == 2
+    assert "a.py" in chunks[0] and "b.py" in chunks[0]
+    assert "c.py" in chunks[1]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_summarizes_then_reduces(monkeypatch):
+    """
+    Verify each chunk is summarized with bounded concurrency and the
+    summaries are reduced into a single message in the chosen style.
+    """
+    monkeypatch.setattr(
+        "ai_commit.prompt_manager.load_style", lambda style: "style prompt"
+    )
+    monkeypatch.setenv("AI_COMMIT_MAX_CONCURRENCY", "2")
+
+    class RecordingProvider:
+        def __init__(self):
+            self.in_flight = 0
+            self.peak = 0
+            self.reduce_prompt = None
+
+        async def complete(
+            self, system_prompt: str, user_prompt: str, options=None
+        ) -> str:
+            if system_prompt == "style prompt":
+                self.reduce_prompt = user_prompt
+                return "refactor: split the monolith"
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            path = user_prompt.split()[2]
+            return f"changed {path}"
+
+    provider = RecordingProvider()
+    diff = "".join(_file_diff(f"f{i}.py", 40) for i in range(5))
+
+    prepared = await service.prepare_prompt(
+        diff, provider, token_budget=60, map_reduce=True
+    )
+    result = await service.generate_commit(
+        prepared.user_prompt, "conventional", provider
+    )
+
+    assert result == "refactor: split the monolith"
+    assert not prepared.cacheable
+    assert provider.peak == 2
+    for i in range(5):
+        assert f"- changed a/f{i}.py" in provider.reduce_prompt
+
+
+@pytest.mark.asyncio
+async def test_prepare_prompt_compacts_files_as_they_arrive():
+    """Verify a diff given file by file is compacted like the whole string."""
+    diff = "".join(_file_diff(f"f{i}.py", 40) for i in range(5))
+
+    async def files():
+        for file in parse_diff(diff):
+            yield file
+
+    streamed = await service.prepare_prompt(files(), provider=None, token_budget=200)
+    whole = await service.prepare_prompt(diff, provider=None, token_budget=200)
+
+    assert streamed == whole
+    assert streamed.tokens <= 200 < streamed.original_tokens
+
+
+def _indexed_diff(path: str, new_blob: str, lines: int = 40) -> str:
+    body = "".join(f"+{path} line\n" for _ in range(lines))
+    return (
+        f"diff --git a/{path} b/{path}\nindex 0000000..{new_blob} 100644\n"
+        f"@@ -0,0 +1,{lines} @@\n{body}"
+    )
+
+
+@pytest.mark.asyncio
+async def test_incremental_prompt_only_summarizes_changed_files(tmp_path):
+    """
+    Verify per-file summaries are cached by blob ids, so regenerating
+    after one file changed sends only that file to the model.
+    """
+    summarized = []
+
+    class SummaryProvider:
+        model = "test-model"
+
+        async def complete(self, system_prompt: str, user_prompt: str) -> str:
+            path = user_prompt.split()[2][2:]
+            summarized.append(path)
+            return f"updates {path}"
+
+    provider = SummaryProvider()
+    summaries = cache.SummaryCache(directory=tmp_path)
+    stub = "diff --git a/yarn.lock b/yarn.lock\n# yarn.lock: 9 changed lines elided\n"
+    first = "".join(_indexed_diff(f"f{i}.py", f"aaaa00{i}") for i in range(3))
+    second = first.replace("aaaa002", "bbbb002") + stub
+
+    await service.prepare_prompt(
+        first, provider, 50, incremental=True, summary_cache=summaries
+    )
+    prepared = await service.prepare_prompt(
+        second, provider, 50, incremental=True, summary_cache=summaries
+    )
+
+    assert summarized == ["f0.py", "f1.py", "f2.py", "f2.py"]
+    assert "- f0.py: updates f0.py\n" in prepared.user_prompt
+    assert "- yarn.lock: 9 changed lines elided\n" in prepared.user_prompt
+    assert prepared.cacheable
+
+
+class CandidateProvider:
+    """Answers each sampling configuration with its own message and delay."""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.options_received = []
+
+    async def complete(self, system_prompt, user_prompt, options=None):
+        seed = (options or {}).get("seed", 0)
+        self.options_received.append(options)
+        delay, message = self.answers[seed]
+        await asyncio.sleep(delay)
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+
+CANDIDATE_DIFF = "diff --git a/src/parser.py b/src/parser.py\n@@ -1 +1 @@\n-a\n+b\n"
+
+
+@pytest.mark.asyncio
+async def test_generate_best_commit_picks_highest_scoring(monkeypatch):
+    """
+    Verify candidates are sampled differently and the best-formed one wins.
+    """
+    monkeypatch.setattr("ai_commit.prompt_manager.load_style", lambda s: "prompt")
+    provider = CandidateProvider({
+        0: (0, "Updated some stuff in the code base."),
+        1: (0, "fix: handle empty input in parser"),
+        2: (0, "feat: something"),
+    })
+
+    message = await service.generate_best_commit(
+        CANDIDATE_DIFF, "conventional", provider, candidates=3, time_limit=1
+    )
+
+    assert message == "fix: handle empty input in parser"
+    # Every candidate keeps the style's length limits.
+    assert provider.options_received[0] == prompt_manager.style_options("conventional")
+    assert all(o["num_predict"] == 48 for o in provider.options_received)
+    temperatures = [o["temperature"] for o in provider.options_received[1:]]
+    assert temperatures == sorted(temperatures) and len(set(temperatures)) == 2
+
+
+@pytest.mark.asyncio
+async def test_generate_best_commit_returns_finished_candidate_at_deadline(
+    monkeypatch,
+):
+    """
+    Verify a slow candidate is abandoned once the time limit expires.
+    """
+    monkeypatch.setattr("ai_commit.prompt_manager.load_style", lambda s: "prompt")
+    provider = CandidateProvider({
+        0: (0, "chore: tweak"),
+        1: (5, "fix: handle empty input in parser"),
+    })
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    message = await service.generate_best_commit(
+        CANDIDATE_DIFF, "conventional", provider, candidates=2, time_limit=0.05
+    )
+
+    assert message == "chore: tweak"
+    assert loop.time() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_generate_best_commit_zero_time_limit_takes_first_finished(
+    monkeypatch,
+):
+    """
+    Verify a time limit of 0 is honoured rather than read as the default.
+    """
+    monkeypatch.setattr("ai_commit.prompt_manager.load_style", lambda s: "prompt")
+    monkeypatch.setattr("ai_commit.config.get_candidate_timeout", lambda: 10.0)
+    provider = CandidateProvider({
+        0: (0, "chore: tweak"),
+        1: (0.2, "fix: handle empty input in parser"),
+    })
+
+    message = await service.generate_best_commit(
+        CANDIDATE_DIFF, "conventional", provider, candidates=2, time_limit=0
+    )
+
+    assert message == "chore: tweak"
+
+
+@pytest.mark.asyncio
+async def test_generate_best_commit_raises_when_all_candidates_fail(monkeypatch):
+    """
+    Verify a provider error surfaces when no candidate succeeds.
+    """
+    monkeypatch.setattr("ai_commit.prompt_manager.load_style", lambda s: "prompt")
+    provider = CandidateProvider({
+        0: (0, RuntimeError("down")),
+        1: (0, RuntimeError("down")),
+    })
+
+    with pytest.raises(RuntimeError, match="down"):
+        await service.generate_best_commit(
+            CANDIDATE_DIFF, "conventional", provider, candidates=2, time_limit=1
+        )
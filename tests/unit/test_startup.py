@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Wall-clock budget for importing the CLI and running a lightweight command.
+# Generous enough for slow CI runners; override to tighten locally.
+STARTUP_BUDGET_MS = float(os.environ.get("AI_COMMIT_STARTUP_BUDGET_MS", "300"))
+
+# Modules that only the generation path needs.
+HEAVY_MODULES = ["httpx", "rich", "asyncio", "ai_commit.flows"]
+
+PROBE = """
+import json, sys, time
+args, heavy_modules = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+start = time.perf_counter()
+from ai_commit.cli import app
+sys.argv = ["ai-commit", *args]
+try:
+    app()
+except SystemExit:
+    pass
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [m for m in heavy_modules if m in sys.modules]
+print(json.dumps({"elapsed_ms": elapsed, "heavy": heavy}), file=sys.stderr)
+"""
+
+
+def _probe(args: list[str]) -> dict:
+    """Runs the CLI in a fresh interpreter and reports its start-up cost."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(args), json.dumps(HEAVY_MODULES)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("args", [
+    ["--help"],
+    ["install-hook", "--help"],
+    [],  # Missing --live/--dry-run: the argument error path.
+])
+def test_lightweight_commands_skip_heavy_imports(args):
+    """Verify help and error paths never import the generation stack."""
+    report = _probe(args)
+
+    assert report["heavy"] == []
+
+
+def test_help_fits_startup_budget():
+    """Verify `ai-commit --help` starts within the start-up budget."""
+    # Take the best of a few runs to filter out scheduler noise.
+    elapsed = min(_probe(["--help"])["elapsed_ms"] for _ in range(3))
+
+    assert elapsed < STARTUP_BUDGET_MS, (
+        f"ai-commit --help took {elapsed:.0f}ms "
+        f"(budget {STARTUP_BUDGET_MS:.0f}ms)"
+    )
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+from ai_commit import timings
+
+
+def test_span_is_a_no_op_without_recording():
+    """Nothing is recorded, and annotating is harmless, when timing is off."""
+    with timings.span("stage") as span:
+        timings.annotate(detail=1)
+
+    assert span is timings.span("other")
+
+
+def test_recording_captures_nested_spans_and_annotations():
+    """Spans nest by depth and carry the details added inside them."""
+    with timings.recording() as recorder:
+        with timings.span("outer", kind="test"):
+            with timings.span("inner"):
+                timings.annotate(tokens=42)
+
+    spans = {span.name: span for span in recorder.spans}
+    assert spans["outer"].depth == 0 and spans["inner"].depth == 1
+    assert spans["outer"].attrs == {"kind": "test"}
+    assert spans["inner"].attrs == {"tokens": 42}
+    assert spans["outer"].duration >= spans["inner"].duration >= 0
+
+
+async def test_timed_coroutines_record_in_tasks():
+    """Coroutines run as tasks are recorded under the same recording."""
+    @timings.timed("work")
+    async def work() -> int:
+        await asyncio.sleep(0)
+        return 1
+
+    with timings.recording() as recorder:
+        results = await asyncio.gather(work(), work())
+
+    assert results == [1, 1]
+    assert [span.name for span in recorder.spans] == ["work", "work"]
+
+
+def test_summary_and_chrome_trace_include_ollama_metrics(tmp_path):
+    """Ollama's own phase timings appear in the summary and as trace slices."""
+    with timings.recording() as recorder:
+        with timings.span("ollama.complete"):
+            timings.annotate(
+                load_duration=100_000_000,
+                prompt_eval_count=500, prompt_eval_duration=250_000_000,
+                eval_count=40, eval_duration=500_000_000,
+            )
+
+    summary = recorder.summary()
+    assert "ollama.complete" in summary
+    assert "load 100ms" in summary
+    assert "prompt 500 tokens in 250ms (2000 tokens/s)" in summary
+    assert "generated 40 tokens in 500ms (80 tokens/s)" in summary
+
+    path = tmp_path / "trace.json"
+    recorder.export(path)
+    names = [event["name"] for event in json.loads(path.read_text())["traceEvents"]]
+    assert names == [
+        "ollama.complete", "ollama.eval", "ollama.prompt_eval", "ollama.load",
+    ]
+
+    recorder.export(path, format="json")
+    assert json.loads(path.read_text())["ollama"]["eval_count"] == 40
+
+
+def test_summary_omits_the_ollama_line_without_durations():
+    """Token counts alone, as OpenAI-compatible servers report, add no line."""
+    with timings.recording() as recorder:
+        with timings.span("ollama.stream"):
+            timings.annotate(prompt_eval_count=14, eval_count=2)
+
+    summary = recorder.summary()
+    assert "ollama.stream" in summary
+    assert "Ollama:" not in summary
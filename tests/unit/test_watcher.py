@@ -0,0 +1,65 @@
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from ai_commit import cache, service, watcher
+
+pytestmark = pytest.mark.usefixtures("style_prompt")
+
+
+@pytest.fixture
+def git_repo(make_git_repo) -> Path:
+    return make_git_repo()
+
+
+async def test_watch_pregenerates_after_index_settles(
+    git_repo: Path, tmp_path, counting_provider
+):
+    """
+    Verify staging triggers one debounced background generation whose result
+    the normal generation path then finds in the cache.
+    """
+    provider = counting_provider()
+    store = cache.CompletionCache(directory=tmp_path, max_entries=10, max_age=60)
+    generated = asyncio.Queue()
+
+    task = asyncio.ensure_future(watcher.watch(
+        "conventional", provider, store, cwd=git_repo,
+        poll_interval=0.01, debounce=0.05, on_generated=generated.put,
+    ))
+    try:
+        (git_repo / "app.py").write_text("value = 1\n")
+        subprocess.run(["git", "add", "app.py"], cwd=git_repo, check=True)
+        message = await asyncio.wait_for(generated.get(), timeout=5)
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert message == "feat: message 1"
+
+    diff = subprocess.run(
+        ["git", "diff", "--staged"], cwd=git_repo,
+        check=True, capture_output=True, text=True,
+    ).stdout
+    prepared = await service.prepare_prompt(diff, provider)
+    again = await service.generate_commit(
+        prepared.user_prompt, "conventional", provider, cache=store
+    )
+    assert again == message
+    assert provider.calls == 1
+
+
+async def test_pregenerate_without_staged_changes(
+    git_repo: Path, tmp_path, counting_provider
+):
+    """Verify nothing is generated when the index has no staged changes."""
+    provider = counting_provider()
+    store = cache.CompletionCache(directory=tmp_path, max_entries=10, max_age=60)
+
+    assert await watcher.pregenerate(
+        "conventional", provider, store, cwd=git_repo
+    ) is None
+    assert provider.calls == 0